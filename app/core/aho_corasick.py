@@ -0,0 +1,69 @@
+from __future__ import annotations
+from collections import deque
+from typing import Any, Dict, Iterator, List, Tuple
+
+
+class AhoCorasick:
+    """
+    Multi-pattern matcher: add() every pattern, build() once, then iter_matches()
+    finds all patterns in a text in one left-to-right pass (cost ~ len(text) +
+    matches, independent of the number of patterns).
+    """
+
+    def __init__(self) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, Any]]] = [[]]  # (pattern length, value) per node
+        self._built = False
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+    def add(self, pattern: str, value: Any) -> None:
+        if not pattern:
+            return
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[node][ch] = nxt
+            node = nxt
+        self._out[node].append((len(pattern), value))
+        self._built = False
+
+    def build(self) -> None:
+        goto, fail, out = self._goto, self._fail, self._out
+        # BFS: a node's fail target is shallower, so its outputs are final
+        # before they are merged in.
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in goto[node].items():
+                queue.append(nxt)
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                target = goto[f].get(ch, 0)
+                fail[nxt] = target if target != nxt else 0
+                if out[fail[nxt]]:
+                    out[nxt] = out[nxt] + out[fail[nxt]]
+        self._built = True
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, Any]]:
+        """Yield (start, end, value) for every occurrence, ordered by end."""
+        if not self._built:
+            self.build()
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                end = i + 1
+                for length, value in out[node]:
+                    yield end - length, end, value
@@ -15,3 +15,15 @@ def add_days(date_str: str, days: int) -> str:
 
 def now_iso() -> str:
     return _dt.datetime.now().replace(microsecond=0).isoformat()
+
+_EPOCH = _dt.date(1970, 1, 1)
+
+def day_number(date_str: str) -> int:
+    """Local calendar day as an integer (days since 1970-01-01) for indexed range scans."""
+    return (parse_date(date_str) - _EPOCH).days
+
+def today_day() -> int:
+    return (_dt.date.today() - _EPOCH).days
+
+def day_to_date_str(day: int) -> str:
+    return (_EPOCH + _dt.timedelta(days=int(day))).strftime(DATE_FMT)
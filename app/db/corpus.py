@@ -0,0 +1,156 @@
+from __future__ import annotations
+import os
+import sqlite3
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+from app.core.aho_corasick import AhoCorasick
+from app.core.time_utils import now_iso
+from app.db.repo import CLOZE_VERSION, _SENTENCE_INSERT
+
+# Offline sentence corpus (Tatoeba-style TSV) -> sentences linked to every item
+# whose term (or reading) they contain, with the cloze cut at the match.
+
+CORPUS_KIND = "corpus"
+CORPUS_BATCH = 1000  # sentences per committed batch
+MAX_PER_ITEM = 20  # corpus sentences kept per item
+MIN_READING_LEN = 3  # shorter kana readings (する, ある...) match almost everywhere
+_AFFIX_MARKS = "〜～~…"  # grammar terms like 〜ながら
+
+CorpusProgress = Callable[[int, int], None]  # bytes done, total bytes
+
+
+@dataclass
+class CorpusLinkResult:
+    lines: int = 0
+    matched: int = 0  # sentences linked to at least one item
+    links: int = 0  # sentence rows inserted (already-linked pairs are not counted)
+    capped: int = 0  # links skipped because the item already has MAX_PER_ITEM
+
+
+def _pattern(text: str) -> str:
+    return (text or "").strip().strip(_AFFIX_MARKS).strip()
+
+
+def build_item_matcher(db: sqlite3.Connection, min_reading_len: int = MIN_READING_LEN) -> AhoCorasick:
+    """One automaton over all item terms and readings; values are (item_id, is_reading)."""
+    matcher = AhoCorasick()
+    for row in db.execute("SELECT id, term, reading FROM items"):
+        term = _pattern(row["term"])
+        if term:
+            matcher.add(term, (int(row["id"]), False))
+        reading = _pattern(row["reading"])
+        if len(reading) >= min_reading_len and reading != term:
+            matcher.add(reading, (int(row["id"]), True))
+    matcher.build()
+    return matcher
+
+
+def _corpus_sentence(line: str) -> Optional[str]:
+    """
+    Sentence text of a corpus line. Accepts Tatoeba `id<TAB>lang<TAB>text`
+    (non-Japanese lines are skipped), `id<TAB>text[<TAB>...]` pair exports and
+    plain one-sentence-per-line files.
+    """
+    fields = line.rstrip("\r\n").split("\t")
+    if len(fields) >= 3 and fields[0].isdigit() and len(fields[1]) == 3 and fields[1].isalpha():
+        return fields[2].strip() if fields[1] == "jpn" else None
+    if len(fields) >= 2 and fields[0].isdigit():
+        return fields[1].strip()
+    return fields[0].strip()
+
+
+def link_sentence(matcher: AhoCorasick, sentence: str) -> Dict[int, Tuple[int, int, bool]]:
+    """
+    Items found in a sentence -> (start, end, is_reading) of the span to blank.
+    Matches nested inside a longer match (日 inside 日本) are dropped; for each
+    item the first term match wins over a reading match.
+    """
+    matches = sorted(matcher.iter_matches(sentence), key=lambda m: (m[0], m[0] - m[1]))
+    spans: Dict[int, Tuple[int, int, bool]] = {}
+    cover = (-1, -1)
+    for start, end, (item_id, is_reading) in matches:
+        if end <= cover[1] and (start, end) != cover:
+            continue
+        if end > cover[1]:
+            cover = (start, end)
+        current = spans.get(item_id)
+        if current is None or (current[2] and not is_reading):
+            spans[item_id] = (start, end, is_reading)
+    return spans
+
+
+def link_corpus(
+    db: sqlite3.Connection,
+    path: str,
+    max_per_item: int = MAX_PER_ITEM,
+    min_reading_len: int = MIN_READING_LEN,
+    progress_cb: Optional[CorpusProgress] = None,
+) -> CorpusLinkResult:
+    """
+    Stream a corpus file once and attach each sentence to every item it contains
+    (kind='corpus'), with cloze/answer precomputed from the match position. Cost
+    is linear in corpus size; memory holds the automaton and per-item counts.
+    Re-running is safe: an item never gets the same sentence twice.
+    """
+    matcher = build_item_matcher(db, min_reading_len)
+    counts: Dict[int, int] = {
+        int(r[0]): int(r[1])
+        for r in db.execute("SELECT item_id, COUNT(*) FROM sentences WHERE kind=? GROUP BY item_id", (CORPUS_KIND,))
+    }
+    result = CorpusLinkResult()
+    total_bytes = max(1, os.path.getsize(path))
+    done_bytes = 0
+    now = now_iso()
+    insert = (
+        _SENTENCE_INSERT
+        + """ SELECT ?,?,?,?,?,?,?,?,?
+             WHERE NOT EXISTS (SELECT 1 FROM sentences WHERE item_id=? AND sentence=?)"""
+    )
+    pending = 0  # inserts since the last commit
+
+    def flush() -> None:
+        nonlocal pending
+        if pending:
+            db.commit()
+            pending = 0
+        if progress_cb:
+            progress_cb(done_bytes, total_bytes)
+
+    try:
+        with open(path, "rb") as fb:
+            for raw in fb:
+                done_bytes += len(raw)
+                result.lines += 1
+                sentence = _corpus_sentence(raw.decode("utf-8-sig" if result.lines == 1 else "utf-8", errors="replace"))
+                if not sentence:
+                    continue
+                spans = link_sentence(matcher, sentence)
+                if not spans:
+                    continue
+                result.matched += 1
+                for item_id, (start, end, is_reading) in spans.items():
+                    if counts.get(item_id, 0) >= max_per_item:
+                        result.capped += 1
+                        continue
+                    cloze = sentence[:start] + "____" + sentence[end:]
+                    reason = "corpus-reading" if is_reading else "corpus-term"
+                    cur = db.execute(
+                        insert,
+                        (
+                            item_id, sentence, cloze, sentence[start:end], CORPUS_KIND, now,
+                            0, reason, CLOZE_VERSION, item_id, sentence,
+                        ),
+                    )
+                    # the NOT EXISTS guard skips pairs linked before: count real inserts only
+                    if cur.rowcount > 0:
+                        counts[item_id] = counts.get(item_id, 0) + 1
+                        result.links += 1
+                        pending += 1
+                if pending >= CORPUS_BATCH:
+                    flush()
+        flush()
+    except BaseException:
+        db.rollback()
+        raise
+    return result
@@ -1,28 +1,152 @@
 from __future__ import annotations
 import os
+import queue
 import sqlite3
-from typing import Optional
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
 
-_DB_CONN: Optional[sqlite3.Connection] = None
+# Pragma profile applied to every connection. WAL lets readers run while the
+# writer commits; synchronous=NORMAL is durable across app crashes in WAL mode
+# and avoids an fsync per commit.
+CACHE_SIZE_KIB = 20000
+MMAP_SIZE = 256 * 1024 * 1024
+BUSY_TIMEOUT_MS = 5000
+READER_POOL_SIZE = 4
+
+_MANAGER: Optional["ConnectionManager"] = None
+_MANAGER_LOCK = threading.Lock()
 
 def _project_root() -> str:
     # root is folder containing main.py
     return os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
 
 def _db_path() -> str:
+    # JPSTUDY_DB_PATH lets scripts/benchmarks point the app at another DB file
+    override = os.environ.get("JPSTUDY_DB_PATH")
+    if override:
+        path = os.path.abspath(override)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
     root = _project_root()
     data_dir = os.path.join(root, "app_data")
     os.makedirs(data_dir, exist_ok=True)
     return os.path.join(data_dir, "app.db")
 
+
+def _apply_pragmas(conn: sqlite3.Connection) -> None:
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS};")
+    conn.execute("PRAGMA foreign_keys = ON;")
+    conn.execute("PRAGMA synchronous = NORMAL;")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB};")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE};")
+    conn.execute("PRAGMA temp_store = MEMORY;")
+
+
+class ConnectionManager:
+    """
+    Owns the SQLite connections of the app:
+    - one writer connection (UI thread) that also switches the DB to WAL,
+    - a small pool of read-only reader connections usable from any thread,
+    - extra writer connections for background jobs (imports), which queue on
+      busy_timeout instead of failing with "database is locked".
+    """
+
+    def __init__(self, path: str, reader_pool_size: int = READER_POOL_SIZE):
+        self.path = path
+        self.reader_pool_size = max(1, reader_pool_size)
+        self._writer: Optional[sqlite3.Connection] = None
+        self._readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._all_readers: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._wal_ready = False
+
+    def _open_writer(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=check_same_thread)
+        conn.execute("PRAGMA journal_mode = WAL;")
+        _apply_pragmas(conn)
+        return conn
+
+    def writer(self) -> sqlite3.Connection:
+        if self._writer is None:
+            self._writer = self._open_writer()
+            self._wal_ready = True
+        return self._writer
+
+    def new_writer(self) -> sqlite3.Connection:
+        """
+        Create a writer connection for background work (thread-safe).
+        """
+        return self._open_writer(check_same_thread=False)
+
+    def _ensure_wal(self) -> None:
+        # WAL must be enabled (by a writer) before a read-only connection opens.
+        # Use a throwaway connection, not writer(): the first reader may open on
+        # a pool thread, and the UI writer (check_same_thread) must not.
+        if self._wal_ready:
+            return
+        conn = self._open_writer(check_same_thread=False)
+        conn.close()
+        self._wal_ready = True
+
+    def _open_reader(self) -> sqlite3.Connection:
+        self._ensure_wal()
+        uri = "file:" + self.path.replace("?", "%3f").replace("#", "%23") + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        _apply_pragmas(conn)
+        conn.execute("PRAGMA query_only = ON;")
+        return conn
+
+    def _acquire_reader(self) -> sqlite3.Connection:
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._all_readers) < self.reader_pool_size:
+                conn = self._open_reader()
+                self._all_readers.append(conn)
+                return conn
+        return self._readers.get()
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        conn = self._acquire_reader()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._readers.put(conn)
+
+    def close(self) -> None:
+        with self._lock:
+            for conn in self._all_readers:
+                conn.close()
+            self._all_readers.clear()
+            self._readers = queue.LifoQueue()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+def get_manager() -> ConnectionManager:
+    global _MANAGER
+    with _MANAGER_LOCK:
+        if _MANAGER is None:
+            _MANAGER = ConnectionManager(_db_path())
+        return _MANAGER
+
 def get_db() -> sqlite3.Connection:
-    global _DB_CONN
-    if _DB_CONN is None:
-        path = _db_path()
-        _DB_CONN = sqlite3.connect(path)
-        _DB_CONN.row_factory = sqlite3.Row
-        _DB_CONN.execute("PRAGMA foreign_keys = ON;")
-    return _DB_CONN
+    return get_manager().writer()
+
+def read_db():
+    """
+    Borrow a pooled read-only connection: `with read_db() as db: ...`.
+    Reads never wait on the writer (WAL) and always see committed data.
+    """
+    return get_manager().reader()
 
 def init_db(db: sqlite3.Connection) -> None:
     # idempotent schema creation
@@ -34,8 +158,4 @@ def new_db_connection() -> sqlite3.Connection:
     """
     Create a new SQLite connection for background work (thread-safe).
     """
-    path = _db_path()
-    conn = sqlite3.connect(path, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON;")
-    return conn
+    return get_manager().new_writer()
@@ -0,0 +1,597 @@
+from __future__ import annotations
+import csv
+import hashlib
+import multiprocessing
+import os
+import queue
+import sqlite3
+from dataclasses import dataclass, field, replace
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.db.repo import (
+    IMPORT_CHUNK_SIZE,
+    IMPORT_SAMPLE_LIMIT,
+    ImportResult,
+    _keep_sample,
+    _lookup_items_by_keys,
+    _normalize_key,
+    build_cloze_preview,
+    bulk_import_items,
+)
+from app.core.time_utils import add_days, now_iso, today_date_str
+
+# CSV -> mapped rows -> chunks committed with an import_jobs checkpoint. Parsing
+# is kept free of Qt and DB handles so it can also run in worker processes (see
+# import_files_parallel).
+
+ProgressCallback = Callable[[int, str], None]  # bytes done in file, file path
+
+_BOM = b"\xef\xbb\xbf"
+
+
+@dataclass
+class ParsedChunk:
+    rows: List[Dict[str, Any]] = field(default_factory=list)
+    error_rows: List[str] = field(default_factory=list)
+    records: int = 0  # CSV records consumed (mapped + failed)
+    end_offset: int = 0  # file byte offset just past the chunk's last record
+    end_row: int = 0  # CSV row number of the record after the chunk
+
+
+class _CountingLines:
+    """
+    Decoded lines of a binary file plus the byte offset consumed so far. csv
+    pulls lines on demand, so after each record `offset` sits on a record
+    boundary (also for quoted multi-line fields).
+    """
+
+    def __init__(self, fb: BinaryIO, offset: int):
+        self.fb = fb
+        self.offset = offset
+
+    def __iter__(self) -> "_CountingLines":
+        return self
+
+    def __next__(self) -> str:
+        raw = self.fb.readline()
+        if not raw:
+            raise StopIteration
+        self.offset += len(raw)
+        return raw.decode("utf-8")
+
+
+def detect_dialect(sample: str) -> csv.Dialect:
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=[",", "\t", ";"])
+    except Exception:
+        return csv.excel
+
+
+def merge_level_tag(tags: str, level_tag: Optional[str]) -> str:
+    tags = tags or ""
+    parts = [t.strip() for t in tags.split(",") if t.strip()]
+    if level_tag:
+        level_upper = level_tag.upper()
+        if level_upper not in {t.upper() for t in parts}:
+            parts.insert(0, level_tag)
+    return ", ".join(parts)
+
+
+def map_row(row: dict, level_tag: Optional[str]) -> dict:
+    keys = {k.lower(): k for k in row.keys() if k is not None}
+
+    def pick(*names: str) -> str:
+        for n in names:
+            if n in keys:
+                return (row.get(keys[n]) or "").strip()
+        return ""
+
+    item_type = pick("item_type", "type")
+    if item_type not in ("vocab", "kanji", "grammar"):
+        item_type = "vocab"
+
+    term = pick("term", "front", "expression", "word")
+    reading = pick("reading", "pronunciation", "kana", "furigana")
+    meaning = pick("meaning", "back", "definition", "gloss")
+    example = pick("example", "sentence", "context", "note")
+    tags = pick("tags")
+    deck = pick("deck")
+    if deck and not tags:
+        tags = deck
+
+    if level_tag:
+        tags = merge_level_tag(tags, level_tag)
+
+    if not term or not meaning:
+        raise ValueError("Missing term/meaning")
+
+    return {
+        "item_type": item_type,
+        "term": term,
+        "reading": reading,
+        "meaning": meaning,
+        "example": example,
+        "tags": tags,
+    }
+
+
+def _iter_records(path: str, start_offset: int = 0, start_row: int = 2) -> Iterator[Tuple[int, Dict[str, Any], int]]:
+    """
+    Yield (row_num, raw CSV record, byte offset after it) in one streaming pass.
+    start_offset/start_row resume at a record boundary saved by a checkpoint;
+    the header is still read from the top of the file.
+    """
+    with open(path, "rb") as fb:
+        start = len(_BOM) if fb.read(len(_BOM)) == _BOM else 0
+        fb.seek(start)
+        sample = fb.read(2048).decode("utf-8", errors="ignore")
+        fb.seek(start)
+        lines = _CountingLines(fb, start)
+        dialect = detect_dialect(sample)
+        header = next(csv.reader(lines, dialect=dialect), None)
+        if header is None:
+            raise ValueError("CSV missing header.")
+        if start_offset > lines.offset:
+            fb.seek(start_offset)
+            lines.offset = start_offset
+        reader = csv.DictReader(lines, fieldnames=header, dialect=dialect)
+        for row_num, row in enumerate(reader, start=start_row):
+            yield row_num, row, lines.offset
+
+
+def iter_parsed_chunks(
+    path: str,
+    level_tag: Optional[str] = None,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    start_offset: int = 0,
+    start_row: int = 2,
+) -> Iterator[ParsedChunk]:
+    """
+    Stream a CSV file as chunks of mapped rows in a single pass. Each row carries
+    row_num and a precomputed cloze_preview so the writer does no per-row parsing
+    work; each chunk records where it ends, for progress and checkpoints.
+    """
+    chunk = ParsedChunk()
+    for row_num, row, offset in _iter_records(path, start_offset, start_row):
+        chunk.records += 1
+        chunk.end_offset = offset
+        chunk.end_row = row_num + 1
+        try:
+            data = map_row(row, level_tag=level_tag)
+            data["row_num"] = row_num
+            if data["example"]:
+                data["cloze_preview"] = build_cloze_preview(data["example"], data["term"])
+            chunk.rows.append(data)
+        except Exception as e:
+            msg = str(e).strip() or e.__class__.__name__
+            chunk.error_rows.append(f"Row {row_num}: {msg}")
+        if chunk.records >= chunk_size:
+            yield chunk
+            chunk = ParsedChunk()
+    if chunk.records:
+        yield chunk
+
+
+# Chunks a parser process may run ahead of the writer (bounds parent memory).
+PARALLEL_QUEUE_CHUNKS = 4
+_PARSER_POLL_S = 0.2
+
+
+@dataclass
+class _ParseFailure:
+    message: str
+
+
+def _parse_into_queue(
+    out: Any,
+    path: str,
+    level_tag: Optional[str],
+    chunk_size: int,
+    start_offset: int,
+    start_row: int,
+) -> None:
+    """Parser process entry point: stream chunks, then None (or a _ParseFailure)."""
+    try:
+        for chunk in iter_parsed_chunks(path, level_tag, chunk_size, start_offset, start_row):
+            out.put(chunk)  # blocks while the writer is PARALLEL_QUEUE_CHUNKS behind
+        out.put(None)
+    except Exception as e:
+        out.put(_ParseFailure(str(e).strip() or e.__class__.__name__))
+
+
+def _queued_chunks(out: Any, proc: Any) -> Iterator[ParsedChunk]:
+    while True:
+        try:
+            item = out.get(timeout=_PARSER_POLL_S)
+        except queue.Empty:
+            if not proc.is_alive():
+                raise RuntimeError(f"CSV parser process exited with code {proc.exitcode}")
+            continue
+        if item is None:
+            return
+        if isinstance(item, _ParseFailure):
+            raise ValueError(item.message)
+        yield item
+
+
+@dataclass
+class ImportJob:
+    id: int
+    path: str
+    level_tag: Optional[str]
+    byte_offset: int = 0  # next record starts here
+    row_num: int = 2  # CSV row number of that record
+    imported: int = 0
+    skipped: int = 0
+    errors: int = 0
+    warnings: int = 0
+    status: str = "running"  # running / interrupted / done
+
+    @property
+    def resumed(self) -> bool:
+        return self.byte_offset > 0 and self.status != "done"
+
+
+_FINGERPRINT_BYTES = 64 * 1024
+IMPORT_JOB_KEEP_DAYS = 30  # finished import_jobs rows are pruned after this
+
+
+def file_fingerprint(path: str) -> str:
+    """
+    Cheap content hash: size, mtime and the first and last 64 KiB (no full
+    read). The mtime catches edits in the middle of a file that keep its size.
+    """
+    st = os.stat(path)
+    size = st.st_size
+    h = hashlib.sha1(f"{size}:{st.st_mtime_ns}".encode("ascii"))
+    with open(path, "rb") as fb:
+        h.update(fb.read(_FINGERPRINT_BYTES))
+        if size > _FINGERPRINT_BYTES:
+            fb.seek(max(_FINGERPRINT_BYTES, size - _FINGERPRINT_BYTES))
+            h.update(fb.read(_FINGERPRINT_BYTES))
+    return h.hexdigest()
+
+
+def start_import_batch(db: sqlite3.Connection, tasks: List[Tuple[str, Optional[str]]]) -> List[ImportJob]:
+    """
+    One job per task. If the same files (same content, order and level tags)
+    were interrupted before, their checkpoints are reused so the batch continues
+    at the file and row where it stopped; otherwise a new batch is recorded.
+    Finished jobs older than IMPORT_JOB_KEEP_DAYS are pruned.
+    """
+    hashes = [file_fingerprint(path) for path, _ in tasks]
+    batch_key = hashlib.sha1(
+        "|".join(f"{h}:{level_tag or ''}" for h, (_, level_tag) in zip(hashes, tasks)).encode("utf-8")
+    ).hexdigest()
+    rows = db.execute(
+        """SELECT id, byte_offset, row_num, imported, skipped, errors, warnings, status
+             FROM import_jobs WHERE batch_key=? ORDER BY position""",
+        (batch_key,),
+    ).fetchall()
+    if len(rows) == len(tasks) and any(r["status"] != "done" for r in rows):
+        return [
+            ImportJob(
+                id=int(r["id"]),
+                path=path,
+                level_tag=level_tag,
+                byte_offset=int(r["byte_offset"]),
+                row_num=int(r["row_num"]),
+                imported=int(r["imported"]),
+                skipped=int(r["skipped"]),
+                errors=int(r["errors"]),
+                warnings=int(r["warnings"]),
+                status=r["status"],
+            )
+            for r, (path, level_tag) in zip(rows, tasks)
+        ]
+
+    now = now_iso()
+    db.execute("DELETE FROM import_jobs WHERE batch_key=?", (batch_key,))
+    db.execute(
+        "DELETE FROM import_jobs WHERE status='done' AND updated_at < ?",
+        (add_days(today_date_str(), -IMPORT_JOB_KEEP_DAYS),),
+    )
+    jobs: List[ImportJob] = []
+    for position, ((path, level_tag), file_hash) in enumerate(zip(tasks, hashes)):
+        cur = db.execute(
+            """INSERT INTO import_jobs(batch_key, position, path, file_hash, level_tag, created_at, updated_at)
+                 VALUES(?,?,?,?,?,?,?)""",
+            (batch_key, position, path, file_hash, level_tag, now, now),
+        )
+        jobs.append(ImportJob(id=int(cur.lastrowid), path=path, level_tag=level_tag))
+    db.commit()
+    return jobs
+
+
+def _checkpoint(db: sqlite3.Connection, job: ImportJob) -> None:
+    db.execute(
+        """UPDATE import_jobs SET byte_offset=?, row_num=?, imported=?, skipped=?, errors=?, warnings=?,
+                                  status=?, updated_at=?
+             WHERE id=?""",
+        (
+            job.byte_offset, job.row_num, job.imported, job.skipped, job.errors, job.warnings,
+            job.status, now_iso(), job.id,
+        ),
+    )
+
+
+def _advance(job: ImportJob, to: ImportJob) -> None:
+    job.byte_offset, job.row_num = to.byte_offset, to.row_num
+    job.imported, job.skipped, job.errors, job.warnings = to.imported, to.skipped, to.errors, to.warnings
+
+
+def run_import_job(
+    db: sqlite3.Connection,
+    job: ImportJob,
+    chunks: Iterable[ParsedChunk],
+    on_chunk: Optional[Callable[[int], None]] = None,
+) -> ImportResult:
+    """
+    Import parsed chunks for one job, committing each chunk together with the
+    job checkpoint. An exception (a cancel raised by on_chunk, or an error)
+    rolls back only the chunk in flight and leaves the job resumable. Counts in
+    the result include rows imported by earlier runs of the job.
+    """
+    result = ImportResult(imported=job.imported, skipped=job.skipped, errors=job.errors, warnings=job.warnings)
+    if job.status == "done":
+        return result
+    try:
+        for chunk in chunks:
+            part = ImportResult()
+            for msg in chunk.error_rows:
+                part.note_error(msg)
+            if chunk.rows:
+                part.add(bulk_import_items(db, chunk.rows, chunk_size=len(chunk.rows), commit=False))
+            # job only advances once the commit succeeded: if it raises, the
+            # rollback checkpoint below must not skip this chunk on resume
+            advanced = replace(
+                job,
+                byte_offset=chunk.end_offset,
+                row_num=chunk.end_row,
+                imported=job.imported + part.imported,
+                skipped=job.skipped + part.skipped,
+                errors=job.errors + part.errors,
+                warnings=job.warnings + part.warnings,
+            )
+            _checkpoint(db, advanced)
+            db.commit()
+            _advance(job, advanced)
+            result.add(part)
+            if on_chunk:
+                on_chunk(chunk.end_offset)
+        _checkpoint(db, replace(job, status="done"))
+        db.commit()
+        job.status = "done"
+    except BaseException:
+        db.rollback()
+        job.status = "interrupted"
+        _checkpoint(db, job)
+        db.commit()
+        raise
+    return result
+
+
+def import_files(
+    db: sqlite3.Connection,
+    tasks: List[Tuple[str, Optional[str]]],
+    progress_cb: Optional[ProgressCallback] = None,
+) -> ImportResult:
+    """Import files one after another, resuming an interrupted batch."""
+    agg = ImportResult()
+    for job in start_import_batch(db, tasks):
+
+        def on_chunk(done: int, path: str = job.path) -> None:
+            if progress_cb:
+                progress_cb(done, path)
+
+        chunks = iter_parsed_chunks(job.path, job.level_tag, start_offset=job.byte_offset, start_row=job.row_num)
+        agg.add(run_import_job(db, job, chunks, on_chunk=on_chunk))
+    return agg
+
+
+def import_csv_file(
+    db: sqlite3.Connection,
+    path: str,
+    level_tag: Optional[str] = None,
+    on_chunk: Optional[Callable[[int], None]] = None,
+) -> ImportResult:
+    def progress_cb(done: int, _path: str) -> None:
+        if on_chunk:
+            on_chunk(done)
+
+    return import_files(db, [(path, level_tag)], progress_cb=progress_cb)
+
+
+def import_files_parallel(
+    db: sqlite3.Connection,
+    tasks: List[Tuple[str, Optional[str]]],
+    progress_cb: Optional[ProgressCallback] = None,
+    max_workers: Optional[int] = None,
+) -> ImportResult:
+    """
+    Parse (CSV reading, row mapping, cloze previews) one file per worker process
+    while this thread stays the single DB writer. Workers stream chunks through
+    bounded queues and files are written in task order as chunks arrive, so
+    results match a sequential import and at most PARALLEL_QUEUE_CHUNKS chunks
+    per running worker are held in memory. In a resumed batch, finished files
+    are skipped and the interrupted one is parsed from its checkpoint.
+    """
+    jobs = start_import_batch(db, tasks)
+    waiting = [job for job in jobs if job.status != "done"]
+    workers = max(1, min(len(waiting), max_workers or os.cpu_count() or 1))
+    # spawn: forking a process that runs Qt threads is unsafe.
+    ctx = multiprocessing.get_context("spawn")
+    running: Dict[int, Tuple[Any, Any]] = {}  # job id -> (queue, process)
+
+    def start_next() -> None:
+        if not waiting:
+            return
+        job = waiting.pop(0)
+        out = ctx.Queue(maxsize=PARALLEL_QUEUE_CHUNKS)
+        proc = ctx.Process(
+            target=_parse_into_queue,
+            args=(out, job.path, job.level_tag, IMPORT_CHUNK_SIZE, job.byte_offset, job.row_num),
+            daemon=True,
+        )
+        proc.start()
+        running[job.id] = (out, proc)
+
+    agg = ImportResult()
+    try:
+        for _ in range(workers):
+            start_next()
+        for job in jobs:
+
+            def on_chunk(done: int, path: str = job.path) -> None:
+                if progress_cb:
+                    progress_cb(done, path)
+
+            chunks = _queued_chunks(*running[job.id]) if job.id in running else []
+            agg.add(run_import_job(db, job, chunks, on_chunk=on_chunk))
+            if job.id in running:
+                running.pop(job.id)[1].join()
+                start_next()
+    finally:
+        # cancel or error: parsers may be blocked on a full queue
+        for _, proc in running.values():
+            proc.terminate()
+            proc.join()
+    return agg
+
+
+def should_parallelize(tasks: List[Tuple[str, Optional[str]]]) -> bool:
+    return len(tasks) > 1 and (os.cpu_count() or 1) > 1
+
+
+# Error classes reported by validate_csv_file.
+MISSING_FIELDS = "missing_term_meaning"
+PARSE_ERROR = "parse_error"
+DUPLICATE_EXISTING = "duplicate_existing"
+DUPLICATE_IN_FILE = "duplicate_in_file"
+CLOZE_FALLBACK = "cloze_fallback"
+
+
+@dataclass
+class ValidationReport:
+    path: str
+    records: int = 0
+    valid: int = 0  # rows that would create a new item
+    counts: Dict[str, int] = field(default_factory=dict)  # error class -> rows
+    samples: Dict[str, List[str]] = field(default_factory=dict)  # capped per class
+    report_path: Optional[str] = None
+
+    def note(self, kind: str, msg: str, sample_limit: int = IMPORT_SAMPLE_LIMIT) -> None:
+        self.counts[kind] = self.counts.get(kind, 0) + 1
+        _keep_sample(self.samples.setdefault(kind, []), [msg], sample_limit)
+
+
+class _SeenKeys:
+    """
+    Keys already met in the file, kept in a private temporary SQLite database
+    (spills to disk) so in-file dedupe does not grow Python memory with the deck.
+    """
+
+    def __init__(self) -> None:
+        self.conn = sqlite3.connect("")
+        self.conn.execute(
+            """CREATE TABLE seen(term_key TEXT, reading_key TEXT, row_num INTEGER,
+                                 PRIMARY KEY(term_key, reading_key)) WITHOUT ROWID"""
+        )
+
+    def first_rows(self, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], int]:
+        found: Dict[Tuple[str, str], int] = {}
+        term_keys = sorted({k[0] for k in keys})
+        if not term_keys:
+            return found
+        placeholders = ",".join("?" for _ in term_keys)
+        wanted = set(keys)
+        for term_key, reading_key, row_num in self.conn.execute(
+            f"SELECT term_key, reading_key, row_num FROM seen WHERE term_key IN ({placeholders})", term_keys
+        ):
+            if (term_key, reading_key) in wanted:
+                found[(term_key, reading_key)] = row_num
+        return found
+
+    def add(self, rows: List[Tuple[str, str, int]]) -> None:
+        self.conn.executemany("INSERT OR IGNORE INTO seen VALUES(?,?,?)", rows)
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def validate_csv_file(
+    db: sqlite3.Connection,
+    path: str,
+    level_tag: Optional[str] = None,
+    report_path: Optional[str] = None,
+    on_chunk: Optional[Callable[[int], None]] = None,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    sample_limit: int = IMPORT_SAMPLE_LIMIT,
+) -> ValidationReport:
+    """
+    Dry-run an import: stream the file through map_row, the term+reading dedupe
+    lookup and build_cloze_preview without writing to `db` (a reader connection
+    is enough). Memory is bounded by chunk_size and sample_limit; every offending
+    row can additionally be streamed to `report_path` as CSV (row, kind, detail).
+    on_chunk gets the byte offset reached and may raise to cancel.
+    """
+    report = ValidationReport(path=path, report_path=report_path)
+    seen = _SeenKeys()
+    out = open(report_path, "w", encoding="utf-8", newline="") if report_path else None
+    writer = csv.writer(out) if out else None
+    if writer:
+        writer.writerow(["row", "kind", "detail"])
+
+    def note(row_num: int, kind: str, detail: str) -> None:
+        report.note(kind, f"Row {row_num}: {detail}", sample_limit)
+        if writer:
+            writer.writerow([row_num, kind, detail])
+
+    def check(batch: List[Tuple[int, Tuple[str, str]]]) -> None:
+        keys = [key for _, key in batch]
+        existing = _lookup_items_by_keys(db, keys)
+        earlier = seen.first_rows(keys)
+        fresh: List[Tuple[str, str, int]] = []
+        for row_num, key in batch:
+            if key in existing:
+                note(row_num, DUPLICATE_EXISTING, f"trùng term+reading (id={existing[key]['id']})")
+            elif key in earlier:
+                note(row_num, DUPLICATE_IN_FILE, f"trùng term+reading với dòng {earlier[key]}")
+            else:
+                earlier[key] = row_num
+                fresh.append((key[0], key[1], row_num))
+                report.valid += 1
+        seen.add(fresh)
+
+    try:
+        batch: List[Tuple[int, Tuple[str, str]]] = []
+        for row_num, row, offset in _iter_records(path):
+            report.records += 1
+            try:
+                data = map_row(row, level_tag=level_tag)
+            except ValueError as e:
+                note(row_num, MISSING_FIELDS, str(e))
+                data = None
+            except Exception as e:
+                note(row_num, PARSE_ERROR, str(e).strip() or e.__class__.__name__)
+                data = None
+            if data is not None:
+                if data["example"]:
+                    _, _, used_fallback, reason = build_cloze_preview(data["example"], data["term"])
+                    if used_fallback:
+                        note(row_num, CLOZE_FALLBACK, f"cloze fallback ({reason}) - term không có trong câu?")
+                batch.append((row_num, _normalize_key(data["term"], data["reading"])))
+            if report.records % chunk_size == 0:
+                check(batch)
+                batch = []
+                if on_chunk:
+                    on_chunk(offset)
+        if batch:
+            check(batch)
+        if on_chunk:
+            on_chunk(os.path.getsize(path))
+    finally:
+        seen.close()
+        if out:
+            out.close()
+    return report
@@ -0,0 +1,84 @@
+from __future__ import annotations
+import argparse
+import json
+from typing import List, Optional
+
+from app.db.corpus import MAX_PER_ITEM, link_corpus
+from app.db.database import get_db, init_db
+from app.db.repo import get_key_collisions, get_setting, rebuild_clozes, rebuild_daily_stats, set_setting
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Maintenance commands for the app database:
+        python -m app.db.maintenance rebuild-stats
+        python -m app.db.maintenance rebuild-clozes [--all]
+        python -m app.db.maintenance link-corpus sentences.tsv [--max-per-item N]
+        python -m app.db.maintenance fit-fsrs [--epochs N] [--dry-run]
+        python -m app.db.maintenance forecast [--days N] [--runs N] [--daily-limit N]
+        python -m app.db.maintenance key-collisions
+    """
+    parser = argparse.ArgumentParser(prog="python -m app.db.maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("rebuild-stats", help="recompute daily_stats from attempts and review_logs")
+    p_cloze = sub.add_parser("rebuild-clozes", help="regenerate stored clozes built by an older algorithm")
+    p_cloze.add_argument("--all", action="store_true", help="regenerate every sentence")
+    p_corpus = sub.add_parser("link-corpus", help="attach sentences of a TSV corpus to the items they contain")
+    p_corpus.add_argument("path")
+    p_corpus.add_argument("--max-per-item", type=int, default=MAX_PER_ITEM)
+    p_fit = sub.add_parser("fit-fsrs", help="fit FSRS weights to the review history and store them")
+    p_fit.add_argument("--epochs", type=int, default=4)
+    p_fit.add_argument("--dry-run", action="store_true", help="print the fit without saving it")
+    p_fc = sub.add_parser("forecast", help="simulate the review load of the coming days")
+    p_fc.add_argument("--days", type=int, default=30)
+    p_fc.add_argument("--runs", type=int, default=200)
+    p_fc.add_argument("--daily-limit", type=int, default=None, help="max reviews per day (backlog carries over)")
+    sub.add_parser("key-collisions", help="list items left without a dedupe key (same term+reading)")
+    args = parser.parse_args(argv)
+
+    db = get_db()
+    init_db(db)
+    if args.command == "rebuild-stats":
+        rows = rebuild_daily_stats(db)
+        print(f"daily_stats rebuilt: {rows} rows")
+    elif args.command == "rebuild-clozes":
+        rows = rebuild_clozes(db, all_rows=args.all)
+        print(f"clozes rebuilt: {rows} sentences")
+    elif args.command == "link-corpus":
+        result = link_corpus(db, args.path, max_per_item=args.max_per_item)
+        print(
+            f"corpus: {result.lines} lines, {result.matched} matched, "
+            f"{result.links} sentences linked, {result.capped} over the per-item cap"
+        )
+    elif args.command == "fit-fsrs":
+        # numpy-heavy; only imported for this command
+        from app.srs.fsrs import WEIGHTS_SETTING, parse_weights
+        from app.srs.fsrs_fit import fit_weights, load_review_history
+
+        hist = load_review_history(db)
+        fit = fit_weights(hist, init=parse_weights(get_setting(db, WEIGHTS_SETTING)), epochs=args.epochs)
+        print(
+            f"fsrs: {fit.n_reviews} reviews / {fit.n_cards} cards, "
+            f"log loss {fit.loss_before:.4f} -> {fit.loss_after:.4f} in {fit.seconds:.1f}s"
+        )
+        if fit.n_reviews and not args.dry_run:
+            set_setting(db, WEIGHTS_SETTING, json.dumps(fit.weights))
+            print("weights saved")
+    elif args.command == "forecast":
+        from app.srs.forecast import forecast_due_load
+
+        fc = forecast_due_load(db, days=args.days, runs=args.runs, daily_limit=args.daily_limit)
+        print(f"{'date':<12}{'mean':>8}{'low':>8}{'high':>8}")
+        for date, mean, lo, hi in zip(fc.dates, fc.mean, fc.lo, fc.hi):
+            print(f"{date:<12}{mean:>8.1f}{lo:>8.0f}{hi:>8.0f}")
+        print(f"total {fc.total():.0f} reviews over {len(fc.mean)} days ({fc.runs} runs)")
+    elif args.command == "key-collisions":
+        rows = get_key_collisions(db)
+        for row in rows:
+            print(f"item {row['item_id']} {row['term']} ({row['reading']}) duplicates item {row['kept_item_id']}")
+        print(f"key collisions: {len(rows)} (merge or delete these items by hand)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
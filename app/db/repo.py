@@ -1,11 +1,19 @@
 from __future__ import annotations
+import random
 import re
 import sqlite3
-from typing import List, Optional, Dict, Any, Iterable, Tuple, Sequence
-from app.core.time_utils import today_date_str, now_iso, add_days
+import unicodedata
+from dataclasses import dataclass, field
+from typing import List, Optional, Dict, Any, Iterable, Iterator, Tuple, Sequence
+from app.core.time_utils import today_date_str, now_iso, day_number, today_day, day_to_date_str
+
+def _fold_key(text: str) -> str:
+    # NFKC folds full/half width (ＡＢＣ -> abc, ｶﾞ -> ガ); casefold() beats lower() for non-ASCII.
+    return " ".join(unicodedata.normalize("NFKC", text or "").casefold().split())
+
 
 def _normalize_key(term: str, reading: str) -> Tuple[str, str]:
-    return term.strip(), (reading or "").strip()
+    return _fold_key(term), _fold_key(reading)
 
 
 def _merge_tags(existing: str, new: str) -> str:
@@ -29,14 +37,29 @@ def _find_item_by_term_reading(db: sqlite3.Connection, term: str, reading: str)
         """
         SELECT *
         FROM items
-        WHERE lower(term)=lower(?) AND lower(COALESCE(reading,''))=lower(?)
-        LIMIT 1
+        WHERE term_key=? AND reading_key=?
         """,
         (term_key, reading_key),
     )
     return cur.fetchone()
 
 
+def get_key_collisions(db: sqlite3.Connection) -> List[sqlite3.Row]:
+    """
+    Items that shared a normalized term+reading key with an older item when
+    keys were backfilled. They keep NULL keys until merged or deleted by hand.
+    """
+    cur = db.execute(
+        """
+        SELECT k.item_id, k.kept_item_id, k.term_key, k.reading_key, i.term, i.reading
+        FROM item_key_collisions k
+        JOIN items i ON i.id = k.item_id
+        ORDER BY k.kept_item_id, k.item_id
+        """
+    )
+    return list(cur.fetchall())
+
+
 def _ensure_card_for_item(db: sqlite3.Connection, item_id: int) -> None:
     cur = db.execute("SELECT id FROM cards WHERE item_id=? LIMIT 1", (item_id,))
     if cur.fetchone() is None:
@@ -57,12 +80,7 @@ def _ensure_sentence_for_item(db: sqlite3.Connection, item_id: int, sentence: st
     )
     if cur.fetchone() is not None:
         return
-    cloze, ans = build_cloze(sentence, answer)
-    db.execute(
-        """INSERT INTO sentences(item_id, sentence, cloze, answer, kind, created_at)
-             VALUES(?,?,?,?,?,?)""",
-        (item_id, sentence, cloze, ans, "example", now_iso()),
-    )
+    _insert_sentence(db, item_id, sentence, answer)
 
 
 def create_item_with_card(
@@ -80,37 +98,47 @@ def create_item_with_card(
     example = (example or "").strip()
     tags = (tags or "").strip()
 
-    # Dedupe by term + reading
+    # Dedupe by normalized term + reading (unique index idx_items_key)
     existing = _find_item_by_term_reading(db, term, reading)
-    if existing:
-        item_id = int(existing["id"])
-        merged_tags = _merge_tags(existing.get("tags") or "", tags)
+    if existing is None:
+        term_key, reading_key = _normalize_key(term, reading)
+        cur = db.execute(
+            """INSERT INTO items(item_type, term, reading, meaning, example, tags, created_at, term_key, reading_key)
+                 VALUES(?,?,?,?,?,?,?,?,?)
+                 ON CONFLICT(term_key, reading_key) DO NOTHING""",
+            (item_type, term, reading, meaning, example, tags, now_iso(), term_key, reading_key),
+        )
+        if cur.rowcount == 0:
+            # Lost a race with another writer; merge into its row instead.
+            existing = _find_item_by_term_reading(db, term, reading)
+
+    if existing is not None:
+        current = dict(existing)
+        item_id = int(current["id"])
+        merged_tags = _merge_tags(current.get("tags") or "", tags)
         updates = {}
-        if merged_tags != (existing.get("tags") or ""):
+        if merged_tags != (current.get("tags") or ""):
             updates["tags"] = merged_tags
-        if example and not (existing.get("example") or "").strip():
+        if example and not (current.get("example") or "").strip():
             updates["example"] = example
-        if meaning and not (existing.get("meaning") or "").strip():
+        if meaning and not (current.get("meaning") or "").strip():
             updates["meaning"] = meaning
         if updates:
             sets = ", ".join(f"{k}=?" for k in updates.keys())
             db.execute(f"UPDATE items SET {sets} WHERE id=?", (*updates.values(), item_id))
+        if "tags" in updates:
+            _sync_item_tags(db, item_id, merged_tags)
         if example:
             _ensure_sentence_for_item(db, item_id=item_id, sentence=example, answer=term)
         _ensure_card_for_item(db, item_id)
         db.commit()
         return item_id, False
 
-    cur = db.cursor()
-    cur.execute(
-        """INSERT INTO items(item_type, term, reading, meaning, example, tags, created_at)
-             VALUES(?,?,?,?,?,?,?)""",
-        (item_type, term, reading, meaning, example, tags, now_iso()),
-    )
     item_id = cur.lastrowid
+    _sync_item_tags(db, item_id, tags)
 
     # Create an initial card due today (so it appears in SRS queue immediately)
-    cur.execute(
+    db.execute(
         """INSERT INTO cards(item_id, due_date, interval_days, ease, lapses, last_grade, is_leech, created_at, updated_at)
              VALUES(?,?,?,?,?,?,?,?,?)""",
         (item_id, today_date_str(), 0, 2.2, 0, None, 0, now_iso(), now_iso()),
@@ -118,17 +146,246 @@ def create_item_with_card(
 
     # Store example sentence if present
     if example and example.strip():
-        cloze, answer = build_cloze(example.strip(), term.strip())
-        cur.execute(
-            """INSERT INTO sentences(item_id, sentence, cloze, answer, kind, created_at)
-                 VALUES(?,?,?,?,?,?)""",
-            (item_id, example.strip(), cloze, answer, "example", now_iso()),
-        )
+        _insert_sentence(db, item_id, example.strip(), term.strip())
 
     db.commit()
     return int(item_id), True
 
 
+IMPORT_SAMPLE_LIMIT = 50  # row messages kept per category; counts stay exact
+IMPORT_NEW_IDS_LIMIT = 1000  # new item ids kept for the post-import quiz
+
+
+def _keep_sample(samples: List[str], messages: Iterable[str], limit: int = IMPORT_SAMPLE_LIMIT) -> None:
+    for msg in messages:
+        if len(samples) >= limit:
+            return
+        samples.append(msg)
+
+
+@dataclass
+class ImportResult:
+    imported: int = 0
+    errors: int = 0
+    skipped: int = 0  # duplicates merged/skipped
+    warnings: int = 0
+    new_ids: List[int] = field(default_factory=list)  # first IMPORT_NEW_IDS_LIMIT only
+    # Capped samples (IMPORT_SAMPLE_LIMIT) so a large deck stays in bounded memory.
+    error_rows: List[str] = field(default_factory=list)
+    duplicate_rows: List[str] = field(default_factory=list)
+    warning_rows: List[str] = field(default_factory=list)  # e.g., cloze fallback
+
+    def note_error(self, msg: str) -> None:
+        self.errors += 1
+        _keep_sample(self.error_rows, [msg])
+
+    def note_duplicate(self, msg: str) -> None:
+        self.skipped += 1
+        _keep_sample(self.duplicate_rows, [msg])
+
+    def note_warning(self, msg: str) -> None:
+        self.warnings += 1
+        _keep_sample(self.warning_rows, [msg])
+
+    def note_new_ids(self, ids: Iterable[int]) -> None:
+        self.new_ids.extend(ids)
+        del self.new_ids[IMPORT_NEW_IDS_LIMIT:]
+
+    def add(self, other: "ImportResult") -> None:
+        self.imported += other.imported
+        self.errors += other.errors
+        self.skipped += other.skipped
+        self.warnings += other.warnings
+        self.note_new_ids(other.new_ids)
+        _keep_sample(self.error_rows, other.error_rows)
+        _keep_sample(self.duplicate_rows, other.duplicate_rows)
+        _keep_sample(self.warning_rows, other.warning_rows)
+
+
+IMPORT_CHUNK_SIZE = 500
+_ITEM_TYPES = ("vocab", "kanji", "grammar")
+
+
+def _chunked(rows: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk: List[Dict[str, Any]] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _lookup_items_by_keys(db: sqlite3.Connection, keys: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    wanted = set(keys)
+    if not wanted:
+        return {}
+    term_keys = sorted({k[0] for k in wanted})
+    placeholders = ",".join("?" for _ in term_keys)
+    cur = db.execute(
+        f"""SELECT id, term_key, reading_key, meaning, example, tags
+              FROM items WHERE term_key IN ({placeholders})""",
+        term_keys,
+    )
+    found: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for row in cur.fetchall():
+        key = (row["term_key"], row["reading_key"])
+        if key in wanted:
+            found[key] = dict(row)
+    return found
+
+
+def _import_chunk(db: sqlite3.Connection, chunk: List[Dict[str, Any]], result: ImportResult) -> None:
+    now = now_iso()
+    today = today_date_str()
+    prepared: List[Tuple[Any, Tuple[str, str], Dict[str, str]]] = []
+    for row in chunk:
+        row_num = row.get("row_num")
+        data = {k: (row.get(k) or "").strip() for k in ("item_type", "term", "reading", "meaning", "example", "tags")}
+        if not data["term"] or not data["meaning"]:
+            result.note_error(f"Row {row_num}: Missing term/meaning")
+            continue
+        if data["item_type"] not in _ITEM_TYPES:
+            data["item_type"] = "vocab"
+        if data["example"]:
+            preview = row.get("cloze_preview") or build_cloze_preview(data["example"], data["term"])
+            data["cloze"], data["answer"], used_fallback, reason = preview
+            data["cloze_fallback"], data["cloze_reason"] = int(used_fallback), reason
+            if used_fallback:
+                result.note_warning(f"Row {row_num}: cloze fallback ({reason}) - term không có trong câu?")
+        prepared.append((row_num, _normalize_key(data["term"], data["reading"]), data))
+
+    # One indexed lookup for the whole chunk; rows written earlier in this
+    # transaction are visible, so this also dedupes against previous chunks.
+    existing = _lookup_items_by_keys(db, (key for _, key, _ in prepared))
+    for current in existing.values():
+        current["dirty"] = False
+        current["dirty_tags"] = False
+
+    new_rows: Dict[Tuple[str, str], Dict[str, str]] = {}  # in-memory dedupe for this chunk
+    duplicates: List[Tuple[Any, Tuple[str, str]]] = []
+    sentences: List[Tuple[Tuple[str, str], Dict[str, Any]]] = []
+    for row_num, key, data in prepared:
+        if data["example"]:
+            sentences.append((key, data))
+        if key in existing:
+            target: Dict[str, Any] = existing[key]
+        elif key in new_rows:
+            target = new_rows[key]
+        else:
+            new_rows[key] = data
+            continue
+
+        duplicates.append((row_num, key))
+        tags = _merge_tags(target.get("tags") or "", data["tags"])
+        if tags != (target.get("tags") or ""):
+            target["tags"] = tags
+            target["dirty"] = target["dirty_tags"] = True
+        if data["example"] and not (target.get("example") or "").strip():
+            target["example"] = data["example"]
+            target["dirty"] = True
+        if data["meaning"] and not (target.get("meaning") or "").strip():
+            target["meaning"] = data["meaning"]
+            target["dirty"] = True
+
+    ids = {key: int(current["id"]) for key, current in existing.items()}
+    if new_rows:
+        db.executemany(
+            """INSERT INTO items(item_type, term, reading, meaning, example, tags, created_at,
+                                 term_key, reading_key, jlpt_level)
+                 VALUES(?,?,?,?,?,?,?,?,?,?)""",
+            [
+                (
+                    d["item_type"], d["term"], d["reading"], d["meaning"], d["example"], d["tags"], now,
+                    key[0], key[1], _jlpt_level(_tag_tokens(d["tags"])),
+                )
+                for key, d in new_rows.items()
+            ],
+        )
+        for key, row in _lookup_items_by_keys(db, new_rows.keys()).items():
+            ids[key] = int(row["id"])
+        new_ids = [ids[key] for key in new_rows]
+        db.executemany(
+            """INSERT INTO cards(item_id, due_date, interval_days, ease, lapses, last_grade, is_leech, created_at, updated_at)
+                 VALUES(?,?,?,?,?,?,?,?,?)""",
+            [(item_id, today, 0, 2.2, 0, None, 0, now, now) for item_id in new_ids],
+        )
+        tag_rows: List[Tuple[int, str]] = []
+        for key, d in new_rows.items():
+            tag_rows.extend(_item_tag_rows(ids[key], d["tags"]))
+        db.executemany("INSERT OR IGNORE INTO item_tags(item_id, tag) VALUES(?,?)", tag_rows)
+        result.note_new_ids(new_ids)
+        result.imported += len(new_ids)
+
+    dirty = [r for r in existing.values() if r["dirty"]]
+    if dirty:
+        db.executemany(
+            "UPDATE items SET tags=?, example=?, meaning=?, jlpt_level=? WHERE id=?",
+            [(r["tags"], r["example"], r["meaning"], _jlpt_level(_tag_tokens(r["tags"] or "")), r["id"]) for r in dirty],
+        )
+    retagged = [r for r in dirty if r["dirty_tags"]]
+    if retagged:
+        db.executemany("DELETE FROM item_tags WHERE item_id=?", [(r["id"],) for r in retagged])
+        tag_rows = []
+        for r in retagged:
+            tag_rows.extend(_item_tag_rows(int(r["id"]), r["tags"]))
+        db.executemany("INSERT OR IGNORE INTO item_tags(item_id, tag) VALUES(?,?)", tag_rows)
+    if existing:
+        # Existing items keep their card; create one only if it is missing.
+        db.executemany(
+            """INSERT INTO cards(item_id, due_date, interval_days, ease, lapses, last_grade, is_leech, created_at, updated_at)
+                 SELECT ?,?,?,?,?,?,?,?,?
+                 WHERE NOT EXISTS (SELECT 1 FROM cards WHERE item_id=?)""",
+            [(r["id"], today, 0, 2.2, 0, None, 0, now, now, r["id"]) for r in existing.values()],
+        )
+
+    if sentences:
+        db.executemany(
+            _SENTENCE_INSERT
+            + """ SELECT ?,?,?,?,?,?,?,?,?
+                 WHERE NOT EXISTS (SELECT 1 FROM sentences WHERE item_id=? AND sentence=?)""",
+            [
+                (
+                    ids[key], d["example"], d["cloze"], d["answer"], "example", now,
+                    d["cloze_fallback"], d["cloze_reason"], CLOZE_VERSION, ids[key], d["example"],
+                )
+                for key, d in sentences
+            ],
+        )
+
+    for row_num, key in duplicates:
+        result.note_duplicate(f"Row {row_num}: trùng term+reading (id={ids[key]})")
+
+
+def bulk_import_items(
+    db: sqlite3.Connection,
+    rows: Iterable[Dict[str, Any]],
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    commit: bool = True,
+) -> ImportResult:
+    """
+    Import mapped rows (item_type/term/reading/meaning/example/tags, optional
+    row_num and precomputed cloze_preview) in one transaction, chunk by chunk:
+    one key lookup per chunk, executemany for items/cards/sentences/tags and an
+    in-memory dedupe map for rows of the chunk. Duplicates merge tags/example
+    like create_item_with_card. Any exception (including a cancel raised by
+    the rows iterator) rolls the whole batch back. With commit=False the
+    caller owns the transaction (the import job commits a chunk together with
+    its checkpoint).
+    """
+    result = ImportResult()
+    try:
+        for chunk in _chunked(rows, max(1, chunk_size)):
+            _import_chunk(db, chunk, result)
+        if commit:
+            db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+    return result
+
+
 _JP_TOKEN = re.compile(r"[\u3400-\u9FFF\u3040-\u30FF\u3005\u30FC]+")
 
 
@@ -161,6 +418,60 @@ def build_cloze(sentence: str, answer: str) -> Tuple[str, str]:
     return cloze, ans
 
 
+# Bump when build_cloze_preview changes; rebuild_clozes() then regenerates
+# every sentence stored with an older version.
+CLOZE_VERSION = 1
+CLOZE_REBUILD_BATCH = 1000
+
+_SENTENCE_INSERT = """INSERT INTO sentences(item_id, sentence, cloze, answer, kind, created_at,
+                                           cloze_fallback, cloze_reason, cloze_version)"""
+
+
+def _insert_sentence(db: sqlite3.Connection, item_id: int, sentence: str, term: str, kind: str = "example") -> None:
+    cloze, answer, used_fallback, reason = build_cloze_preview(sentence, term)
+    db.execute(
+        _SENTENCE_INSERT + " VALUES(?,?,?,?,?,?,?,?,?)",
+        (item_id, sentence, cloze, answer, kind, now_iso(), int(used_fallback), reason, CLOZE_VERSION),
+    )
+
+
+def rebuild_clozes(db: sqlite3.Connection, all_rows: bool = False, commit: bool = True) -> int:
+    """
+    Regenerate cloze/answer/cloze_fallback/cloze_reason from sentence + item term,
+    for sentences built by an older CLOZE_VERSION (or every sentence with
+    all_rows). Corpus sentences keep the cloze cut at their match (see
+    app.db.corpus). Walks sentences by id in batches, committing each batch.
+    """
+    updated = 0
+    last_id = 0
+    while True:
+        rows = db.execute(
+            """SELECT s.id, s.sentence, i.term
+                 FROM sentences s JOIN items i ON i.id = s.item_id
+                WHERE s.id > ? AND s.kind <> 'corpus'
+                  AND (? OR s.cloze_version IS NULL OR s.cloze_version < ?)
+                ORDER BY s.id
+                LIMIT ?""",
+            (last_id, int(all_rows), CLOZE_VERSION, CLOZE_REBUILD_BATCH),
+        ).fetchall()
+        if not rows:
+            break
+        updates = []
+        for row in rows:
+            cloze, answer, used_fallback, reason = build_cloze_preview(row["sentence"] or "", row["term"] or "")
+            updates.append((cloze, answer, int(used_fallback), reason, CLOZE_VERSION, row["id"]))
+        db.executemany(
+            """UPDATE sentences SET cloze=?, answer=?, cloze_fallback=?, cloze_reason=?, cloze_version=?
+                WHERE id=?""",
+            updates,
+        )
+        if commit:
+            db.commit()
+        updated += len(updates)
+        last_id = int(rows[-1]["id"])
+    return updated
+
+
 def _tag_tokens(tags: str) -> List[str]:
     parts = re.split(r"[,\s/|]+", tags or "")
     cleaned = []
@@ -170,6 +481,31 @@ def _tag_tokens(tags: str) -> List[str]:
             cleaned.append(token)
     return cleaned
 
+JLPT_LEVELS = ["N5", "N4", "N3", "N2", "N1"]
+
+
+def _jlpt_level(tokens: Iterable[str]) -> Optional[str]:
+    """Derived level of an item: the easiest JLPT tag it carries (N5 first)."""
+    upper = {t.upper() for t in tokens}
+    for lvl in JLPT_LEVELS:
+        if lvl in upper:
+            return lvl
+    return None
+
+
+def _item_tag_rows(item_id: int, tags: str) -> List[Tuple[int, str]]:
+    return [(item_id, tag) for tag in dict.fromkeys(t.lower() for t in _tag_tokens(tags))]
+
+
+def _sync_item_tags(db: sqlite3.Connection, item_id: int, tags: str) -> None:
+    """
+    Keep item_tags and items.jlpt_level in step with items.tags (no commit).
+    """
+    db.execute("DELETE FROM item_tags WHERE item_id=?", (item_id,))
+    db.executemany("INSERT OR IGNORE INTO item_tags(item_id, tag) VALUES(?,?)", _item_tag_rows(item_id, tags))
+    db.execute("UPDATE items SET jlpt_level=? WHERE id=?", (_jlpt_level(_tag_tokens(tags)), item_id))
+
+
 def count_due_cards(db: sqlite3.Connection, date_str: Optional[str] = None) -> int:
     date_str = date_str or today_date_str()
     cur = db.execute("SELECT COUNT(*) AS c FROM cards WHERE due_date <= ?", (date_str,))
@@ -185,25 +521,36 @@ def _apply_tag_filter_sql(
     tag_filter: Optional[str],
     level_filter: Optional[str],
 ) -> Tuple[str, List[Any]]:
-    if tag_filter:
-        base_query += " AND lower(COALESCE(i.tags,'')) LIKE '%'||lower(?)||'%'"
-        params.append(tag_filter.strip())
+    # Exact tag tokens via the item_tags index (every token must match).
+    for tag in dict.fromkeys(t.lower() for t in _tag_tokens(tag_filter or "")):
+        base_query += " AND i.id IN (SELECT item_id FROM item_tags WHERE tag = ?)"
+        params.append(tag)
     if level_filter:
         lvl = level_filter.strip()
         if lvl:
-            base_query += " AND (','||lower(COALESCE(i.tags,''))||',') LIKE '%'||lower(?)||'%'"
+            # any level tag, not items.jlpt_level (only the easiest of "N5, N4")
+            base_query += " AND EXISTS (SELECT 1 FROM item_tags t WHERE t.item_id = i.id AND t.tag = lower(?))"
             params.append(lvl)
     return base_query, params
 
 
+def due_card_key(row: Any) -> Tuple[int, int, str, int]:
+    """Sort key of fetch_due_cards (leeches first, then most lapses, oldest due, id)."""
+    return (-int(row["is_leech"]), -int(row["lapses"]), str(row["due_date"]), int(row["id"]))
+
+
 def fetch_due_cards(
     db: sqlite3.Connection,
     limit: int = 50,
     leech_only: bool = False,
     tag_filter: Optional[str] = None,
     level_filter: Optional[str] = None,
+    after: Optional[Tuple[int, int, str, int]] = None,
 ) -> List[sqlite3.Row]:
-    # Fetch due cards joined with item fields
+    """
+    Due cards joined with item fields, in due_card_key order. `after` is the
+    key of the last row of the previous page (keyset pagination).
+    """
     query = """
         SELECT c.*, i.item_type, i.term, i.reading, i.meaning, i.example, i.tags
         FROM cards c
@@ -213,8 +560,12 @@ def fetch_due_cards(
     params: List[Any] = [today_date_str()]
     if leech_only:
         query += " AND c.is_leech = 1"
+    if after is not None:
+        query += " AND (-c.is_leech, -c.lapses, c.due_date, c.id) > (?, ?, ?, ?)"
+        params.extend(after)
     query, params = _apply_tag_filter_sql(query, params, tag_filter, level_filter)
-    query += " ORDER BY c.is_leech DESC, c.lapses DESC, c.due_date ASC, c.id ASC LIMIT ?"
+    # same expressions as idx_cards_queue so the index supplies the order
+    query += " ORDER BY -c.is_leech, -c.lapses, c.due_date, c.id LIMIT ?"
     params.append(limit)
     cur = db.execute(query, params)
     return list(cur.fetchall())
@@ -227,15 +578,100 @@ def update_card(
     ease: float,
     lapses: int,
     last_grade: str,
-    is_leech: int
+    is_leech: int,
+    stability: Optional[float] = None,
+    difficulty: Optional[float] = None,
+    reviewed_at: Optional[str] = None,
+    commit: bool = True,
 ) -> None:
+    # stability/difficulty are only written by the FSRS scheduler; SM-2 keeps
+    # whatever is stored. reviewed_at: grading time when the write is deferred.
+    now = reviewed_at or now_iso()
     db.execute(
         """UPDATE cards
-             SET due_date=?, interval_days=?, ease=?, lapses=?, last_grade=?, is_leech=?, updated_at=?
+             SET due_date=?, interval_days=?, ease=?, lapses=?, last_grade=?, is_leech=?, updated_at=?,
+                 stability=COALESCE(?, stability), difficulty=COALESCE(?, difficulty), last_review_day=?
              WHERE id=?""",
-        (due_date, interval_days, ease, lapses, last_grade, is_leech, now_iso(), card_id),
+        (
+            due_date, interval_days, ease, lapses, last_grade, is_leech, now,
+            stability, difficulty, day_number(now[:10]), card_id,
+        ),
+    )
+    if commit:
+        db.commit()
+
+
+_settings_version = 0  # bumped by set_setting so views can drop cached settings
+
+
+def settings_version() -> int:
+    return _settings_version
+
+
+def get_setting(db: sqlite3.Connection, key: str, default: Optional[str] = None) -> Optional[str]:
+    row = db.execute("SELECT value FROM settings WHERE key=?", (key,)).fetchone()
+    return default if row is None or row["value"] is None else row["value"]
+
+
+def set_setting(db: sqlite3.Connection, key: str, value: Optional[str]) -> None:
+    global _settings_version
+    db.execute(
+        "INSERT INTO settings(key, value) VALUES(?,?) ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+        (key, value),
     )
     db.commit()
+    _settings_version += 1
+
+
+REVIEW_LOG_SOURCE = "review_log"  # daily_stats source for review_logs rows
+
+
+def _bump_daily_stats(
+    db: sqlite3.Connection,
+    day: int,
+    source: str,
+    is_correct: Optional[int],
+    duration_ms: Optional[int],
+) -> None:
+    """
+    Fold one attempt/review into the daily_stats rollup (same transaction, no commit).
+    Ungraded rows still create the (day, source) row so the day counts as active.
+    """
+    db.execute(
+        """INSERT INTO daily_stats(day, source, total, correct, duration_ms_sum)
+             VALUES(?,?,?,?,?)
+             ON CONFLICT(day, source) DO UPDATE SET
+                total = total + excluded.total,
+                correct = correct + excluded.correct,
+                duration_ms_sum = duration_ms_sum + excluded.duration_ms_sum""",
+        (day, source, 0 if is_correct is None else 1, is_correct or 0, duration_ms or 0),
+    )
+
+
+def rebuild_daily_stats(db: sqlite3.Connection, commit: bool = True) -> int:
+    """
+    Recompute daily_stats from attempts and review_logs. Returns the number of rollup rows.
+    """
+    db.execute("DELETE FROM daily_stats")
+    db.execute(
+        """INSERT INTO daily_stats(day, source, total, correct, duration_ms_sum)
+             SELECT day, source, COUNT(is_correct), COALESCE(SUM(is_correct), 0), COALESCE(SUM(duration_ms), 0)
+             FROM attempts
+             WHERE day IS NOT NULL
+             GROUP BY day, source"""
+    )
+    db.execute(
+        """INSERT INTO daily_stats(day, source, total, correct, duration_ms_sum)
+             SELECT day, ?, COUNT(*), COALESCE(SUM(is_correct), 0), 0
+             FROM review_logs
+             WHERE day IS NOT NULL
+             GROUP BY day""",
+        (REVIEW_LOG_SOURCE,),
+    )
+    rows = int(db.execute("SELECT COUNT(*) FROM daily_stats").fetchone()[0])
+    if commit:
+        db.commit()
+    return rows
 
 
 def record_attempt(
@@ -252,7 +688,8 @@ def record_attempt(
     is_correct: Optional[bool] = None,
     score: Optional[float] = None,
     duration_ms: Optional[int] = None,
-    commit: bool = True
+    commit: bool = True,
+    created_at: Optional[str] = None,
 ) -> int:
     correct_val = None
     if is_correct is True:
@@ -260,12 +697,13 @@ def record_attempt(
     elif is_correct is False:
         correct_val = 0
 
+    created_at = created_at or now_iso()
     cur = db.execute(
         """INSERT INTO attempts(
                 item_id, card_id, sentence_id, test_id, test_attempt_id,
-                source, prompt, response, expected, is_correct, score, duration_ms, created_at
+                source, prompt, response, expected, is_correct, score, duration_ms, created_at, day
             )
-            VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?)""",
+            VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?)""",
         (
             item_id,
             card_id,
@@ -279,10 +717,12 @@ def record_attempt(
             correct_val,
             score,
             duration_ms,
-            now_iso(),
+            created_at,
+            day_number(created_at[:10]),
         ),
     )
     attempt_id = int(cur.lastrowid)
+    _bump_daily_stats(db, day_number(created_at[:10]), source, correct_val, duration_ms)
     if commit:
         db.commit()
     return attempt_id
@@ -407,13 +847,39 @@ def log_review(
     item_id: Optional[int] = None,
     prompt: str = "",
     expected: str = "",
-    response: Optional[str] = None
-) -> None:
-    db.execute(
-        """INSERT INTO review_logs(card_id, grade, is_correct, created_at)
-             VALUES(?,?,?,?)""",
-        (card_id, grade, 1 if is_correct else 0, now_iso()),
+    response: Optional[str] = None,
+    prev: Optional[Dict[str, Any]] = None,
+    scheduler: Optional[str] = None,
+    event_id: Optional[str] = None,
+    created_at: Optional[str] = None,
+    commit: bool = True,
+) -> bool:
+    """
+    Log one SRS review. prev is the card row before grading (interval_days,
+    ease, stability, difficulty, last_review_day) so the review can be replayed
+    or used to fit scheduler parameters. With an event_id the call is
+    idempotent: returns False (and writes nothing) if it was already logged.
+    """
+    created_at = created_at or now_iso()
+    day = day_number(created_at[:10])
+    prev = prev or {}
+    last_day = prev.get("last_review_day")
+    cur = db.execute(
+        """INSERT INTO review_logs(card_id, grade, is_correct, created_at, day, elapsed_days,
+                                   prev_interval_days, prev_ease, prev_stability, prev_difficulty, scheduler,
+                                   event_id)
+             VALUES(?,?,?,?,?,?,?,?,?,?,?,?)
+             ON CONFLICT(event_id) WHERE event_id IS NOT NULL DO NOTHING""",
+        (
+            card_id, grade, 1 if is_correct else 0, created_at, day,
+            None if last_day is None else day - int(last_day),
+            prev.get("interval_days"), prev.get("ease"), prev.get("stability"), prev.get("difficulty"),
+            scheduler, event_id,
+        ),
     )
+    if cur.rowcount == 0:
+        return False
+    _bump_daily_stats(db, day, REVIEW_LOG_SOURCE, 1 if is_correct else 0, None)
 
     attempt_id = record_attempt(
         db,
@@ -425,6 +891,7 @@ def log_review(
         expected=expected,
         is_correct=is_correct,
         commit=False,
+        created_at=created_at,
     )
 
     if item_id is not None:
@@ -446,20 +913,22 @@ def log_review(
                 commit=False,
             )
 
-    db.commit()
+    if commit:
+        db.commit()
+    return True
 
 
 def get_review_stats(db: sqlite3.Connection, date_str: Optional[str] = None) -> Dict[str, Any]:
     date_str = date_str or today_date_str()
     cur = db.execute(
-        """SELECT COUNT(*) AS total, SUM(is_correct) AS correct
-             FROM review_logs
-             WHERE substr(created_at,1,10)=?""",
-        (date_str,),
+        """SELECT total, correct
+             FROM daily_stats
+             WHERE day=? AND source=?""",
+        (day_number(date_str), REVIEW_LOG_SOURCE),
     )
     row = cur.fetchone()
-    total = int(row["total"] or 0)
-    correct = int(row["correct"] or 0)
+    total = int(row["total"] or 0) if row else 0
+    correct = int(row["correct"] or 0) if row else 0
     accuracy = (correct / total * 100) if total > 0 else 0.0
     return {"date": date_str, "total": total, "correct": correct, "accuracy": accuracy}
 
@@ -470,14 +939,15 @@ def get_attempt_timeseries(db: sqlite3.Connection, days: int = 7) -> List[Dict[s
     """
     cur = db.execute(
         """
-        SELECT substr(created_at,1,10) AS d, COUNT(*) AS total, SUM(is_correct) AS correct
-        FROM attempts
-        WHERE is_correct IS NOT NULL AND date(created_at) >= date('now', ?)
-        GROUP BY d
-        ORDER BY d DESC
+        SELECT day, SUM(total) AS total, SUM(correct) AS correct
+        FROM daily_stats
+        WHERE day >= ? AND source <> ?
+        GROUP BY day
+        HAVING SUM(total) > 0
+        ORDER BY day DESC
         LIMIT ?
         """,
-        (f"-{max(0, days-1)} days", days),
+        (today_day() - max(0, days - 1), REVIEW_LOG_SOURCE, days),
     )
     rows = cur.fetchall()
     out: List[Dict[str, Any]] = []
@@ -486,7 +956,7 @@ def get_attempt_timeseries(db: sqlite3.Connection, days: int = 7) -> List[Dict[s
         correct = int(row["correct"] or 0)
         out.append(
             {
-                "date": row["d"],
+                "date": day_to_date_str(row["day"]),
                 "total": total,
                 "correct": correct,
                 "accuracy": (correct / total * 100) if total else 0.0,
@@ -502,12 +972,11 @@ def get_attempt_stats(db: sqlite3.Connection, date_str: Optional[str] = None) ->
     date_str = date_str or today_date_str()
     cur = db.execute(
         """
-        SELECT source, COUNT(*) AS total, SUM(is_correct) AS correct
-        FROM attempts
-        WHERE substr(created_at,1,10)=? AND is_correct IS NOT NULL
-        GROUP BY source
+        SELECT source, total, correct
+        FROM daily_stats
+        WHERE day=? AND source <> ? AND total > 0
         """,
-        (date_str,),
+        (day_number(date_str), REVIEW_LOG_SOURCE),
     )
     by_source: Dict[str, Dict[str, Any]] = {}
     total = 0
@@ -528,57 +997,65 @@ def get_attempt_stats(db: sqlite3.Connection, date_str: Optional[str] = None) ->
     return {"date": date_str, "total": total, "correct": correct, "accuracy": accuracy, "by_source": by_source}
 
 
-def get_streak(db: sqlite3.Connection, max_days: int = 60) -> int:
+def get_streak(db: sqlite3.Connection) -> Dict[str, int]:
     """
-    Count consecutive days (including today) with at least one activity
-    (SRS review log or any attempt).
+    Current streak (consecutive active days ending today, 0 if today is idle)
+    and longest streak ever, in one gaps-and-islands pass over the active days
+    recorded in daily_stats (any SRS review log or attempt).
     """
-    streak = 0
-    today = today_date_str()
-    cur_date = today
-    for _ in range(max_days):
-        cur = db.execute(
-            """
-            SELECT 1 FROM (
-                SELECT created_at FROM review_logs
-                UNION ALL
-                SELECT created_at FROM attempts
-            )
-            WHERE substr(created_at,1,10)=?
-            LIMIT 1
-            """,
-            (cur_date,),
+    cur = db.execute(
+        """
+        WITH days AS (
+            SELECT DISTINCT day FROM daily_stats
+        ),
+        islands AS (
+            SELECT day, day - ROW_NUMBER() OVER (ORDER BY day) AS grp FROM days
+        ),
+        runs AS (
+            SELECT MAX(day) AS end_day, COUNT(*) AS len FROM islands GROUP BY grp
         )
-        if cur.fetchone() is None:
-            break
-        streak += 1
-        cur_date = add_days(cur_date, -1)
-    return streak
+        SELECT
+            COALESCE(MAX(CASE WHEN end_day = ? THEN len END), 0) AS current,
+            COALESCE(MAX(len), 0) AS longest
+        FROM runs
+        """,
+        (today_day(),),
+    )
+    row = cur.fetchone()
+    return {"current": int(row["current"]), "longest": int(row["longest"])}
+
+
+def get_level_counts(db: sqlite3.Connection, date_str: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+    """
+    Due and total card counts per JLPT level tag, in one grouped query. An item
+    tagged with several levels counts under each (same as the level filter).
+    Returns {"N5": {"due": .., "total": ..}, ...} for N5..N1.
+    """
+    date_str = date_str or today_date_str()
+    counts = {lvl: {"due": 0, "total": 0} for lvl in JLPT_LEVELS}
+    levels = [lvl.lower() for lvl in JLPT_LEVELS]
+    cur = db.execute(
+        f"""
+        SELECT t.tag AS level, COUNT(*) AS total, SUM(c.due_date <= ?) AS due
+        FROM item_tags t
+        JOIN cards c ON c.item_id = t.item_id
+        WHERE t.tag IN ({",".join("?" for _ in levels)})
+        GROUP BY t.tag
+        """,
+        [date_str] + levels,
+    )
+    for row in cur.fetchall():
+        counts[row["level"].upper()] = {"due": int(row["due"] or 0), "total": int(row["total"] or 0)}
+    return counts
 
 
 def get_level_breakdown(db: sqlite3.Connection, due_only: bool = True) -> Dict[str, int]:
     """
-    Count cards per JLPT tag (N5..N1). Very lightweight, using tags text.
+    Count cards per JLPT level (N5..N1).
     If due_only=True, only counts cards due today or earlier.
     """
-    levels = ["N5", "N4", "N3", "N2", "N1"]
-    counts = {lvl: 0 for lvl in levels}
-    if due_only:
-        rows = fetch_due_cards(db, limit=10000, leech_only=False)
-    else:
-        cur = db.execute(
-            """SELECT c.*, i.tags
-                 FROM cards c JOIN items i ON i.id = c.item_id"""
-        )
-        rows = cur.fetchall()
-    for row in rows:
-        tag_set = {t.lower() for t in _tag_tokens(row["tags"] or "")}
-        if not tag_set:
-            continue
-        for lvl in levels:
-            if lvl.lower() in tag_set:
-                counts[lvl] += 1
-    return counts
+    key = "due" if due_only else "total"
+    return {lvl: data[key] for lvl, data in get_level_counts(db).items()}
 
 
 def get_leech_due_count(db: sqlite3.Connection) -> int:
@@ -589,16 +1066,147 @@ def get_leech_due_count(db: sqlite3.Connection) -> int:
     return int(cur.fetchone()[0])
 
 
+_IN_BATCH = 500  # ids per IN (...) list, well under SQLITE_MAX_VARIABLE_NUMBER
+
+
 def get_items_by_ids(db: sqlite3.Connection, ids: Iterable[int]) -> List[sqlite3.Row]:
     ids = list(ids)
-    if not ids:
-        return []
-    placeholders = ",".join("?" for _ in ids)
+    rows: List[sqlite3.Row] = []
+    for start in range(0, len(ids), _IN_BATCH):
+        batch = ids[start : start + _IN_BATCH]
+        placeholders = ",".join("?" for _ in batch)
+        cur = db.execute(f"SELECT * FROM items WHERE id IN ({placeholders})", batch)
+        rows.extend(cur.fetchall())
+    rows.sort(key=lambda r: r["id"], reverse=True)
+    return rows
+
+
+_TRIGRAM = 3  # shortest query the trigram FTS index can answer
+SHORT_QUERY_SCAN = 20_000  # newest items searched for 1-2 character substrings
+
+
+def _like_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+# Columns the short-query fallback matches: the items_fts columns, plus sentences.
+_SHORT_QUERY_COLUMNS = ("i.term", "i.reading", "i.meaning", "i.example", "i.tags")
+
+
+def _short_query_where(terms: Sequence[str]) -> Tuple[str, List[Any]]:
+    where = []
+    params: List[Any] = []
+    for t in terms:
+        pattern = "%" + _like_escape(t) + "%"
+        checks = [f"{col} LIKE ? ESCAPE '\\'" for col in _SHORT_QUERY_COLUMNS]
+        checks.append("EXISTS (SELECT 1 FROM sentences s WHERE s.item_id = i.id AND s.sentence LIKE ? ESCAPE '\\')")
+        where.append("(" + " OR ".join(checks) + ")")
+        params.extend([pattern] * len(checks))
+    return " AND ".join(where), params
+
+
+@dataclass
+class SearchPage:
+    rows: List[sqlite3.Row] = field(default_factory=list)
+    partial: bool = False  # short query: only the newest SHORT_QUERY_SCAN items were searched
+
+
+def _search_items_short(db: sqlite3.Connection, terms: List[str], limit: int, offset: int) -> SearchPage:
+    """
+    Queries too short for trigrams. Items whose term starts with the first
+    term come from a range on idx_items_key (ranked first, like the FTS path);
+    other substring hits follow, newest first, from the newest SHORT_QUERY_SCAN
+    items only: the scan stops once the page is full and a miss never reads
+    the whole table. A page the scan could not fill is flagged partial when
+    older items were left unsearched.
+    """
+    where, params = _short_query_where(terms)
+    key = _fold_key(terms[0])
+    key_range = [key, key + "\U0010ffff"]
+    want = limit + offset
+    rows = db.execute(
+        f"""
+        SELECT i.*, 1 AS is_prefix
+        FROM items i
+        WHERE i.term_key >= ? AND i.term_key < ? AND {where}
+        ORDER BY length(i.term), i.id
+        LIMIT ?
+        """,
+        key_range + params + [want],
+    ).fetchall()
+    partial = False
+    if len(rows) < want:
+        floor = db.execute("SELECT id FROM items ORDER BY id DESC LIMIT 1 OFFSET ?", (SHORT_QUERY_SCAN - 1,)).fetchone()
+        rows += db.execute(
+            f"""
+            SELECT i.*, 0 AS is_prefix
+            FROM items i
+            WHERE i.id >= ? AND (i.term_key IS NULL OR i.term_key < ? OR i.term_key >= ?) AND {where}
+            ORDER BY i.id DESC
+            LIMIT ?
+            """,
+            [floor[0] if floor else 0] + key_range + params + [want - len(rows)],
+        ).fetchall()
+        partial = len(rows) < want and floor is not None and (
+            db.execute("SELECT 1 FROM items WHERE id < ? LIMIT 1", (floor[0],)).fetchone() is not None
+        )
+    return SearchPage(rows[offset:want], partial)
+
+
+def search_items_page(
+    db: sqlite3.Connection,
+    query: str,
+    limit: int = 50,
+    offset: int = 0,
+) -> SearchPage:
+    """
+    Full-text search over items (term/reading/meaning/example/tags) and their sentences.
+    Every whitespace-separated term must match as a substring; items whose term
+    starts with the query rank first, then by bm25 (term > reading > meaning).
+    1-2 character terms are searched in the newest items only (see
+    _search_items_short); the page says so in `partial`.
+    """
+    terms = [t for t in (query or "").split() if t]
+    if not terms:
+        return SearchPage()
+    prefix = _like_escape(terms[0]) + "%"
+
+    if any(len(t) < _TRIGRAM for t in terms):
+        return _search_items_short(db, terms, limit, offset)
+
+    match = " AND ".join('"' + t.replace('"', '""') + '"' for t in terms)
     cur = db.execute(
-        f"SELECT * FROM items WHERE id IN ({placeholders}) ORDER BY id DESC",
-        ids,
+        """
+        WITH hits AS (
+            SELECT rowid AS item_id, bm25(items_fts, 10.0, 6.0, 3.0, 1.0, 1.0) AS score
+            FROM items_fts
+            WHERE items_fts MATCH ?
+            UNION ALL
+            SELECT s.item_id, bm25(sentences_fts) * 0.5 AS score
+            FROM sentences_fts
+            JOIN sentences s ON s.id = sentences_fts.rowid
+            WHERE sentences_fts MATCH ? AND s.item_id IS NOT NULL
+        )
+        SELECT i.*, (i.term LIKE ? ESCAPE '\\') AS is_prefix, MIN(h.score) AS score
+        FROM hits h
+        JOIN items i ON i.id = h.item_id
+        GROUP BY i.id
+        ORDER BY is_prefix DESC, score ASC, i.id ASC
+        LIMIT ? OFFSET ?
+        """,
+        (match, match, prefix, limit, offset),
     )
-    return list(cur.fetchall())
+    return SearchPage(list(cur.fetchall()))
+
+
+def search_items(
+    db: sqlite3.Connection,
+    query: str,
+    limit: int = 50,
+    offset: int = 0,
+) -> List[sqlite3.Row]:
+    """Rows of search_items_page."""
+    return search_items_page(db, query, limit, offset).rows
 
 
 def get_cloze_queue(
@@ -616,6 +1224,8 @@ def get_cloze_queue(
             s.sentence,
             s.cloze,
             s.answer,
+            s.cloze_fallback,
+            s.cloze_reason,
             i.id AS item_id,
             i.item_type,
             i.term,
@@ -640,18 +1250,10 @@ def get_cloze_queue(
     cur = db.execute(query, params)
     rows = cur.fetchall()
 
+    # Pure read: cloze metadata is stored at insert time (see rebuild_clozes).
     out: List[Dict[str, Any]] = []
-    updates: List[Tuple[str, str, int]] = []  # cloze, answer, id
     for row in rows:
-        answer = row["answer"] or row["term"]
-        cloze = row["cloze"]
-        used_fallback = False
-        reason = ""
-        if not cloze:
-            cloze, answer, used_fallback, reason = build_cloze_preview(row["sentence"], answer)
-            updates.append((cloze, answer, row["sentence_id"]))
-        else:
-            _, _, used_fallback, reason = build_cloze_preview(row["sentence"], answer)
+        cloze, answer = _ensure_cloze_data(row)
         out.append(
             {
                 "sentence_id": row["sentence_id"],
@@ -666,18 +1268,11 @@ def get_cloze_queue(
                 "tags": row["tags"],
                 "mistake_count": row["mistake_count"],
                 "last_mistake_at": row["last_mistake_at"],
-                "cloze_fallback": used_fallback,
-                "cloze_reason": reason,
+                "cloze_fallback": bool(row["cloze_fallback"]),
+                "cloze_reason": row["cloze_reason"] or "",
             }
         )
 
-    if updates:
-        db.executemany(
-            "UPDATE sentences SET cloze=?, answer=? WHERE id=?",
-            updates,
-        )
-        db.commit()
-
     return out
 
 
@@ -711,17 +1306,17 @@ def update_test_attempt(db: sqlite3.Connection, attempt_id: int, score: float, d
     db.commit()
 
 
-def _ensure_cloze_data(row: sqlite3.Row, updates: List[Tuple[str, str, int]]) -> Tuple[str, str]:
+def _ensure_cloze_data(row: sqlite3.Row) -> Tuple[str, str]:
+    # Rows missed by rebuild_clozes get an in-memory cloze; reads never write.
     cloze = row["cloze"]
     answer = row["answer"] or row["term"]
     if not cloze:
-        cloze, answer = build_cloze(row["sentence"], answer)
-        updates.append((cloze, answer, row["sentence_id"]))
+        cloze, answer = build_cloze(row["sentence"] or "", answer)
     return cloze, answer
 
 
-def _question_from_row(row: sqlite3.Row, source_label: str, updates: List[Tuple[str, str, int]]) -> Dict[str, Any]:
-    cloze, answer = _ensure_cloze_data(row, updates)
+def _question_from_row(row: sqlite3.Row, source_label: str) -> Dict[str, Any]:
+    cloze, answer = _ensure_cloze_data(row)
     card_id = None
     try:
         card_id = row["card_id"]
@@ -743,6 +1338,165 @@ def _question_from_row(row: sqlite3.Row, source_label: str, updates: List[Tuple[
     }
 
 
+# Mini-test pools are sampled by probing items in a fixed pseudo-random order:
+# the shuffle key (id * 2654435769) % 2**32 is a golden-ratio hash, a
+# bijection on 32-bit ids that spreads contiguous id blocks (levels imported
+# one after another) evenly over the key space. idx_items_shuffle and
+# idx_item_tags_shuffle (per tag) index it, so a probe is one seek to a random
+# key plus at most PROBE_WINDOW candidates, and a batch costs O(k) probes
+# however the pool is laid out, instead of sorting every candidate (ORDER BY
+# RANDOM()). Pools too sparse for the probes are enumerated and sampled.
+MISTAKE_POOL_SOURCES = ("sentence", "test", "srs")
+ROTATION_SOURCES = ("sentence", "test")  # attempts that count as "seen this sentence"
+PROBES_PER_PICK = 3  # probes per wanted question before enumerating the pool
+PROBE_WINDOW = 64  # candidates a probe looks at in shuffle order
+SHUFFLE_MOD = 4294967296
+
+
+def _shuffle_key(col: str) -> str:
+    # must stay textually the indexed expression (schema migration 14)
+    return f"({col} * 2654435769) % 4294967296"
+
+
+def _test_pool_sql(
+    pool: str,
+    today: str,
+    tag_filter: Optional[str],
+    level_filter: Optional[str],
+) -> Tuple[str, List[Any], str, List[Any]]:
+    """
+    (SELECT list, its params, WHERE conditions on items i, their params) of a
+    pool: rows are (item_id, card_id), filters included.
+    """
+    has_sentence = "EXISTS (SELECT 1 FROM sentences s WHERE s.item_id = i.id)"
+    if pool == "due":
+        card = "(SELECT c.id FROM cards c WHERE c.item_id = i.id AND c.due_date <= ? ORDER BY c.id LIMIT 1)"
+        select_params: List[Any] = [today]
+        where = f"{has_sentence} AND EXISTS (SELECT 1 FROM cards c WHERE c.item_id = i.id AND c.due_date <= ?)"
+        where_params: List[Any] = [today]
+    elif pool == "mistake":
+        sources = ",".join("?" for _ in MISTAKE_POOL_SOURCES)
+        card, select_params = "NULL", []
+        where = f"{has_sentence} AND i.id IN (SELECT m.item_id FROM mistakes m WHERE m.source IN ({sources}))"
+        where_params = list(MISTAKE_POOL_SOURCES)
+    else:
+        card = "(SELECT c.id FROM cards c WHERE c.item_id = i.id ORDER BY c.id LIMIT 1)"
+        select_params, where, where_params = [], has_sentence, []
+    where, where_params = _apply_tag_filter_sql(where, where_params, tag_filter, level_filter)
+    return f"i.id AS item_id, {card} AS card_id", select_params, where, where_params
+
+
+def _driving_tag(tag_filter: Optional[str], level_filter: Optional[str]) -> Optional[str]:
+    """The item_tags tag to probe through: the first tag token, else the level."""
+    tokens = _tag_tokens(tag_filter or "")
+    if tokens:
+        return tokens[0].lower()
+    level = (level_filter or "").strip()
+    return level.lower() or None
+
+
+def _sample_test_pool(
+    db: sqlite3.Connection,
+    pool: str,
+    k: int,
+    rng: random.Random,
+    taken: Dict[int, Tuple[str, Optional[int]]],
+    tag_filter: Optional[str],
+    level_filter: Optional[str],
+) -> None:
+    """Add up to k items of `pool` not in `taken` (item_id -> (pool, card_id))."""
+    if k <= 0:
+        return
+    want = len(taken) + k
+    select, select_params, where, where_params = _test_pool_sql(pool, today_date_str(), tag_filter, level_filter)
+    tag = _driving_tag(tag_filter, level_filter)
+
+    def add(rows) -> bool:
+        for row in rows:
+            if row["item_id"] not in taken:
+                taken[row["item_id"]] = (pool, row["card_id"])
+                if len(taken) >= want:
+                    return True
+        return False
+
+    # The mistakes pool is small (one row per item and source): enumerate it.
+    if pool != "mistake":
+        if tag is None:
+            window = (
+                f"SELECT i2.id AS item_id, {_shuffle_key('i2.id')} AS k FROM items i2"
+                f" WHERE {_shuffle_key('i2.id')} >= ? ORDER BY {_shuffle_key('i2.id')} LIMIT {PROBE_WINDOW}"
+            )
+            window_params: List[Any] = []
+        else:
+            window = (
+                f"SELECT t.item_id, {_shuffle_key('t.item_id')} AS k FROM item_tags t"
+                f" WHERE t.tag = ? AND {_shuffle_key('t.item_id')} >= ?"
+                f" ORDER BY {_shuffle_key('t.item_id')} LIMIT {PROBE_WINDOW}"
+            )
+            window_params = [tag]
+        # a few members per probe, so an already taken one does not waste it
+        probe_sql = (
+            f"SELECT {select} FROM ({window}) w CROSS JOIN items i ON i.id = w.item_id"
+            f" WHERE {where} ORDER BY w.k LIMIT 4"
+        )
+        head = select_params + window_params
+        for _ in range(k * PROBES_PER_PICK):
+            rows = db.execute(probe_sql, head + [rng.randrange(SHUFFLE_MOD)] + where_params).fetchall()
+            for row in rows:
+                if row["item_id"] not in taken:
+                    if add([row]):
+                        return
+                    break
+
+    # Sparse (or small) pool: take the rest uniformly from every member.
+    if tag is None:
+        sql = f"SELECT {select} FROM items i WHERE {where}"
+        params = select_params + where_params
+        if pool == "due":
+            # drive from the due range of idx_cards_due, not every item
+            sql += " AND i.id IN (SELECT item_id FROM cards WHERE due_date <= ?)"
+            params.append(today_date_str())
+    else:
+        sql = f"SELECT {select} FROM item_tags t CROSS JOIN items i ON i.id = t.item_id WHERE t.tag = ? AND {where}"
+        params = select_params + [tag] + where_params
+    rows = db.execute(sql + " ORDER BY i.id", params).fetchall()
+    rng.shuffle(rows)
+    add(rows)
+
+
+def _rotate_sentences(db: sqlite3.Connection, item_ids: Sequence[int], rng: random.Random) -> Dict[int, sqlite3.Row]:
+    """
+    One sentence per item: never-practised sentences first, then the one
+    practised longest ago, so repeated tests walk through an item's sentences.
+    """
+    if not item_ids:
+        return {}
+    items = ",".join("?" for _ in item_ids)
+    sources = ",".join("?" for _ in ROTATION_SOURCES)
+    cur = db.execute(
+        f"""
+        SELECT
+            s.id AS sentence_id, s.sentence, s.cloze, s.answer,
+            i.id AS item_id, i.item_type, i.term, i.reading, i.meaning, i.tags,
+            (SELECT MAX(a.id) FROM attempts a
+              WHERE a.item_id = s.item_id AND a.sentence_id = s.id
+                AND a.source IN ({sources})) AS last_attempt_id
+        FROM sentences s
+        JOIN items i ON i.id = s.item_id
+        WHERE s.item_id IN ({items})
+        ORDER BY s.item_id, s.id
+        """,
+        list(ROTATION_SOURCES) + list(item_ids),
+    )
+    best: Dict[int, Tuple[Tuple[int, int, float], sqlite3.Row]] = {}
+    for row in cur.fetchall():
+        last = row["last_attempt_id"]
+        key = (0 if last is None else 1, last or 0, rng.random())
+        if row["item_id"] not in best or key < best[row["item_id"]][0]:
+            best[row["item_id"]] = (key, row)
+    return {item_id: row for item_id, (_, row) in best.items()}
+
+
 def get_test_batch(
     db: sqlite3.Connection,
     total: int = 15,
@@ -750,93 +1504,36 @@ def get_test_batch(
     only_due: bool = False,
     tag_filter: Optional[str] = None,
     level_filter: Optional[str] = None,
+    seed: Optional[int] = None,
 ) -> List[Dict[str, Any]]:
     """
-    Build a mini-test batch mixing: mistakes (sentence/test/srs), due, and fresh sentences.
+    Build a mini-test batch of random items from the mistake (sentence/test/srs),
+    due and fresh pools, one question per item with its sentences in rotation.
+    The same seed on the same data gives the same batch.
     """
     total = max(5, min(total, 30))
     want_mistake = total if only_mistake else min(8, total // 3 + 2)
     want_due = total if only_due else min(8, total // 3 + 2)
-    want_new = total * 2  # grab extra then trim
-
-    updates: List[Tuple[str, str, int]] = []
-    questions: List[Dict[str, Any]] = []
-
-    def fetch(query: str, params: List[Any], label: str, limit: int) -> None:
-        nonlocal questions
-        q = query + " LIMIT ?"
-        cur = db.execute(q, params + [limit])
-        for row in cur.fetchall():
-            questions.append(_question_from_row(row, label, updates))
-
-    # Mistake first
-    mq = """
-        SELECT
-            s.id AS sentence_id, s.sentence, s.cloze, s.answer,
-            i.id AS item_id, i.item_type, i.term, i.reading, i.meaning, i.tags,
-            NULL AS card_id
-        FROM mistakes m
-        JOIN sentences s ON s.item_id = m.item_id
-        JOIN items i ON i.id = s.item_id
-        WHERE m.source IN ('sentence','test','srs')
-    """
-    mparams: List[Any] = []
-    mq, mparams = _apply_tag_filter_sql(mq, mparams, tag_filter, level_filter)
-    mq += " ORDER BY m.last_mistake_at DESC"
-    fetch(mq, mparams, "mistake", want_mistake)
+    rng = random.Random(seed)
 
+    taken: Dict[int, Tuple[str, Optional[int]]] = {}
+    _sample_test_pool(db, "mistake", want_mistake, rng, taken, tag_filter, level_filter)
     if not only_mistake:
-        dq = """
-            SELECT
-                s.id AS sentence_id, s.sentence, s.cloze, s.answer,
-                i.id AS item_id, i.item_type, i.term, i.reading, i.meaning, i.tags,
-                c.id AS card_id
-            FROM cards c
-            JOIN items i ON i.id = c.item_id
-            JOIN sentences s ON s.item_id = c.item_id
-            WHERE c.due_date <= ?
-        """
-        dparams: List[Any] = [today_date_str()]
-        dq, dparams = _apply_tag_filter_sql(dq, dparams, tag_filter, level_filter)
-        dq += " ORDER BY c.due_date ASC"
-        fetch(dq, dparams, "due", want_due if not only_due else total)
-
+        _sample_test_pool(db, "due", min(want_due, total - len(taken)), rng, taken, tag_filter, level_filter)
     if not only_mistake and not only_due:
-        nq = """
-            SELECT
-                s.id AS sentence_id, s.sentence, s.cloze, s.answer,
-                i.id AS item_id, i.item_type, i.term, i.reading, i.meaning, i.tags,
-                c.id AS card_id
-            FROM sentences s
-            JOIN items i ON i.id = s.item_id
-            LEFT JOIN cards c ON c.item_id = i.id
-            WHERE 1=1
-        """
-        nparams: List[Any] = []
-        nq, nparams = _apply_tag_filter_sql(nq, nparams, tag_filter, level_filter)
-        nq += " ORDER BY s.id DESC"
-        fetch(nq, nparams, "new", want_new)
+        _sample_test_pool(db, "new", total - len(taken), rng, taken, tag_filter, level_filter)
 
-    if updates:
-        db.executemany(
-            "UPDATE sentences SET cloze=?, answer=? WHERE id=?",
-            updates,
-        )
-        db.commit()
-
-    # Deduplicate by sentence_id preserving order and trim to total
-    seen = set()
-    unique_questions: List[Dict[str, Any]] = []
-    for q in questions:
-        sid = q["sentence_id"]
-        if sid in seen:
+    sentences = _rotate_sentences(db, list(taken), rng)
+    questions: List[Dict[str, Any]] = []
+    for item_id, (label, card_id) in taken.items():
+        row = sentences.get(item_id)
+        if row is None:  # sentence deleted between sampling and rotation
             continue
-        seen.add(sid)
-        unique_questions.append(q)
-        if len(unique_questions) >= total:
-            break
-
-    return unique_questions
+        q = _question_from_row(row, label)
+        q["card_id"] = card_id
+        questions.append(q)
+    rng.shuffle(questions)
+    return questions[:total]
 
 
 def get_attempt_rows_for_export(
@@ -855,14 +1552,14 @@ def get_attempt_rows_for_export(
         where.append(f"source IN ({placeholders})")
         params.extend(sources)
     if days:
-        where.append("date(created_at) >= date('now', ?)")
-        params.append(f"-{max(0, days-1)} days")
+        where.append("day >= ?")
+        params.append(today_day() - max(0, days - 1))
     sql = f"""
         SELECT created_at, source, item_id, card_id, sentence_id, test_id, test_attempt_id,
                prompt, response, expected, is_correct, score
         FROM attempts
         WHERE {' AND '.join(where)}
-        ORDER BY created_at DESC
+        ORDER BY day DESC, id DESC
         LIMIT ?
     """
     params.append(limit)
@@ -0,0 +1,255 @@
+from __future__ import annotations
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.time_utils import now_iso
+from app.db.database import get_manager, new_db_connection
+from app.db.repo import log_review, update_card
+
+# Write-behind for SRS grading: the review screen hands each grade to a
+# ReviewWriter and moves on; a background thread applies events in batched
+# transactions (group commit). Every event is first appended to a small JSONL
+# journal so a crash before the commit loses nothing: the next start replays
+# it, and review_logs.event_id makes the replay idempotent. A batch whose
+# commit fails is kept and retried every RETRY_INTERVAL; on_error reports
+# the failure (and None once a retry succeeds).
+
+FLUSH_SIZE = 32
+FLUSH_INTERVAL = 1.0  # seconds an event may wait for its batch
+RETRY_INTERVAL = 2.0  # seconds between commits of a failed batch
+JOURNAL_SUFFIX = "-reviews.jsonl"
+
+# card row fields log_review needs from the pre-grade state
+PREV_KEYS = ("interval_days", "ease", "stability", "difficulty", "last_review_day")
+
+
+def journal_path() -> str:
+    return get_manager().path + JOURNAL_SUFFIX
+
+
+@dataclass
+class ReviewEvent:
+    card_id: int
+    grade: str
+    is_correct: bool
+    card: Dict[str, Any]  # new card fields (update_card kwargs)
+    item_id: Optional[int] = None
+    prompt: str = ""
+    expected: str = ""
+    response: Optional[str] = None
+    prev: Dict[str, Any] = field(default_factory=dict)
+    scheduler: Optional[str] = None
+    event_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    created_at: str = field(default_factory=now_iso)
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, line: str) -> "ReviewEvent":
+        return cls(**json.loads(line))
+
+
+def apply_review_event(db: sqlite3.Connection, event: ReviewEvent) -> bool:
+    """Write one event without committing; False if it was already applied."""
+    logged = log_review(
+        db,
+        card_id=event.card_id,
+        grade=event.grade,
+        is_correct=event.is_correct,
+        item_id=event.item_id,
+        prompt=event.prompt,
+        expected=event.expected,
+        response=event.response,
+        prev=event.prev,
+        scheduler=event.scheduler,
+        event_id=event.event_id,
+        created_at=event.created_at,
+        commit=False,
+    )
+    if not logged:
+        return False
+    update_card(
+        db,
+        card_id=event.card_id,
+        last_grade=event.grade,
+        reviewed_at=event.created_at,
+        commit=False,
+        **event.card,
+    )
+    return True
+
+
+class ReviewJournal:
+    """
+    Append-only JSONL of events not yet committed. Truncated once every
+    appended event is in the DB; flushed to the OS on each append, which is
+    as durable as the WAL with synchronous=NORMAL.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._f = open(path, "a", encoding="utf-8")
+
+    def append(self, event: ReviewEvent) -> None:
+        with self._lock:
+            self._f.write(event.to_json() + "\n")
+            self._f.flush()
+            self._pending += 1
+
+    def committed(self, count: int) -> None:
+        with self._lock:
+            self._pending = max(0, self._pending - count)
+            if self._pending == 0:
+                self._f.truncate(0)
+
+    def clear(self) -> None:
+        self.committed(0)
+
+    def read(self) -> List[ReviewEvent]:
+        events: List[ReviewEvent] = []
+        with self._lock, open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    events.append(ReviewEvent.from_json(line))
+                except (ValueError, TypeError):
+                    # torn last line of a crash mid-append: that click never returned
+                    continue
+        return events
+
+    def close(self) -> None:
+        with self._lock:
+            self._f.close()
+
+
+_STOP = object()
+
+
+class ReviewWriter:
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        connect: Callable[[], sqlite3.Connection] = new_db_connection,
+        flush_size: int = FLUSH_SIZE,
+        flush_interval: float = FLUSH_INTERVAL,
+        retry_interval: float = RETRY_INTERVAL,
+        on_error: Optional[Callable[[Optional[BaseException]], None]] = None,
+    ):
+        self.path = path or journal_path()
+        self.connect = connect
+        self.flush_size = max(1, flush_size)
+        self.flush_interval = max(0.0, flush_interval)
+        self.retry_interval = max(0.0, retry_interval)
+        # called on the writer thread: the error of a failed commit, None on recovery
+        self.on_error = on_error
+        self.last_error: Optional[BaseException] = None
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._journal: Optional[ReviewJournal] = None
+        self._db: Optional[sqlite3.Connection] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> int:
+        """Replay what a previous run left in the journal, then start the thread. Returns replayed count."""
+        self._db = self.connect()
+        self._journal = ReviewJournal(self.path)
+        replayed = 0
+        leftover = self._journal.read() if os.path.getsize(self.path) else []
+        if leftover:
+            replayed = self._commit(leftover)
+            if self.last_error is not None:
+                raise self.last_error
+            self._journal.clear()
+        self._thread = threading.Thread(target=self._run, name="review-writer", daemon=True)
+        self._thread.start()
+        return replayed
+
+    def submit(self, event: ReviewEvent) -> None:
+        if self._journal is None or self._thread is None:
+            raise RuntimeError("ReviewWriter is not started")
+        self._journal.append(event)
+        self._queue.put(event)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until everything submitted so far is committed. False on timeout
+        or if the commit failed (last_error); the events stay queued for retry.
+        """
+        if self._thread is None or not self._thread.is_alive():
+            return self.last_error is None
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout) and self.last_error is None
+
+    def close(self) -> None:
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _run(self) -> None:
+        batch: List[ReviewEvent] = []
+        deadline = 0.0
+        while True:
+            timeout = max(0.0, deadline - time.monotonic()) if batch else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if isinstance(item, ReviewEvent):
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append(item)
+                if len(batch) < self.flush_size:
+                    continue
+            # size or time threshold, retry, flush request, or shutdown
+            if batch:
+                failing = self.last_error is not None
+                self._commit(batch)
+                if self.last_error is None:
+                    self._journal.committed(len(batch))
+                    batch = []
+                else:
+                    # keep the batch (it is still in the journal) and retry it
+                    deadline = time.monotonic() + self.retry_interval
+                if self.on_error is not None and (failing or self.last_error is not None):
+                    self.on_error(self.last_error)
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is _STOP:
+                return
+
+    def _commit(self, events: List[ReviewEvent]) -> int:
+        db = self._db
+        assert db is not None
+        self.last_error = None
+        try:
+            applied = 0
+            for ev in events:
+                try:
+                    applied += apply_review_event(db, ev)
+                except sqlite3.IntegrityError:
+                    # card deleted since the click (review_logs FK): nothing to apply
+                    continue
+            db.commit()
+            return applied
+        except Exception as e:
+            # keep the thread alive; _run retries the batch, and the journal
+            # (truncated once nothing is pending) replays it on next start
+            db.rollback()
+            self.last_error = e
+            return 0
@@ -1,5 +1,12 @@
 from __future__ import annotations
+import re
 import sqlite3
+import unicodedata
+from typing import Callable, Dict, List, Tuple
+
+# Migrations are frozen: they never call into app.db.repo, whose helpers keep
+# evolving with the current schema. Logic a backfill needs is copied here as
+# it was when the migration shipped.
 
 
 def _has_column(db: sqlite3.Connection, table: str, column: str) -> bool:
@@ -12,8 +19,27 @@ def _ensure_column(db: sqlite3.Connection, table: str, column: str, ddl: str) ->
         db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
 
 
-def ensure_schema(db: sqlite3.Connection) -> None:
-    db.executescript(
+def _exec_script(db: sqlite3.Connection, script: str) -> None:
+    """
+    Run a multi-statement script statement by statement. Unlike executescript()
+    this does not COMMIT first, so a migration stays inside one transaction.
+    """
+    buf = ""
+    for line in script.splitlines(keepends=True):
+        buf += line
+        if sqlite3.complete_statement(buf):
+            stmt = buf.strip()
+            buf = ""
+            if stmt.rstrip(";").strip():
+                db.execute(stmt)
+    if buf.strip():
+        db.execute(buf)
+
+
+def _migrate_1_base(db: sqlite3.Connection) -> None:
+    # Baseline layout. IF NOT EXISTS keeps it safe on DBs created before migrations.
+    _exec_script(
+        db,
         """
     CREATE TABLE IF NOT EXISTS items (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -131,10 +157,366 @@ def ensure_schema(db: sqlite3.Connection) -> None:
     CREATE INDEX IF NOT EXISTS idx_attempts_created ON attempts(substr(created_at,1,10));
     CREATE INDEX IF NOT EXISTS idx_mistakes_item ON mistakes(item_id);
     CREATE INDEX IF NOT EXISTS idx_mistakes_last ON mistakes(last_mistake_at DESC);
-    """
+    """,
     )
 
     _ensure_column(db, "sentences", "cloze", "TEXT")
     _ensure_column(db, "sentences", "answer", "TEXT")
 
-    db.commit()
+
+def _migrate_2_item_tags(db: sqlite3.Connection) -> None:
+    _exec_script(
+        db,
+        """
+    CREATE TABLE IF NOT EXISTS item_tags (
+        item_id INTEGER NOT NULL,
+        tag TEXT NOT NULL, -- lower-cased token of items.tags
+        PRIMARY KEY(item_id, tag),
+        FOREIGN KEY(item_id) REFERENCES items(id) ON DELETE CASCADE
+    ) WITHOUT ROWID;
+
+    CREATE INDEX IF NOT EXISTS idx_item_tags_tag ON item_tags(tag, item_id);
+    """,
+    )
+    _ensure_column(db, "items", "jlpt_level", "TEXT")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_items_level ON items(jlpt_level)")
+
+    # One-shot backfill from the free-text tags column.
+    tag_rows: List[Tuple[int, str]] = []
+    level_rows: List[Tuple[str, int]] = []
+    for row in db.execute("SELECT id, tags FROM items WHERE COALESCE(tags,'') <> ''"):
+        item_id = int(row["id"])
+        tokens = [t for t in (p.strip().strip("#[]()") for p in re.split(r"[,\s/|]+", row["tags"])) if t]
+        tag_rows.extend((item_id, tag) for tag in dict.fromkeys(t.lower() for t in tokens))
+        upper = {t.upper() for t in tokens}
+        level = next((lvl for lvl in ("N5", "N4", "N3", "N2", "N1") if lvl in upper), None)
+        if level:
+            level_rows.append((level, item_id))
+    db.executemany("INSERT OR IGNORE INTO item_tags(item_id, tag) VALUES(?,?)", tag_rows)
+    db.executemany("UPDATE items SET jlpt_level=? WHERE id=?", level_rows)
+
+
+def _migrate_3_search_fts(db: sqlite3.Connection) -> None:
+    # Trigram tokenizer: substring matching that works for Japanese (no spaces).
+    _exec_script(
+        db,
+        """
+    CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+        term, reading, meaning, example, tags,
+        content='items', content_rowid='id', tokenize='trigram'
+    );
+
+    CREATE TRIGGER IF NOT EXISTS items_fts_ai AFTER INSERT ON items BEGIN
+        INSERT INTO items_fts(rowid, term, reading, meaning, example, tags)
+        VALUES (new.id, new.term, new.reading, new.meaning, new.example, new.tags);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS items_fts_ad AFTER DELETE ON items BEGIN
+        INSERT INTO items_fts(items_fts, rowid, term, reading, meaning, example, tags)
+        VALUES ('delete', old.id, old.term, old.reading, old.meaning, old.example, old.tags);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS items_fts_au AFTER UPDATE OF term, reading, meaning, example, tags ON items BEGIN
+        INSERT INTO items_fts(items_fts, rowid, term, reading, meaning, example, tags)
+        VALUES ('delete', old.id, old.term, old.reading, old.meaning, old.example, old.tags);
+        INSERT INTO items_fts(rowid, term, reading, meaning, example, tags)
+        VALUES (new.id, new.term, new.reading, new.meaning, new.example, new.tags);
+    END;
+
+    CREATE VIRTUAL TABLE IF NOT EXISTS sentences_fts USING fts5(
+        sentence,
+        content='sentences', content_rowid='id', tokenize='trigram'
+    );
+
+    CREATE TRIGGER IF NOT EXISTS sentences_fts_ai AFTER INSERT ON sentences BEGIN
+        INSERT INTO sentences_fts(rowid, sentence) VALUES (new.id, new.sentence);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS sentences_fts_ad AFTER DELETE ON sentences BEGIN
+        INSERT INTO sentences_fts(sentences_fts, rowid, sentence) VALUES ('delete', old.id, old.sentence);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS sentences_fts_au AFTER UPDATE OF sentence ON sentences BEGIN
+        INSERT INTO sentences_fts(sentences_fts, rowid, sentence) VALUES ('delete', old.id, old.sentence);
+        INSERT INTO sentences_fts(rowid, sentence) VALUES (new.id, new.sentence);
+    END;
+
+    INSERT INTO items_fts(items_fts) VALUES ('rebuild');
+    INSERT INTO sentences_fts(sentences_fts) VALUES ('rebuild');
+    """,
+    )
+
+
+def _migrate_4_item_keys(db: sqlite3.Connection) -> None:
+    from app.core.time_utils import now_iso
+
+    def fold(text: str) -> str:
+        return " ".join(unicodedata.normalize("NFKC", text or "").casefold().split())
+
+    _ensure_column(db, "items", "term_key", "TEXT")
+    _ensure_column(db, "items", "reading_key", "TEXT")
+    db.execute(
+        """
+    CREATE TABLE IF NOT EXISTS item_key_collisions (
+        item_id INTEGER NOT NULL,
+        kept_item_id INTEGER NOT NULL,
+        term_key TEXT NOT NULL,
+        reading_key TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        FOREIGN KEY(item_id) REFERENCES items(id) ON DELETE CASCADE,
+        FOREIGN KEY(kept_item_id) REFERENCES items(id) ON DELETE CASCADE
+    )
+    """
+    )
+
+    # Backfill keys; the oldest row owns a key. Later rows that fold to the same
+    # key keep NULL keys (allowed by the unique index) and are reported.
+    owners: Dict[Tuple[str, str], int] = {}
+    key_rows: List[Tuple[str, str, int]] = []
+    collisions: List[Tuple[int, int, str, str, str]] = []
+    for row in db.execute("SELECT id, term, reading FROM items ORDER BY id"):
+        key = (fold(row["term"]), fold(row["reading"]))
+        item_id = int(row["id"])
+        if key in owners:
+            collisions.append((item_id, owners[key], key[0], key[1], now_iso()))
+            continue
+        owners[key] = item_id
+        key_rows.append((key[0], key[1], item_id))
+    db.executemany("UPDATE items SET term_key=?, reading_key=? WHERE id=?", key_rows)
+    db.executemany(
+        """INSERT INTO item_key_collisions(item_id, kept_item_id, term_key, reading_key, created_at)
+             VALUES(?,?,?,?,?)""",
+        collisions,
+    )
+    db.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_items_key ON items(term_key, reading_key)")
+
+
+def _migrate_5_day_columns(db: sqlite3.Connection) -> None:
+    # Integer local day (days since 1970-01-01). created_at is local time, so
+    # the date prefix is already the local day.
+    for table in ("attempts", "review_logs"):
+        _ensure_column(db, table, "day", "INTEGER")
+        db.execute(
+            f"UPDATE {table} SET day = CAST(julianday(substr(created_at,1,10)) - 2440587.5 AS INTEGER)"
+        )
+    _exec_script(
+        db,
+        """
+    DROP INDEX IF EXISTS idx_review_logs_date;
+    DROP INDEX IF EXISTS idx_attempts_created;
+    CREATE INDEX IF NOT EXISTS idx_attempts_day ON attempts(day, source, is_correct);
+    CREATE INDEX IF NOT EXISTS idx_review_logs_day ON review_logs(day, is_correct);
+    """,
+    )
+
+
+def _migrate_6_daily_stats(db: sqlite3.Connection) -> None:
+    db.execute(
+        """
+    CREATE TABLE IF NOT EXISTS daily_stats (
+        day INTEGER NOT NULL,
+        source TEXT NOT NULL, -- attempts.source, or 'review_log' for review_logs
+        total INTEGER NOT NULL DEFAULT 0, -- graded rows (is_correct NOT NULL)
+        correct INTEGER NOT NULL DEFAULT 0,
+        duration_ms_sum INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY(day, source)
+    ) WITHOUT ROWID
+    """
+    )
+    db.execute(
+        """INSERT INTO daily_stats(day, source, total, correct, duration_ms_sum)
+             SELECT day, source, COUNT(is_correct), COALESCE(SUM(is_correct), 0), COALESCE(SUM(duration_ms), 0)
+             FROM attempts
+             WHERE day IS NOT NULL
+             GROUP BY day, source"""
+    )
+    db.execute(
+        """INSERT INTO daily_stats(day, source, total, correct, duration_ms_sum)
+             SELECT day, 'review_log', COUNT(*), COALESCE(SUM(is_correct), 0), 0
+             FROM review_logs
+             WHERE day IS NOT NULL
+             GROUP BY day"""
+    )
+
+
+def _migrate_7_cards_item_index(db: sqlite3.Connection) -> None:
+    # Covers item -> card joins (level breakdown, dedupe card checks) with the due date.
+    db.execute("CREATE INDEX IF NOT EXISTS idx_cards_item ON cards(item_id, due_date)")
+
+
+def _migrate_8_sentences_item_index(db: sqlite3.Connection) -> None:
+    # item -> sentences lookups (import dedupe, cloze/test joins) were full scans.
+    db.execute("CREATE INDEX IF NOT EXISTS idx_sentences_item ON sentences(item_id)")
+
+
+def _migrate_9_import_jobs(db: sqlite3.Connection) -> None:
+    # One row per file of an import batch; checkpointed in the same transaction
+    # as each imported chunk so a cancelled/crashed import can resume.
+    _exec_script(
+        db,
+        """
+    CREATE TABLE IF NOT EXISTS import_jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        batch_key TEXT NOT NULL, -- hash of the ordered (file_hash, level_tag) list
+        position INTEGER NOT NULL, -- file order inside the batch
+        path TEXT NOT NULL,
+        file_hash TEXT NOT NULL,
+        level_tag TEXT,
+        byte_offset INTEGER NOT NULL DEFAULT 0, -- next record starts here
+        row_num INTEGER NOT NULL DEFAULT 2, -- CSV row number of that record
+        imported INTEGER NOT NULL DEFAULT 0,
+        skipped INTEGER NOT NULL DEFAULT 0,
+        errors INTEGER NOT NULL DEFAULT 0,
+        warnings INTEGER NOT NULL DEFAULT 0,
+        status TEXT NOT NULL DEFAULT 'running', -- running / interrupted / done
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_import_jobs_batch ON import_jobs(batch_key, position);
+    """,
+    )
+
+
+def _migrate_10_sentence_cloze_meta(db: sqlite3.Connection) -> None:
+    # Cloze fallback/reason are stored with the cloze so queue reads never
+    # recompute them; cloze_version marks rows to regenerate (rebuild_clozes).
+    # Backfill with the version 1 cloze rules (build_cloze_preview as shipped).
+    _ensure_column(db, "sentences", "cloze_fallback", "INTEGER NOT NULL DEFAULT 0")
+    _ensure_column(db, "sentences", "cloze_reason", "TEXT")
+    _ensure_column(db, "sentences", "cloze_version", "INTEGER")
+    jp_token = re.compile(r"[\u3400-\u9FFF\u3040-\u30FF\u3005\u30FC]+")
+
+    def cloze_v1(sentence: str, answer: str) -> Tuple[str, str, int, str]:
+        ans = (answer or "").strip()
+        if ans and ans in sentence:
+            return sentence.replace(ans, "____", 1), ans, 0, "exact-term"
+        m = jp_token.search(sentence)
+        if m:
+            return sentence.replace(m.group(0), "____", 1), ans or m.group(0), 1, "jp-token"
+        stripped = sentence.strip()
+        if stripped:
+            target = stripped[:2] if len(stripped) > 1 else stripped
+            return sentence.replace(target, "____", 1), ans or target, 1, "prefix"
+        return "____", ans, 1, "empty"
+
+    last_id = 0
+    while True:
+        rows = db.execute(
+            """SELECT s.id, s.sentence, i.term FROM sentences s JOIN items i ON i.id = s.item_id
+                WHERE s.id > ? ORDER BY s.id LIMIT 1000""",
+            (last_id,),
+        ).fetchall()
+        if not rows:
+            break
+        db.executemany(
+            "UPDATE sentences SET cloze=?, answer=?, cloze_fallback=?, cloze_reason=?, cloze_version=1 WHERE id=?",
+            [cloze_v1(row["sentence"] or "", row["term"] or "") + (row["id"],) for row in rows],
+        )
+        last_id = int(rows[-1]["id"])
+
+
+def _migrate_11_fsrs(db: sqlite3.Connection) -> None:
+    # Memory-model state per card, the pre-review state of every review (for
+    # replay/fitting) and a settings table for the scheduler choice.
+    _ensure_column(db, "cards", "stability", "REAL")
+    _ensure_column(db, "cards", "difficulty", "REAL")
+    _ensure_column(db, "cards", "last_review_day", "INTEGER")
+    for column, ddl in (
+        ("elapsed_days", "INTEGER"),  # days since the card's previous review, NULL for the first
+        ("prev_interval_days", "INTEGER"),
+        ("prev_ease", "REAL"),
+        ("prev_stability", "REAL"),
+        ("prev_difficulty", "REAL"),
+        ("scheduler", "TEXT"),
+    ):
+        _ensure_column(db, "review_logs", column, ddl)
+    _exec_script(
+        db,
+        """
+    CREATE TABLE IF NOT EXISTS settings (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_review_logs_card ON review_logs(card_id, id);
+    UPDATE review_logs SET elapsed_days = day - (
+        SELECT p.day FROM review_logs p
+         WHERE p.card_id = review_logs.card_id AND p.id < review_logs.id
+         ORDER BY p.id DESC LIMIT 1
+    );
+    UPDATE cards SET last_review_day = (SELECT MAX(day) FROM review_logs WHERE card_id = cards.id);
+    """,
+    )
+
+
+def _migrate_12_cards_queue_index(db: sqlite3.Connection) -> None:
+    # Review-queue order (leeches, then most lapses, then oldest due): an index
+    # scan returns a page without sorting every due card.
+    db.execute("CREATE INDEX IF NOT EXISTS idx_cards_queue ON cards(-is_leech, -lapses, due_date, id)")
+
+
+def _migrate_13_review_event_id(db: sqlite3.Connection) -> None:
+    # Client-generated id of a deferred review, so replaying the journal after
+    # a crash never logs the same click twice.
+    _ensure_column(db, "review_logs", "event_id", "TEXT")
+    db.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_review_logs_event ON review_logs(event_id) WHERE event_id IS NOT NULL"
+    )
+
+
+def _migrate_14_shuffle_indexes(db: sqlite3.Connection) -> None:
+    # Mini-test sampling probes items in a fixed pseudo-random order (a
+    # golden-ratio multiplicative hash of the id), overall and per tag, so
+    # items imported in contiguous id blocks are spread over the key space.
+    _exec_script(
+        db,
+        """
+    CREATE INDEX IF NOT EXISTS idx_items_shuffle ON items((id * 2654435769) % 4294967296);
+    CREATE INDEX IF NOT EXISTS idx_item_tags_shuffle ON item_tags(tag, (item_id * 2654435769) % 4294967296);
+    """,
+    )
+
+
+# Ordered (version, migration). Append new entries; never edit shipped ones.
+MIGRATIONS: List[Tuple[int, Callable[[sqlite3.Connection], None]]] = [
+    (1, _migrate_1_base),
+    (2, _migrate_2_item_tags),
+    (3, _migrate_3_search_fts),
+    (4, _migrate_4_item_keys),
+    (5, _migrate_5_day_columns),
+    (6, _migrate_6_daily_stats),
+    (7, _migrate_7_cards_item_index),
+    (8, _migrate_8_sentences_item_index),
+    (9, _migrate_9_import_jobs),
+    (10, _migrate_10_sentence_cloze_meta),
+    (11, _migrate_11_fsrs),
+    (12, _migrate_12_cards_queue_index),
+    (13, _migrate_13_review_event_id),
+    (14, _migrate_14_shuffle_indexes),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(db: sqlite3.Connection) -> int:
+    return int(db.execute("PRAGMA user_version").fetchone()[0])
+
+
+def ensure_schema(db: sqlite3.Connection) -> None:
+    # Fast path: no DDL at all when the DB is already current.
+    if get_schema_version(db) >= SCHEMA_VERSION:
+        return
+
+    if db.in_transaction:
+        db.commit()
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        # Re-read under the write lock: another connection may have migrated.
+        version = get_schema_version(db)
+        for target, migrate in MIGRATIONS:
+            if target <= version:
+                continue
+            migrate(db)
+            db.execute(f"PRAGMA user_version = {int(target)}")
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
@@ -0,0 +1,158 @@
+from __future__ import annotations
+import sqlite3
+from dataclasses import dataclass
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.time_utils import now_iso, today_day
+from app.srs.engine import Grade
+
+# Column-wise SM-2: the same rules as engine.apply_grade applied to whole arrays
+# of cards at once, for bulk jobs (overdue backlogs, vacation shifts, new ease
+# bounds). Due dates are integer days (see time_utils.day_number).
+
+GRADES: Tuple[Grade, ...] = ("again", "hard", "good", "easy")
+AGAIN, HARD, GOOD, EASY = range(4)
+EASE_MIN, EASE_MAX = 1.3, 2.8
+LEECH_LAPSES = 8
+
+_EPOCH = np.datetime64("1970-01-01", "D")
+
+
+@dataclass
+class CardBatch:
+    interval_days: np.ndarray  # int64
+    ease: np.ndarray  # float64
+    lapses: np.ndarray  # int64
+    is_leech: np.ndarray  # int64
+    due_day: np.ndarray  # int64, days since 1970-01-01
+
+    def __len__(self) -> int:
+        return len(self.ease)
+
+
+def grade_codes(grades: Sequence[str]) -> np.ndarray:
+    """'again'/'hard'/'good'/'easy' -> 0..3 (ValueError on anything else)."""
+    lookup = {g: i for i, g in enumerate(GRADES)}
+    try:
+        return np.fromiter((lookup[g] for g in grades), dtype=np.int8, count=len(grades))
+    except KeyError as e:
+        raise ValueError(f"Unknown grade: {e.args[0]}") from None
+
+
+def days_from_dates(dates: Sequence[str]) -> np.ndarray:
+    return (np.asarray(dates, dtype="datetime64[D]") - _EPOCH).astype(np.int64)
+
+
+def dates_from_days(days: np.ndarray) -> List[str]:
+    return (_EPOCH + days.astype("timedelta64[D]")).astype(str).tolist()
+
+
+def apply_grades(batch: CardBatch, grades: np.ndarray, today: Optional[int] = None) -> CardBatch:
+    """
+    Vectorized apply_grade: grades is an array of codes (AGAIN..EASY), one per
+    card. Results match apply_grade card for card (np.rint rounds half to even
+    like round()).
+    """
+    grades = np.asarray(grades)
+    if grades.shape != batch.ease.shape:
+        raise ValueError("grades and batch must have the same length")
+    if grades.size and (grades.min() < AGAIN or grades.max() > EASY):
+        raise ValueError("grade codes must be in 0..3")
+    today = today_day() if today is None else int(today)
+
+    interval = batch.interval_days.astype(np.int64)
+    ease = batch.ease.astype(np.float64)
+    started = interval > 0
+
+    again, hard, good, easy = (grades == g for g in range(4))
+    new_interval = np.select(
+        [again, hard, good, easy],
+        [
+            np.ones_like(interval),
+            np.where(started, np.maximum(1, np.rint(interval * 1.2).astype(np.int64)), 1),
+            np.where(started, np.maximum(1, np.rint(interval * ease).astype(np.int64)), 2),
+            np.where(started, np.maximum(2, np.rint(interval * ease * 1.3).astype(np.int64)), 4),
+        ],
+    )
+    new_ease = np.clip(ease - 0.2 * again - 0.05 * hard + 0.05 * easy, EASE_MIN, EASE_MAX)
+    lapses = batch.lapses.astype(np.int64) + again
+    is_leech = np.where(lapses >= LEECH_LAPSES, 1, batch.is_leech.astype(np.int64))
+    due_day = np.where(again, today, today + new_interval)
+    return CardBatch(new_interval, new_ease, lapses, is_leech, due_day.astype(np.int64))
+
+
+def shift_due(batch: CardBatch, days: int, only_before: Optional[int] = None) -> CardBatch:
+    """Move due dates by `days` (e.g. after a vacation); optionally only cards due before a day."""
+    mask = np.ones(len(batch), dtype=bool) if only_before is None else batch.due_day < only_before
+    due_day = np.where(mask, batch.due_day + int(days), batch.due_day)
+    return CardBatch(batch.interval_days, batch.ease, batch.lapses, batch.is_leech, due_day)
+
+
+def clamp_ease(batch: CardBatch, lo: float = EASE_MIN, hi: float = EASE_MAX) -> CardBatch:
+    """Re-apply ease bounds to existing cards."""
+    return CardBatch(batch.interval_days, np.clip(batch.ease, lo, hi), batch.lapses, batch.is_leech, batch.due_day)
+
+
+def load_card_batch(
+    db: sqlite3.Connection,
+    where: str = "1=1",
+    params: Sequence[Any] = (),
+) -> Tuple[np.ndarray, CardBatch]:
+    """Read cards matching a WHERE clause into (ids, CardBatch)."""
+    cur = db.execute(
+        f"SELECT id, interval_days, ease, lapses, is_leech, due_date FROM cards WHERE {where} ORDER BY id",
+        list(params),
+    )
+    rows = cur.fetchall()
+    if not rows:
+        empty_i = np.zeros(0, dtype=np.int64)
+        return empty_i, CardBatch(empty_i, np.zeros(0), empty_i, empty_i, empty_i)
+    ids, interval, ease, lapses, is_leech, due = zip(*rows)
+    return (
+        np.asarray(ids, dtype=np.int64),
+        CardBatch(
+            np.asarray(interval, dtype=np.int64),
+            np.asarray(ease, dtype=np.float64),
+            np.asarray(lapses, dtype=np.int64),
+            np.asarray(is_leech, dtype=np.int64),
+            days_from_dates(due),
+        ),
+    )
+
+
+def write_card_batch(
+    db: sqlite3.Connection,
+    ids: np.ndarray,
+    batch: CardBatch,
+    grades: Optional[np.ndarray] = None,
+    commit: bool = True,
+) -> int:
+    """
+    Write a batch back with one executemany (one transaction). last_grade is
+    set from `grades` when given, otherwise left as is.
+    """
+    now = now_iso()
+    columns = [
+        dates_from_days(batch.due_day),
+        batch.interval_days.tolist(),
+        batch.ease.tolist(),
+        batch.lapses.tolist(),
+        batch.is_leech.tolist(),
+    ]
+    if grades is not None:
+        columns.append([GRADES[g] for g in np.asarray(grades).tolist()])
+        sql = """UPDATE cards SET due_date=?, interval_days=?, ease=?, lapses=?, is_leech=?, last_grade=?,
+                                  updated_at=? WHERE id=?"""
+    else:
+        sql = "UPDATE cards SET due_date=?, interval_days=?, ease=?, lapses=?, is_leech=?, updated_at=? WHERE id=?"
+    rows = zip(*columns, [now] * len(ids), ids.tolist())
+    try:
+        db.executemany(sql, rows)
+        if commit:
+            db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+    return len(ids)
@@ -0,0 +1,190 @@
+from __future__ import annotations
+import sqlite3
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from app.core.time_utils import today_day
+from app.srs.batch import AGAIN, GRADES, CardBatch, apply_grades, dates_from_days, load_card_batch
+
+# Monte Carlo workload forecast: every run replays the next `days` days for all
+# cards, drawing a grade for each due card from probabilities estimated on
+# review_logs and rescheduling with a batch scheduler (apply_grades by default).
+# Cards of all runs live in one flat array (run-major), so a simulated day is a
+# handful of numpy ops over the cards due that day.
+
+# Fallback grade distribution (again, hard, good, easy) when there is no history.
+DEFAULT_GRADE_PROBS = (
+    (0.30, 0.15, 0.45, 0.10),  # new cards (interval 0)
+    (0.12, 0.13, 0.65, 0.10),  # reviews
+)
+PRIOR_WEIGHT = 20.0  # pseudo-reviews blending the fallback into sparse history
+HISTORY_DAYS = 90
+MAX_CELLS = 4_000_000  # cards x runs simulated together (memory bound)
+
+# batch scheduler: (batch, grade codes, today) -> new batch
+BatchScheduler = Callable[[CardBatch, np.ndarray, int], CardBatch]
+
+
+@dataclass
+class Forecast:
+    start_day: int  # day number of index 0 (today)
+    mean: np.ndarray  # (days,) expected reviews per day
+    lo: np.ndarray  # (days,) lower band (percentile)
+    hi: np.ndarray  # (days,) upper band
+    runs: int
+    band: float  # e.g. 0.8 -> lo/hi are the 10th/90th percentiles
+
+    @property
+    def dates(self) -> List[str]:
+        return dates_from_days(self.start_day + np.arange(len(self.mean)))
+
+    def total(self, days: Optional[int] = None) -> float:
+        return float(self.mean[:days].sum())
+
+
+def estimate_grade_probs(db: sqlite3.Connection, history_days: int = HISTORY_DAYS) -> np.ndarray:
+    """
+    (2, 4) grade probabilities for new cards / reviews from recent review_logs.
+    Logs written before prev_interval_days existed only feed the shared prior.
+    """
+    counts = np.zeros((3, 4))  # new, review, unknown
+    cur = db.execute(
+        """SELECT CASE WHEN prev_interval_days IS NULL THEN 2
+                       WHEN prev_interval_days = 0 THEN 0 ELSE 1 END AS state,
+                  grade, COUNT(*)
+             FROM review_logs
+            WHERE day >= ?
+            GROUP BY state, grade""",
+        (today_day() - history_days,),
+    )
+    codes = {g: i for i, g in enumerate(GRADES)}
+    for state, grade, n in cur.fetchall():
+        if grade in codes:
+            counts[state, codes[grade]] += n
+
+    default = np.asarray(DEFAULT_GRADE_PROBS, dtype=np.float64)
+    pooled = counts.sum(axis=0)
+    probs = np.empty((2, 4))
+    for state in range(2):
+        prior = (pooled + PRIOR_WEIGHT * default[state]) / (pooled.sum() + PRIOR_WEIGHT)
+        probs[state] = (counts[state] + PRIOR_WEIGHT * prior) / (counts[state].sum() + PRIOR_WEIGHT)
+    return probs
+
+
+def _sample_grades(rng: np.random.Generator, cum: np.ndarray, state: np.ndarray) -> np.ndarray:
+    # inverse CDF per card: state picks the row of cumulative probabilities
+    return (rng.random(len(state))[:, None] > cum[state, :3]).sum(axis=1).astype(np.int8)
+
+
+def _simulate_runs(
+    batch: CardBatch,
+    runs: int,
+    days: int,
+    today: int,
+    probs: np.ndarray,
+    rng: np.random.Generator,
+    scheduler: BatchScheduler,
+    daily_limit: Optional[int],
+) -> np.ndarray:
+    n = len(batch)
+    tile = lambda a: np.tile(a, runs)  # noqa: E731
+    state = CardBatch(*(tile(a) for a in (batch.interval_days, batch.ease, batch.lapses, batch.is_leech, batch.due_day)))
+    run_of = np.repeat(np.arange(runs), n)
+    cum = np.cumsum(probs, axis=1)
+    load = np.zeros((runs, days))
+    for d in range(days):
+        day = today + d
+        due = np.flatnonzero(state.due_day <= day)
+        if daily_limit is not None and len(due):
+            # most overdue first within each run, the rest carries over
+            order = np.lexsort((state.due_day[due], run_of[due]))
+            due = due[order]
+            runs_of_due = run_of[due]
+            first = np.searchsorted(runs_of_due, runs_of_due, side="left")
+            due = due[np.arange(len(due)) - first < daily_limit]
+        if not len(due):
+            continue
+        sub = CardBatch(*(a[due] for a in (state.interval_days, state.ease, state.lapses, state.is_leech, state.due_day)))
+        grades = _sample_grades(rng, cum, (sub.interval_days > 0).astype(np.int64))
+        new = scheduler(sub, grades, day)
+        # "again" is retried in the same session (one more review today) and
+        # comes back tomorrow, instead of looping on today's due date.
+        again = grades == AGAIN
+        new.due_day = np.where(again, day + 1, new.due_day)
+        state.interval_days[due] = new.interval_days
+        state.ease[due] = new.ease
+        state.lapses[due] = new.lapses
+        state.is_leech[due] = new.is_leech
+        state.due_day[due] = new.due_day
+        load[:, d] = np.bincount(run_of[due], weights=1.0 + again, minlength=runs)
+    return load
+
+
+def simulate_forecast(
+    batch: CardBatch,
+    days: int = 30,
+    runs: int = 100,
+    probs: Optional[np.ndarray] = None,
+    today: Optional[int] = None,
+    seed: Optional[int] = 0,
+    scheduler: BatchScheduler = apply_grades,
+    daily_limit: Optional[int] = None,
+    band: float = 0.8,
+) -> Forecast:
+    """
+    Simulate `runs` futures of `days` days and return the per-day review load
+    (mean and a central `band` interval). daily_limit caps reviews per day the
+    way a user with a fixed budget would work through a backlog.
+    """
+    today = today_day() if today is None else int(today)
+    probs = np.asarray(DEFAULT_GRADE_PROBS if probs is None else probs, dtype=np.float64)
+    probs = probs / probs.sum(axis=1, keepdims=True)
+    rng = np.random.default_rng(seed)
+    days = max(1, int(days))
+    runs = max(1, int(runs))
+
+    loads: List[np.ndarray] = []
+    if len(batch):
+        per_chunk = max(1, min(runs, MAX_CELLS // len(batch)))
+        for start in range(0, runs, per_chunk):
+            chunk = min(per_chunk, runs - start)
+            loads.append(_simulate_runs(batch, chunk, days, today, probs, rng, scheduler, daily_limit))
+    load = np.vstack(loads) if loads else np.zeros((runs, days))
+
+    tail = (1.0 - band) / 2 * 100
+    return Forecast(
+        start_day=today,
+        mean=load.mean(axis=0),
+        lo=np.percentile(load, tail, axis=0),
+        hi=np.percentile(load, 100 - tail, axis=0),
+        runs=runs,
+        band=band,
+    )
+
+
+def forecast_cache_key(db: sqlite3.Connection) -> tuple:
+    """Changes whenever a forecast could: a new day, a review, or an import."""
+    cards = db.execute("SELECT MAX(id), COUNT(*) FROM cards").fetchone()
+    last_log = db.execute("SELECT MAX(id) FROM review_logs").fetchone()[0]
+    return (today_day(), cards[0], cards[1], last_log)
+
+
+def forecast_due_load(
+    db: sqlite3.Connection,
+    days: int = 30,
+    runs: int = 100,
+    seed: Optional[int] = 0,
+    daily_limit: Optional[int] = None,
+) -> Forecast:
+    """Forecast for every card in the DB with grade odds from its own history."""
+    _, batch = load_card_batch(db)
+    return simulate_forecast(
+        batch,
+        days=days,
+        runs=runs,
+        probs=estimate_grade_probs(db),
+        seed=seed,
+        daily_limit=daily_limit,
+    )
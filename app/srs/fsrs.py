@@ -0,0 +1,155 @@
+from __future__ import annotations
+import json
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+import numpy as np
+
+from app.core.time_utils import add_days, today_date_str
+from app.srs.engine import Grade
+
+# FSRS-style memory model (FSRS-4.5 formulas): each card has a stability S (days
+# until recall probability drops to 90%) and a difficulty D in [1, 10]. The
+# core functions take numpy arrays so the scheduler and the optimizer
+# (app.srs.fsrs_fit) share one implementation; `w` is either one weight vector
+# (17,) or a stack (P, 17) evaluated against (P, n) state arrays.
+
+DEFAULT_WEIGHTS = (
+    0.4872, 1.4003, 3.7145, 13.8206, 5.1618, 1.2298, 0.8975, 0.031, 1.6474,
+    0.1367, 1.0461, 2.1072, 0.0793, 0.3246, 1.587, 0.2272, 2.8755,
+)
+N_WEIGHTS = len(DEFAULT_WEIGHTS)
+# Bounds used by the optimizer (and to sanitize stored weights).
+WEIGHT_BOUNDS = (
+    (0.1, 100.0), (0.1, 100.0), (0.1, 100.0), (0.1, 100.0), (1.0, 10.0), (0.1, 5.0), (0.1, 5.0),
+    (0.0, 0.75), (0.0, 4.0), (0.0, 0.8), (0.01, 3.0), (0.5, 5.0), (0.01, 0.2), (0.01, 0.9),
+    (0.01, 3.0), (0.0, 1.0), (1.0, 6.0),
+)
+DECAY = -0.5
+FACTOR = 0.9 ** (1 / DECAY) - 1  # 19/81: R(t=S) = 0.9
+DESIRED_RETENTION = 0.9
+MAX_INTERVAL = 36500
+S_MIN = 0.01
+
+GRADE_VALUES = {"again": 1, "hard": 2, "good": 3, "easy": 4}
+
+# settings table keys
+SCHEDULER_SETTING = "srs_scheduler"  # "sm2" (default) | "fsrs"
+WEIGHTS_SETTING = "fsrs_weights"  # JSON list written by `maintenance fit-fsrs`
+
+
+def _w(w: np.ndarray, i: int):
+    # One weight as a scalar (w is (17,)) or a column broadcasting over (P, n).
+    return w[..., i : i + 1] if w.ndim == 2 else w[i]
+
+
+def retrievability(elapsed, stability):
+    return np.power(1.0 + FACTOR * np.asarray(elapsed, dtype=np.float64) / stability, DECAY)
+
+
+def init_stability(w: np.ndarray, g):
+    return np.maximum(np.take(w, np.asarray(g) - 1, axis=-1), S_MIN)
+
+
+def init_difficulty(w: np.ndarray, g):
+    return np.clip(_w(w, 4) - np.exp(_w(w, 5) * (np.asarray(g) - 1)) + 1, 1.0, 10.0)
+
+
+def next_difficulty(w: np.ndarray, d, g):
+    d2 = d - _w(w, 6) * (np.asarray(g) - 3)
+    # mean reversion towards the difficulty of an "easy" first answer
+    d0_easy = _w(w, 4) - np.exp(_w(w, 5) * 3) + 1
+    return np.clip(_w(w, 7) * d0_easy + (1 - _w(w, 7)) * d2, 1.0, 10.0)
+
+
+def next_stability(w: np.ndarray, d, s, r, g):
+    g = np.asarray(g)
+    hard_penalty = np.where(g == 2, _w(w, 15), 1.0)
+    easy_bonus = np.where(g == 4, _w(w, 16), 1.0)
+    recall = s * (
+        1
+        + np.exp(_w(w, 8)) * (11 - d) * np.power(s, -_w(w, 9)) * (np.exp((1 - r) * _w(w, 10)) - 1)
+        * hard_penalty * easy_bonus
+    )
+    forget = (
+        _w(w, 11) * np.power(d, -_w(w, 12)) * (np.power(s + 1, _w(w, 13)) - 1) * np.exp((1 - r) * _w(w, 14))
+    )
+    return np.maximum(np.where(g == 1, np.minimum(forget, s), recall), S_MIN)
+
+
+def next_interval(stability: float, retention: float = DESIRED_RETENTION) -> int:
+    interval = stability / FACTOR * (retention ** (1 / DECAY) - 1)
+    return int(min(MAX_INTERVAL, max(1, round(interval))))
+
+
+def sanitize_weights(weights: Optional[Sequence[float]]) -> np.ndarray:
+    if weights is None or len(weights) != N_WEIGHTS:
+        return np.asarray(DEFAULT_WEIGHTS, dtype=np.float64)
+    lo, hi = np.asarray(WEIGHT_BOUNDS, dtype=np.float64).T
+    return np.clip(np.asarray(weights, dtype=np.float64), lo, hi)
+
+
+def parse_weights(text: Optional[str]) -> np.ndarray:
+    try:
+        return sanitize_weights(json.loads(text) if text else None)
+    except (TypeError, ValueError):
+        return sanitize_weights(None)
+
+
+def stability_from_sm2(interval_days: int, ease: float) -> tuple:
+    """
+    Starting (S, D) for a card scheduled by SM-2 so far: at 90% retention the
+    interval equals S; ease 1.3..2.8 maps linearly onto D 10..1.
+    """
+    d = 10.0 - (float(ease) - 1.3) / (2.8 - 1.3) * 9.0
+    return float(max(interval_days, 1)), float(min(10.0, max(1.0, d)))
+
+
+@dataclass
+class FsrsState:
+    due_date: str
+    interval_days: int
+    stability: Optional[float]  # None: never reviewed with FSRS
+    difficulty: Optional[float]
+    lapses: int
+    is_leech: int
+
+
+def apply_grade_fsrs(
+    state: FsrsState,
+    grade: Grade,
+    elapsed_days: Optional[int],
+    weights: Optional[Sequence[float]] = None,
+    retention: float = DESIRED_RETENTION,
+) -> FsrsState:
+    """
+    FSRS counterpart of engine.apply_grade. elapsed_days is the number of days
+    since the previous review (None for a first review).
+    """
+    if grade not in GRADE_VALUES:
+        raise ValueError(f"Unknown grade: {grade}")
+    w = sanitize_weights(weights)
+    g = GRADE_VALUES[grade]
+    if state.stability is None or state.difficulty is None:
+        s = float(init_stability(w, g))
+        d = float(init_difficulty(w, g))
+    else:
+        r = retrievability(max(0, elapsed_days or 0), state.stability)
+        s = float(next_stability(w, state.difficulty, state.stability, r, g))
+        d = float(next_difficulty(w, state.difficulty, g))
+
+    lapses = state.lapses + (1 if grade == "again" else 0)
+    if grade == "again":
+        interval = 1
+        due = today_date_str()  # due lại ngay, same as SM-2
+    else:
+        interval = next_interval(s, retention)
+        due = add_days(today_date_str(), interval)
+    return FsrsState(
+        due_date=due,
+        interval_days=interval,
+        stability=s,
+        difficulty=d,
+        lapses=lapses,
+        is_leech=1 if lapses >= 8 else state.is_leech,
+    )
@@ -0,0 +1,199 @@
+from __future__ import annotations
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+from app.srs.fsrs import (
+    DEFAULT_WEIGHTS,
+    GRADE_VALUES,
+    N_WEIGHTS,
+    WEIGHT_BOUNDS,
+    init_difficulty,
+    init_stability,
+    next_difficulty,
+    next_stability,
+    retrievability,
+    sanitize_weights,
+)
+
+# Offline FSRS weight fitting over review_logs. Reviews are laid out as a
+# (step, card) matrix with cards sorted by history length, so step k only
+# touches the prefix of cards that have a k-th review; the gradient comes from
+# forward differences evaluated for all 17 weights at once as a (18, n) stack.
+
+_EPS = 1e-6
+
+
+@dataclass
+class ReviewHistory:
+    grades: np.ndarray  # (steps, cards) 1..4, 0 = padding
+    elapsed: np.ndarray  # (steps, cards) days since previous review
+    active: np.ndarray  # (steps,) cards with a review at that step (prefix)
+    n_reviews: int  # predicted reviews (all but each card's first)
+
+    @property
+    def n_cards(self) -> int:
+        return int(self.active[0]) if len(self.active) else 0
+
+
+def build_history(card_ids: np.ndarray, days: np.ndarray, grades: np.ndarray) -> ReviewHistory:
+    """
+    card_ids/days/grades in review order per card (sorted by card, then time).
+    Same-day repeats are dropped (FSRS models long-term memory); cards with a
+    single review carry no signal and are skipped.
+    """
+    card_ids = np.asarray(card_ids, dtype=np.int64)
+    days = np.asarray(days, dtype=np.int64)
+    grades = np.asarray(grades, dtype=np.int8)
+    if len(card_ids):
+        new_card = np.r_[True, card_ids[1:] != card_ids[:-1]]
+        keep = new_card | np.r_[True, days[1:] != days[:-1]]
+        card_ids, days, grades = card_ids[keep], days[keep], grades[keep]
+    starts = np.flatnonzero(np.r_[True, card_ids[1:] != card_ids[:-1]]) if len(card_ids) else np.zeros(0, int)
+    lengths = np.diff(np.r_[starts, len(card_ids)])
+    useful = lengths >= 2
+    starts, lengths = starts[useful], lengths[useful]
+    order = np.argsort(-lengths, kind="stable")
+    starts, lengths = starts[order], lengths[order]
+    steps = int(lengths[0]) if len(lengths) else 0
+
+    g = np.zeros((steps, len(lengths)), dtype=np.int8)
+    t = np.zeros((steps, len(lengths)), dtype=np.float64)
+    col = np.repeat(np.arange(len(lengths)), lengths)
+    pos = np.arange(int(lengths.sum())) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    src = np.repeat(starts, lengths) + pos
+    g[pos, col] = grades[src]
+    prev = np.where(pos > 0, src - 1, src)
+    t[pos, col] = days[src] - days[prev]
+    active = (lengths[None, :] > np.arange(steps)[:, None]).sum(axis=1)
+    return ReviewHistory(g, t, active, int(lengths.sum() - len(lengths)))
+
+
+def load_review_history(db: sqlite3.Connection) -> ReviewHistory:
+    rows = db.execute(
+        "SELECT card_id, day, grade FROM review_logs WHERE day IS NOT NULL ORDER BY card_id, id"
+    ).fetchall()
+    if not rows:
+        return build_history(np.zeros(0), np.zeros(0), np.zeros(0))
+    card_ids, days, grades = zip(*rows)
+    codes = np.fromiter((GRADE_VALUES.get(str(x), 3) for x in grades), dtype=np.int8, count=len(grades))
+    return build_history(np.asarray(card_ids), np.asarray(days), codes)
+
+
+def split_history(hist: ReviewHistory, batch_cards: int, rng: np.random.Generator) -> List[ReviewHistory]:
+    """Random card subsets (each still sorted by length) for minibatch steps."""
+    n = hist.n_cards
+    if n <= batch_cards:
+        return [hist]
+    parts: List[ReviewHistory] = []
+    perm = rng.permutation(n)
+    for i in range(0, n, batch_cards):
+        cols = np.sort(perm[i : i + batch_cards])  # sorted columns keep the length order
+        lengths = (hist.grades[:, cols] > 0).sum(axis=0)
+        steps = int(lengths.max())
+        active = (lengths[None, :] > np.arange(steps)[:, None]).sum(axis=1)
+        parts.append(
+            ReviewHistory(hist.grades[:steps, cols], hist.elapsed[:steps, cols], active, int(lengths.sum() - len(cols)))
+        )
+    return parts
+
+
+def log_loss(w: np.ndarray, hist: ReviewHistory) -> np.ndarray:
+    """Mean binary log loss of predicted recall; w is (17,) or (P, 17) -> scalar or (P,)."""
+    w = np.asarray(w, dtype=np.float64)
+    stacked = w.ndim == 2
+    if not stacked:
+        w = w[None, :]
+    if hist.n_reviews == 0:
+        out = np.zeros(len(w))
+        return out if stacked else out[0]
+    g0 = hist.grades[0]
+    s = init_stability(w, g0)
+    d = init_difficulty(w, g0)
+    total = np.zeros(len(w))
+    for k in range(1, len(hist.active)):
+        m = int(hist.active[k])
+        s, d = s[:, :m], d[:, :m]
+        g = hist.grades[k, :m]
+        r = np.clip(retrievability(hist.elapsed[k, :m], s), _EPS, 1 - _EPS)
+        total -= np.where(g > 1, np.log(r), np.log1p(-r)).sum(axis=1)
+        s, d = next_stability(w, d, s, r, g), next_difficulty(w, d, g)
+    out = total / hist.n_reviews
+    return out if stacked else out[0]
+
+
+@dataclass
+class FitResult:
+    weights: List[float]
+    loss_before: float
+    loss_after: float
+    n_reviews: int
+    n_cards: int
+    seconds: float
+    losses: List[float] = field(default_factory=list)  # per epoch
+
+
+def fit_weights(
+    hist: ReviewHistory,
+    init: Optional[Sequence[float]] = None,
+    epochs: int = 4,
+    batch_cards: int = 4096,
+    lr: float = 0.02,
+    seed: int = 0,
+    on_epoch: Optional[Callable[[int, float], None]] = None,
+) -> FitResult:
+    """
+    Minibatch Adam over weights rescaled to [0, 1] within WEIGHT_BOUNDS; the
+    gradient is a forward difference for every weight from one stacked pass.
+    """
+    started = time.perf_counter()
+    lo, hi = np.asarray(WEIGHT_BOUNDS, dtype=np.float64).T
+    span = hi - lo
+    w = sanitize_weights(DEFAULT_WEIGHTS if init is None else init)
+    x = (w - lo) / span
+    loss_before = float(log_loss(w, hist))
+    if hist.n_reviews == 0:
+        return FitResult(w.tolist(), loss_before, loss_before, 0, 0, time.perf_counter() - started)
+
+    rng = np.random.default_rng(seed)
+    m = np.zeros(N_WEIGHTS)
+    v = np.zeros(N_WEIGHTS)
+    beta1, beta2 = 0.9, 0.999
+    h = 1e-4
+    step = 0
+    losses: List[float] = []
+    for epoch in range(epochs):
+        for batch in split_history(hist, batch_cards, rng):
+            if batch.n_reviews == 0:
+                continue
+            # rows: base point, then each weight nudged by h (in [0, 1] units)
+            xs = np.repeat(x[None, :], N_WEIGHTS + 1, axis=0)
+            xs[1:] += np.eye(N_WEIGHTS) * h
+            loss = log_loss(lo + np.clip(xs, 0.0, 1.0) * span, batch)
+            grad = (loss[1:] - loss[0]) / h
+            step += 1
+            m = beta1 * m + (1 - beta1) * grad
+            v = beta2 * v + (1 - beta2) * grad * grad
+            m_hat = m / (1 - beta1 ** step)
+            v_hat = v / (1 - beta2 ** step)
+            x = np.clip(x - lr * m_hat / (np.sqrt(v_hat) + 1e-8), 0.0, 1.0)
+        losses.append(float(log_loss(lo + x * span, hist)))
+        if on_epoch:
+            on_epoch(epoch, losses[-1])
+
+    fitted = lo + x * span
+    loss_after = losses[-1]
+    if loss_after > loss_before:  # never hand back something worse than the start
+        fitted, loss_after = w, loss_before
+    return FitResult(
+        [round(float(x), 4) for x in fitted],
+        loss_before,
+        loss_after,
+        hist.n_reviews,
+        hist.n_cards,
+        time.perf_counter() - started,
+        losses,
+    )
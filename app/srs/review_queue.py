@@ -0,0 +1,121 @@
+from __future__ import annotations
+import heapq
+from typing import Any, Callable, List, Optional, Set, Tuple
+
+from app.db.repo import due_card_key
+
+# In-memory review session queue. Due cards sit in a heap ordered like
+# fetch_due_cards; "again" cards go to a second heap and come back after
+# RELEARN_GAP other cards. Once the heap drops to `low_water` the next page
+# (keyset pagination) is requested through `request_page`, which runs the
+# read off the UI thread (AsyncRepo) and answers with add_page() or fail().
+# pop() never blocks: while a page is in flight and nothing is queued it
+# returns None with `loading` set.
+
+PAGE_SIZE = 100
+LOW_WATER = 30
+RELEARN_GAP = 2
+
+# request_page(after, limit) starts the fetch; it must not block.
+RequestPage = Callable[[Optional[Tuple[Any, ...]], int], None]
+
+
+class ReviewQueue:
+    def __init__(
+        self,
+        request_page: RequestPage,
+        page_size: int = PAGE_SIZE,
+        low_water: int = LOW_WATER,
+        relearn_gap: int = RELEARN_GAP,
+    ):
+        self.request_page = request_page
+        self.page_size = max(1, page_size)
+        self.low_water = max(0, low_water)
+        self.relearn_gap = max(0, relearn_gap)
+        self._heap: List[Tuple[Tuple[Any, ...], int, Any]] = []
+        self._relearn: List[Tuple[int, int, Any]] = []  # (ready at `served`, seq, card)
+        self._seen: Set[int] = set()  # card ids already queued this session
+        self._seq = 0
+        self._served = 0
+        self._cursor: Optional[Tuple[Any, ...]] = None
+        self._exhausted = False
+        self._pending = False
+        self._closed = False
+        self.error: Optional[BaseException] = None  # last failed page; stops further fetches
+
+    def __len__(self) -> int:
+        return len(self._heap) + len(self._relearn)
+
+    @property
+    def exhausted(self) -> bool:
+        """True once the DB has no more due cards beyond what is queued."""
+        return self._exhausted
+
+    @property
+    def loading(self) -> bool:
+        """True while a requested page has not arrived yet."""
+        return self._pending
+
+    def start(self, first_page: List[Any]) -> None:
+        """Load the first page, fetched by the caller."""
+        self._add_page(first_page)
+        self._maybe_prefetch()
+
+    def pop(self) -> Optional[Any]:
+        """Next card, or None when nothing is queued (check `loading` and `error`)."""
+        if not self._heap:
+            self._maybe_prefetch()
+        if self._relearn and (not self._heap or self._relearn[0][0] <= self._served):
+            card = heapq.heappop(self._relearn)[2]
+        elif self._heap:
+            card = heapq.heappop(self._heap)[2]
+        else:
+            return None
+        self._served += 1
+        self._maybe_prefetch()
+        return card
+
+    def push_relearn(self, card: Any) -> None:
+        """Re-queue a lapsed card to be shown again after relearn_gap other cards."""
+        self._seq += 1
+        heapq.heappush(self._relearn, (self._served + self.relearn_gap, self._seq, card))
+
+    def add_page(self, rows: List[Any]) -> None:
+        """Result of request_page."""
+        if self._closed:
+            return
+        self._pending = False
+        self._add_page(rows)
+
+    def fail(self, error: BaseException) -> None:
+        """request_page failed: keep serving what is queued, fetch nothing more."""
+        if self._closed:
+            return
+        self._pending = False
+        self.error = error
+
+    def close(self) -> None:
+        self._closed = True
+        self._pending = False
+
+    def _add_page(self, rows: List[Any]) -> None:
+        if len(rows) < self.page_size:
+            self._exhausted = True
+        if rows:
+            self._cursor = due_card_key(rows[-1])
+        for row in rows:
+            card_id = int(row["id"])
+            if card_id in self._seen:
+                # graded earlier in the session and due again with a new key
+                continue
+            self._seen.add(card_id)
+            self._seq += 1
+            heapq.heappush(self._heap, (due_card_key(row), self._seq, row))
+
+    def _maybe_prefetch(self) -> None:
+        if self._exhausted or self._pending or self._closed or self.error is not None:
+            return
+        if len(self._heap) > self.low_water:
+            return
+        self._pending = True
+        self.request_page(self._cursor, self.page_size)
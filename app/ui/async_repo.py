@@ -0,0 +1,131 @@
+from __future__ import annotations
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from PySide6.QtCore import QCoreApplication, QObject, QRunnable, QThreadPool, Signal
+
+from app.db.database import read_db
+
+# Runs repo reads off the UI thread: `run(key, fn, on_done)` calls fn(db) with a
+# pooled reader connection on a QThreadPool and hands the result to on_done on
+# the UI thread. One request per key is live at a time: a newer request (or
+# cancel/cancel_all on navigation) makes the older one stale, interrupts its
+# query if it is running, and drops its result.
+
+ReadFn = Callable[[sqlite3.Connection], Any]
+
+
+class _Task:
+    def __init__(
+        self,
+        key: str,
+        fn: ReadFn,
+        on_done: Callable[[Any], None],
+        on_error: Optional[Callable[[BaseException], None]],
+    ):
+        self.key = key
+        self.fn = fn
+        self.on_done = on_done
+        self.on_error = on_error
+        self.cancelled = False
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def cancel(self) -> None:
+        with self._lock:
+            self.cancelled = True
+            if self._conn is not None:
+                self._conn.interrupt()
+
+    def execute(self) -> Any:
+        with read_db() as db:
+            with self._lock:
+                if self.cancelled:
+                    return None
+                self._conn = db
+            try:
+                return self.fn(db)
+            finally:
+                with self._lock:
+                    self._conn = None
+
+
+class _Runnable(QRunnable):
+    def __init__(self, repo: "AsyncRepo", task: _Task, before_read: Optional[Callable[[], Any]]):
+        super().__init__()
+        self.repo = repo
+        self.task = task
+        self.before_read = before_read
+
+    def run(self) -> None:
+        if self.task.cancelled:
+            return
+        try:
+            if self.before_read is not None:
+                self.before_read()
+            result, error = self.task.execute(), None
+        except BaseException as e:  # delivered to on_error on the UI thread
+            result, error = None, e
+        if not self.task.cancelled:
+            try:
+                self.repo.finished.emit(self.task, result, error)
+            except RuntimeError:
+                pass  # the AsyncRepo (its view) was destroyed meanwhile
+
+
+class AsyncRepo(QObject):
+    finished = Signal(object, object, object)  # task, result, error
+
+    def __init__(
+        self,
+        parent: Optional[QObject] = None,
+        pool: Optional[QThreadPool] = None,
+        before_read: Optional[Callable[[], Any]] = None,
+    ):
+        """before_read runs on the worker first (e.g. flush pending review writes)."""
+        super().__init__(parent)
+        self.pool = pool or QThreadPool.globalInstance()
+        self.before_read = before_read
+        self._live: Dict[str, _Task] = {}
+        self.finished.connect(self._deliver)
+
+    def run(
+        self,
+        key: str,
+        fn: ReadFn,
+        on_done: Callable[[Any], None],
+        on_error: Optional[Callable[[BaseException], None]] = None,
+    ) -> None:
+        self.cancel(key)
+        task = _Task(key, fn, on_done, on_error)
+        self._live[key] = task
+        self.pool.start(_Runnable(self, task, self.before_read))
+
+    def is_pending(self, key: str) -> bool:
+        return key in self._live
+
+    def cancel(self, key: str) -> None:
+        task = self._live.pop(key, None)
+        if task is not None:
+            task.cancel()
+
+    def cancel_all(self) -> None:
+        for key in list(self._live):
+            self.cancel(key)
+
+    def wait(self, timeout_ms: int = -1) -> None:
+        """Block until queued requests finish and deliver them (scripts, shutdown)."""
+        self.pool.waitForDone(timeout_ms)
+        QCoreApplication.processEvents()
+
+    def _deliver(self, task: _Task, result: Any, error: Optional[BaseException]) -> None:
+        if task.cancelled or self._live.get(task.key) is not task:
+            return
+        del self._live[task.key]
+        if error is None:
+            task.on_done(result)
+        elif task.on_error is not None:
+            task.on_error(error)
+        else:
+            raise error
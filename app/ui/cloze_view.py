@@ -14,6 +14,7 @@ from PySide6.QtWidgets import (
 )
 from PySide6.QtCore import Qt
 
+from app.ui.async_repo import AsyncRepo
 from app.db.repo import (
     get_cloze_queue,
     record_attempt,
@@ -25,10 +26,16 @@ from app.db.repo import (
 
 
 class ClozePracticeView(QWidget):
-    def __init__(self, db: sqlite3.Connection, on_navigate: Callable[[str], None]):
+    def __init__(
+        self,
+        db: sqlite3.Connection,
+        on_navigate: Callable[[str], None],
+        async_repo: Optional[AsyncRepo] = None,
+    ):
         super().__init__()
         self.db = db
         self.on_navigate = on_navigate
+        self.async_repo = async_repo or AsyncRepo(self)
 
         self.queue = []
         self.current: Optional[dict] = None
@@ -105,8 +112,6 @@ class ClozePracticeView(QWidget):
         btn_row.addWidget(self.btn_back)
         layout.addLayout(btn_row)
 
-        self.refresh()
-
     def _filters(self):
         level = self.cb_level.currentText()
         level_filter = None if level == "All" else level
@@ -115,16 +120,26 @@ class ClozePracticeView(QWidget):
 
     def refresh(self) -> None:
         level_filter, tag_filter = self._filters()
-        self.queue = get_cloze_queue(
-            self.db,
-            limit=50,
-            tag_filter=tag_filter,
-            level_filter=level_filter,
-        )
-        self.status.setText(
-            f"Queue: {len(self.queue)} (mistakes first) | JLPT: {level_filter or 'all'} | tag: {tag_filter or 'all'}"
+        self.queue = []
+        self.current = None
+        self.lbl_cloze.setText("Loading...")
+        self.lbl_hint.setText("")
+        for b in [self.btn_check, self.btn_show, self.btn_next]:
+            b.setEnabled(False)
+
+        def on_loaded(queue) -> None:
+            self.queue = queue
+            self.status.setText(
+                f"Queue: {len(self.queue)} (mistakes first) | JLPT: {level_filter or 'all'} | tag: {tag_filter or 'all'}"
+            )
+            self._next_card()
+
+        # get_cloze_queue is a pure read (clozes are stored at insert time)
+        self.async_repo.run(
+            "cloze",
+            lambda db: get_cloze_queue(db, limit=50, tag_filter=tag_filter, level_filter=level_filter),
+            on_loaded,
         )
-        self._next_card()
 
     def _next_card(self) -> None:
         self.lbl_feedback.setText("")
@@ -1,13 +1,9 @@
 from __future__ import annotations
 import sqlite3
 import csv
-from typing import Callable, List, Optional
-from PySide6.QtWidgets import QWidget, QVBoxLayout, QLabel, QFrame, QPushButton, QFileDialog
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QFrame, QPushButton, QFileDialog, QComboBox
 from PySide6.QtCore import Qt
-try:
-    from PySide6.QtCharts import QChart, QChartView, QBarSet, QBarSeries, QBarCategoryAxis, QValueAxis, QLineSeries
-except Exception:
-    QChart = None  # type: ignore
 
 from app.db.repo import (
     count_due_cards,
@@ -16,18 +12,50 @@ from app.db.repo import (
     get_review_stats,
     get_streak,
     get_leech_due_count,
-    get_level_breakdown,
+    get_level_counts,
     get_attempt_timeseries,
     get_attempt_rows_for_export,
 )
+from app.ui.async_repo import AsyncRepo
+
+if TYPE_CHECKING:
+    from app.srs.forecast import Forecast
+
+FORECAST_DAYS = 30
+FORECAST_RUNS = 40
+FORECAST_CELLS = 500_000  # cards x runs per Home refresh; fewer runs on big decks
+
+_HAS_CHARTS: Optional[bool] = None
+
+
+def _charts_available() -> bool:
+    # QtCharts is heavy and optional: imported when the first chart is drawn,
+    # after the window is already on screen.
+    global _HAS_CHARTS
+    if _HAS_CHARTS is None:
+        try:
+            import PySide6.QtCharts  # noqa: F401
+            _HAS_CHARTS = True
+        except Exception:
+            _HAS_CHARTS = False
+    return _HAS_CHARTS
 
 
 class HomeView(QWidget):
-    def __init__(self, db: sqlite3.Connection, on_navigate: Callable[[str], None]):
+    def __init__(
+        self,
+        db: sqlite3.Connection,
+        on_navigate: Callable[[str], None],
+        async_repo: Optional[AsyncRepo] = None,
+    ):
         super().__init__()
         self.db = db
         self.on_navigate = on_navigate
-        self.chart_view: Optional[QChartView] = None
+        self.async_repo = async_repo or AsyncRepo(self)
+        self.chart_view = None  # QChartView, created with the first data
+        self.forecast_view = None
+        self._forecast_key: Optional[tuple] = None
+        self._forecast: Optional[Forecast] = None
 
         layout = QVBoxLayout(self)
         layout.setSpacing(12)
@@ -52,10 +80,22 @@ class HomeView(QWidget):
         self.daily_stats.setProperty("role", "subtitle")
         layout.addWidget(self.daily_stats)
 
-        if QChart:
-            self.chart_view = QChartView()
-            self.chart_view.setMinimumHeight(220)
-            layout.addWidget(self.chart_view)
+        self.forecast_stats = QLabel("")
+        self.forecast_stats.setProperty("role", "subtitle")
+        layout.addWidget(self.forecast_stats)
+
+        range_row = QHBoxLayout()
+        range_row.addWidget(QLabel("Chart range:"))
+        self.cb_range = QComboBox()
+        for days in (7, 30, 90, 365):
+            self.cb_range.addItem(f"{days} days", days)
+        self.cb_range.currentIndexChanged.connect(self.refresh)
+        range_row.addWidget(self.cb_range)
+        range_row.addStretch(1)
+        layout.addLayout(range_row)
+
+        self.chart_box = QVBoxLayout()
+        layout.addLayout(self.chart_box)
 
         card = QFrame()
         card.setProperty("role", "card")
@@ -88,16 +128,67 @@ class HomeView(QWidget):
         layout.addWidget(tips)
 
         layout.addStretch(1)
-        self.refresh()
 
     def refresh(self) -> None:
-        due = count_due_cards(self.db)
-        items = count_items(self.db)
-        self.stats.setText(f"Total items: {items} | Due today: {due}")
+        # Dashboard reads run on a pooled reader off the UI thread; the
+        # current numbers stay on screen until the new ones arrive. The counts
+        # and the forecast are separate requests so the cheap counts render
+        # without waiting for the simulation.
+        chart_days = int(self.cb_range.currentData() or 7)
+        cached_key = self._forecast_key
+
+        def load(db: sqlite3.Connection) -> Dict[str, Any]:
+            return {
+                "due": count_due_cards(db),
+                "items": count_items(db),
+                "activity": get_attempt_stats(db),
+                "review": get_review_stats(db),
+                "streak": get_streak(db),
+                "level_counts": get_level_counts(db),
+                "leech_due": get_leech_due_count(db),
+                "chart_days": chart_days,
+                # daily_stats rollup: O(days) rows whatever the history size
+                "timeseries": get_attempt_timeseries(db, days=chart_days),
+            }
+
+        def load_forecast(db: sqlite3.Connection) -> Optional[Tuple[tuple, Forecast]]:
+            # numpy-backed; imported on the worker, not at startup
+            from app.srs.forecast import forecast_cache_key, forecast_due_load
+
+            # the simulation is the expensive part: rerun only when cards or
+            # review history changed (or the day rolled over)
+            key = forecast_cache_key(db)
+            if key == cached_key:
+                return None
+            runs = max(8, min(FORECAST_RUNS, FORECAST_CELLS // max(1, key[2] or 0)))
+            return key, forecast_due_load(db, days=FORECAST_DAYS, runs=runs)
+
+        self.btn_start_srs.setEnabled(False)
+        if not self.stats.text():
+            self.stats.setText("Loading...")
+        self.async_repo.run("home", load, self._render)
+        self.async_repo.run("home-forecast", load_forecast, self._render_forecast)
+
+    def _render_forecast(self, result: Optional[Tuple[tuple, Forecast]]) -> None:
+        if result is None:
+            return  # cards and history unchanged: the chart on screen is current
+        self._forecast_key, self._forecast = result
+        self._ensure_chart_views()
+        self._show_forecast(self._forecast)
+
+    def _render(self, snapshot: Dict[str, Any]) -> None:
+        due = snapshot["due"]
+        activity = snapshot["activity"]
+        review = snapshot["review"]
+        streak = snapshot["streak"]
+        level_counts = snapshot["level_counts"]
+        leech_due = snapshot["leech_due"]
+        chart_days = snapshot["chart_days"]
+        timeseries = snapshot["timeseries"]
+        self._ensure_chart_views()
+
+        self.stats.setText(f"Total items: {snapshot['items']} | Due today: {due}")
 
-        activity = get_attempt_stats(self.db)
-        review = get_review_stats(self.db)
-        streak = get_streak(self.db)
         daily_goal = 30
         source_parts: List[str] = []
         labels = {
@@ -118,30 +209,81 @@ class HomeView(QWidget):
         source_text = " | ".join(source_parts) if source_parts else "No activity yet"
         self.review_stats.setText(
             f"Today: {activity['total']} | Acc: {activity['accuracy']:.1f}% | {source_text} | "
-            f"Streak: {streak} days | Goal: {daily_goal}/day"
+            f"Streak: {streak['current']} days (best {streak['longest']}) | Goal: {daily_goal}/day"
         )
 
-        level_counts = get_level_breakdown(self.db, due_only=True)
-        leech_due = get_leech_due_count(self.db)
-        level_text = " | ".join([f"{lvl}: {level_counts[lvl]}" for lvl in ["N5", "N4", "N3", "N2", "N1"]])
+        level_text = " | ".join(
+            [f"{lvl}: {level_counts[lvl]['due']}/{level_counts[lvl]['total']}" for lvl in ["N5", "N4", "N3", "N2", "N1"]]
+        )
         self.level_stats.setText(
-            f"Leech due: {leech_due} | Due by level: {level_text} | SRS reviews: {review['total']} ({review['accuracy']:.1f}% acc)"
+            f"Leech due: {leech_due} | Due/total by level: {level_text} | SRS reviews: {review['total']} ({review['accuracy']:.1f}% acc)"
         )
 
-        timeseries = get_attempt_timeseries(self.db, days=7)
         if timeseries:
             lines: List[str] = []
-            for row in timeseries:
+            for row in timeseries[:7]:
                 lines.append(f"{row['date']}: {row['total']} ({row['accuracy']:.0f}% correct)")
-            self.daily_stats.setText("Last 7 days: " + " | ".join(lines))
-            self._update_chart(timeseries)
+            self.daily_stats.setText("Recent days: " + " | ".join(lines))
+            self._update_chart(timeseries, chart_days)
         else:
-            self.daily_stats.setText("No activity in the last 7 days.")
+            self.daily_stats.setText(f"No activity in the last {chart_days} days.")
             if self.chart_view:
+                from PySide6.QtCharts import QChart
+
                 self.chart_view.setChart(QChart())
 
         self.btn_start_srs.setEnabled(due > 0)
 
+    def _ensure_chart_views(self) -> None:
+        if self.chart_view is not None or not _charts_available():
+            return
+        from PySide6.QtCharts import QChartView
+
+        self.chart_view = QChartView()
+        self.chart_view.setMinimumHeight(220)
+        self.chart_box.addWidget(self.chart_view)
+        self.forecast_view = QChartView()
+        self.forecast_view.setMinimumHeight(180)
+        self.chart_box.addWidget(self.forecast_view)
+
+    def _show_forecast(self, fc: Optional[Forecast]) -> None:
+        if fc is None:
+            return
+        tomorrow = f"{fc.mean[1]:.0f} ({fc.lo[1]:.0f}-{fc.hi[1]:.0f})" if len(fc.mean) > 1 else "-"
+        week = fc.total(7)
+        self.forecast_stats.setText(
+            f"Forecast: tomorrow {tomorrow} | next 7 days ~{week:.0f} | "
+            f"next {len(fc.mean)} days ~{fc.total():.0f} reviews (band {fc.band * 100:.0f}%)"
+        )
+        if not self.forecast_view:
+            return
+        from PySide6.QtCharts import QChart, QLineSeries, QValueAxis
+
+        chart = QChart()
+        series = []
+        for name, values in (("Expected", fc.mean), ("Low", fc.lo), ("High", fc.hi)):
+            line = QLineSeries()
+            line.setName(name)
+            for idx, value in enumerate(values.tolist()):
+                line.append(idx, value)
+            chart.addSeries(line)
+            series.append(line)
+
+        axis_x = QValueAxis()
+        axis_x.setRange(0, max(1, len(fc.mean) - 1))
+        axis_x.setLabelFormat("%d")
+        axis_x.setTitleText("Days from today")
+        chart.addAxis(axis_x, Qt.AlignBottom)
+        axis_y = QValueAxis()
+        axis_y.setRange(0, max(1.0, float(fc.hi.max())) * 1.1)
+        axis_y.setTitleText("Reviews")
+        chart.addAxis(axis_y, Qt.AlignLeft)
+        for line in series:
+            line.attachAxis(axis_x)
+            line.attachAxis(axis_y)
+        chart.setTitle(f"Review forecast ({fc.runs} simulations)")
+        self.forecast_view.setChart(chart)
+
     def export_csv(self) -> None:
         path, _ = QFileDialog.getSaveFileName(
             self, "Save attempts CSV", "", "CSV Files (*.csv);;All Files (*)"
@@ -174,9 +316,11 @@ class HomeView(QWidget):
             for r in rows:
                 writer.writerow([r[h] for h in headers])
 
-    def _update_chart(self, timeseries: List[dict]) -> None:
-        if not self.chart_view or not QChart:
+    def _update_chart(self, timeseries: List[dict], days: int = 7) -> None:
+        if not self.chart_view:
             return
+        from PySide6.QtCharts import QBarCategoryAxis, QBarSeries, QBarSet, QChart, QLineSeries, QValueAxis
+
         chart = QChart()
         chart.setAnimationOptions(QChart.SeriesAnimations)
         categories = [row["date"] for row in reversed(timeseries)]
@@ -197,6 +341,7 @@ class HomeView(QWidget):
 
         axis_x = QBarCategoryAxis()
         axis_x.append(categories)
+        axis_x.setLabelsVisible(len(categories) <= 31)
         chart.addAxis(axis_x, Qt.AlignBottom)
         bar_series.attachAxis(axis_x)
         line_series.attachAxis(axis_x)
@@ -212,5 +357,5 @@ class HomeView(QWidget):
         chart.addAxis(axis_y2, Qt.AlignRight)
         line_series.attachAxis(axis_y2)
 
-        chart.setTitle("Last 7 days")
+        chart.setTitle(f"Last {days} days")
         self.chart_view.setChart(chart)
@@ -1,10 +1,9 @@
 from __future__ import annotations
 import sqlite3
-import csv
 import os
 import random
+import time
 from typing import Callable, Optional, List, Tuple
-from dataclasses import dataclass, field
 
 from PySide6.QtWidgets import (
     QWidget,
@@ -18,26 +17,32 @@ from PySide6.QtWidgets import (
     QMessageBox,
     QLineEdit,
     QComboBox,
+    QCheckBox,
     QTextEdit,
     QDialog,
     QDialogButtonBox,
     QProgressDialog,
 )
-from PySide6.QtCore import Qt, QThread, QObject, Signal
-
-from app.db.repo import create_item_with_card, count_items, get_items_by_ids, build_cloze_preview
-from app.db.database import new_db_connection, init_db
-
-
-@dataclass
-class ImportResult:
-    imported: int = 0
-    errors: int = 0
-    skipped: int = 0  # duplicates merged/skipped
-    new_ids: List[int] = field(default_factory=list)
-    error_rows: List[str] = field(default_factory=list)
-    duplicate_rows: List[str] = field(default_factory=list)
-    warning_rows: List[str] = field(default_factory=list)  # e.g., cloze fallback
+from PySide6.QtCore import Qt, QThread, QObject, QTimer, Signal
+
+from app.db.repo import (
+    SHORT_QUERY_SCAN,
+    ImportResult,
+    count_items,
+    create_item_with_card,
+    get_items_by_ids,
+    get_key_collisions,
+    search_items_page,
+)
+from app.db.database import new_db_connection, init_db, read_db
+from app.ui.async_repo import AsyncRepo
+from app.db.importer import (
+    ValidationReport,
+    import_files,
+    import_files_parallel,
+    should_parallelize,
+    validate_csv_file,
+)
 
 
 class AddItemDialog(QDialog):
@@ -192,73 +197,111 @@ class QuickQuizDialog(QDialog):
 
 
 class ImportWorker(QObject):
-    progress = Signal(int, int, str)  # done, total, file name
+    progress = Signal(object, object, str)  # bytes done, total bytes, file name
     finished = Signal(ImportResult)
     error = Signal(str)
 
-    def __init__(self, view: "ImportView", tasks: List[Tuple[str, Optional[str]]]):
+    PROGRESS_INTERVAL = 0.1  # seconds between progress signals
+
+    def __init__(self, tasks: List[Tuple[str, Optional[str]]]):
         super().__init__()
-        self.view = view
         self.tasks = tasks
         self._stop = False
+        self._last_emit = 0.0
 
     def stop(self):
         self._stop = True
 
-    def _count_rows(self, path: str) -> int:
-        try:
-            with open(path, "r", encoding="utf-8-sig") as f:
-                return max(0, sum(1 for _ in f) - 1)
-        except Exception:
-            return 0
-
     def run(self):
         try:
             db = new_db_connection()
             init_db(db)
-            total_rows = sum(self._count_rows(p) for p, _ in self.tasks)
-            total_rows = total_rows if total_rows > 0 else 1
-            processed = 0
-            agg = ImportResult()
-
-            for path, level_tag in self.tasks:
-                rows_in_file = max(1, self._count_rows(path))
-
-                def progress_cb(done_file: int, total_file: int):
-                    if self._stop:
-                        raise RuntimeError("cancelled")
-                    self.progress.emit(processed + done_file, total_rows, os.path.basename(path))
-
-                result = self.view._import_csv(
-                    path,
-                    level_tag=level_tag,
-                    progress_cb=progress_cb,
-                    db_conn=db,
-                    total_rows_hint=rows_in_file,
-                )
-                processed += rows_in_file
-                agg.imported += result.imported
-                agg.errors += result.errors
-                agg.skipped += result.skipped
-                agg.new_ids.extend(result.new_ids)
-                agg.error_rows.extend(result.error_rows)
-                agg.duplicate_rows.extend(result.duplicate_rows)
-                agg.warning_rows.extend(result.warning_rows)
+            # File sizes are known up front, so no pre-read pass is needed.
+            sizes = [os.path.getsize(p) for p, _ in self.tasks]
+            total_bytes = max(1, sum(sizes))
+            offsets = {p: sum(sizes[:i]) for i, (p, _) in enumerate(self.tasks)}
+
+            def progress_cb(done_file: int, path: str):
+                if self._stop:
+                    raise RuntimeError("cancelled")
+                done = offsets.get(path, 0) + done_file
+                now = time.monotonic()
+                # Coalesce: at most one cross-thread signal per interval.
+                if now - self._last_emit >= self.PROGRESS_INTERVAL or done >= total_bytes:
+                    self._last_emit = now
+                    self.progress.emit(done, total_bytes, os.path.basename(path))
+
+            if should_parallelize(self.tasks):
+                # Parse files in worker processes; this thread only writes.
+                agg = import_files_parallel(db, self.tasks, progress_cb=progress_cb)
+            else:
+                agg = import_files(db, self.tasks, progress_cb=progress_cb)
 
             self.finished.emit(agg)
+        except Exception as e:
+            if self._stop:
+                self.error.emit("Đã hủy. Các phần đã import được giữ lại; import lại cùng file để tiếp tục.")
+            else:
+                self.error.emit(str(e))
+
+
+class ValidateWorker(QObject):
+    progress = Signal(object, object, str)  # bytes done, total bytes, file name
+    finished = Signal(object)  # ValidationReport
+    error = Signal(str)
+
+    PROGRESS_INTERVAL = 0.1
+
+    def __init__(self, path: str, level_tag: Optional[str], report_path: Optional[str]):
+        super().__init__()
+        self.path = path
+        self.level_tag = level_tag
+        self.report_path = report_path
+        self._stop = False
+        self._last_emit = 0.0
+
+    def stop(self):
+        self._stop = True
+
+    def run(self):
+        try:
+            total_bytes = max(1, os.path.getsize(self.path))
+            fname = os.path.basename(self.path)
+
+            def on_chunk(done: int):
+                if self._stop:
+                    raise RuntimeError("cancelled")
+                now = time.monotonic()
+                if now - self._last_emit >= self.PROGRESS_INTERVAL or done >= total_bytes:
+                    self._last_emit = now
+                    self.progress.emit(min(done, total_bytes), total_bytes, fname)
+
+            # Dry-run: a pooled read-only connection, nothing is written.
+            with read_db() as db:
+                report = validate_csv_file(
+                    db, self.path, level_tag=self.level_tag, report_path=self.report_path, on_chunk=on_chunk
+                )
+            self.finished.emit(report)
         except Exception as e:
             self.error.emit(str(e))
 
 
 class ImportView(QWidget):
-    def __init__(self, db: sqlite3.Connection, on_navigate: Callable[[str], None]):
+    def __init__(
+        self,
+        db: sqlite3.Connection,
+        on_navigate: Callable[[str], None],
+        async_repo: Optional[AsyncRepo] = None,
+    ):
         super().__init__()
         self.db = db
         self.on_navigate = on_navigate
+        self.async_repo = async_repo or AsyncRepo(self)
         self.data_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "data"))
 
         self._pending_missing: List[str] = []
         self._import_mode = "manual"
+        self._collisions: List[sqlite3.Row] = []
 
         layout = QVBoxLayout(self)
         layout.setSpacing(10)
@@ -267,27 +310,42 @@ class ImportView(QWidget):
         title.setStyleSheet("font-size: 16px; font-weight: 700;")
         layout.addWidget(title)
 
+        info_row = QHBoxLayout()
         self.info = QLabel("")
         self.info.setStyleSheet("color:#555;")
-        layout.addWidget(self.info)
+        # items the term+reading dedupe migration could not key (see get_key_collisions)
+        self.btn_collisions = QPushButton("")
+        self.btn_collisions.setCursor(Qt.PointingHandCursor)
+        self.btn_collisions.setStyleSheet("color:#b00020;")
+        self.btn_collisions.clicked.connect(self.on_show_collisions)
+        self.btn_collisions.hide()
+        info_row.addWidget(self.info, 1)
+        info_row.addWidget(self.btn_collisions)
+        layout.addLayout(info_row)
 
         actions = QHBoxLayout()
         self.btn_import = QPushButton("Import CSV")
+        self.btn_validate = QPushButton("Kiểm tra CSV")
+        self.chk_report = QCheckBox("Lưu report")
+        self.chk_report.setToolTip("Ghi toàn bộ dòng lỗi ra <file>.report.csv")
         self.btn_auto_import = QPushButton("Auto Import")
         self.cb_level = QComboBox()
         self.cb_level.addItems(["N5", "N4", "N3", "N2", "N1", "All"])
         self.btn_add = QPushButton("Thêm thẻ")
         self.btn_back = QPushButton("Về Home")
 
-        for b in [self.btn_import, self.btn_auto_import, self.btn_add, self.btn_back]:
+        for b in [self.btn_import, self.btn_validate, self.btn_auto_import, self.btn_add, self.btn_back]:
             b.setCursor(Qt.PointingHandCursor)
 
         self.btn_import.clicked.connect(self.on_import_csv)
+        self.btn_validate.clicked.connect(self.on_validate_csv)
         self.btn_auto_import.clicked.connect(self.on_auto_import)
         self.btn_add.clicked.connect(self.on_add_item)
         self.btn_back.clicked.connect(lambda: self.on_navigate("home"))
 
         actions.addWidget(self.btn_import)
+        actions.addWidget(self.btn_validate)
+        actions.addWidget(self.chk_report)
         actions.addWidget(self.btn_auto_import)
         actions.addWidget(QLabel("Level:"))
         actions.addWidget(self.cb_level)
@@ -296,22 +354,49 @@ class ImportView(QWidget):
         actions.addWidget(self.btn_back)
         layout.addLayout(actions)
 
+        self.ed_search = QLineEdit()
+        self.ed_search.setPlaceholderText("Tìm kiếm: term / reading / meaning / câu ví dụ...")
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(200)
+        self._search_timer.timeout.connect(self.refresh)
+        self.ed_search.textChanged.connect(lambda _: self._search_timer.start())
+        self.ed_search.returnPressed.connect(self.refresh)
+        layout.addWidget(self.ed_search)
+
         self.table = QTableWidget(0, 6)
         self.table.setHorizontalHeaderLabels(["type", "term", "reading", "meaning", "example", "tags"])
         self.table.horizontalHeader().setStretchLastSection(True)
         self.table.setWordWrap(True)
         layout.addWidget(self.table, 1)
 
-        self.refresh()
-
     def refresh(self) -> None:
-        total = count_items(self.db)
-        self.info.setText(f"Tổng mục hiện có: {total}. Import xong, thẻ SRS sẽ đến hạn ngay hôm nay.")
-        cur = self.db.execute(
-            """SELECT item_type, term, reading, meaning, example, tags
-                 FROM items ORDER BY id DESC LIMIT 100"""
-        )
-        rows = list(cur.fetchall())
+        query = self.ed_search.text().strip()
+
+        def load(db: sqlite3.Connection):
+            total = count_items(db)
+            partial = False
+            if query:
+                page = search_items_page(db, query, limit=100)
+                rows, partial = page.rows, page.partial
+            else:
+                cur = db.execute(
+                    """SELECT item_type, term, reading, meaning, example, tags
+                         FROM items ORDER BY id DESC LIMIT 100"""
+                )
+                rows = list(cur.fetchall())
+            return total, rows, partial, get_key_collisions(db)
+
+        self.async_repo.run("import", load, self._show_items)
+
+    def _show_items(self, loaded) -> None:
+        total, rows, partial, self._collisions = loaded
+        info = f"Tổng mục hiện có: {total}. Import xong, thẻ SRS sẽ đến hạn ngay hôm nay."
+        if partial:
+            info += f" Từ khóa 1-2 ký tự chỉ tìm trong {SHORT_QUERY_SCAN} mục mới nhất; nhập từ 3 ký tự để tìm toàn bộ."
+        self.info.setText(info)
+        self.btn_collisions.setText(f"Trùng term+reading: {len(self._collisions)}")
+        self.btn_collisions.setVisible(bool(self._collisions))
         self.table.setRowCount(len(rows))
         for r, row in enumerate(rows):
             for c, key in enumerate(["item_type", "term", "reading", "meaning", "example", "tags"]):
@@ -319,6 +404,20 @@ class ImportView(QWidget):
                 item.setFlags(item.flags() ^ Qt.ItemIsEditable)
                 self.table.setItem(r, c, item)
 
+    def on_show_collisions(self) -> None:
+        lines = [
+            f"#{row['item_id']} {row['term']} ({row['reading'] or ''}) trùng với #{row['kept_item_id']}"
+            for row in self._collisions[:30]
+        ]
+        if len(self._collisions) > 30:
+            lines.append("...")
+        QMessageBox.information(
+            self,
+            "Trùng term+reading",
+            "Các mục sau trùng term+reading (sau chuẩn hóa) với một mục cũ hơn nên chưa được dedupe. "
+            "Hãy gộp hoặc xóa thủ công:\n\n" + "\n".join(lines),
+        )
+
     def on_add_item(self):
         dlg = AddItemDialog(self)
         if dlg.exec() == QDialog.Accepted:
@@ -345,15 +444,6 @@ class ImportView(QWidget):
                     "Term + reading đã tồn tại, đã merge tags/example và giữ thẻ cũ (đến hạn hôm nay).",
                 )
 
-    def _merge_tags(self, tags: str, level_tag: Optional[str]) -> str:
-        tags = tags or ""
-        parts = [t.strip() for t in tags.split(",") if t.strip()]
-        if level_tag:
-            level_upper = level_tag.upper()
-            if level_upper not in {t.upper() for t in parts}:
-                parts.insert(0, level_tag)
-        return ", ".join(parts)
-
     def _data_path_for_level(self, level: str) -> Optional[str]:
         level_key = (level or "").strip().lower()
         if not level_key:
@@ -369,141 +459,17 @@ class ImportView(QWidget):
                 return path
         return None
 
-    def _detect_dialect(self, sample: str) -> csv.Dialect:
-        try:
-            return csv.Sniffer().sniff(sample, delimiters=[",", "\t", ";"])
-        except Exception:
-            return csv.excel
-
-    def _map_row(self, row: dict, level_tag: Optional[str]) -> dict:
-        keys = {k.lower(): k for k in row.keys()}
-
-        def pick(*names: str) -> str:
-            for n in names:
-                if n in keys:
-                    return (row.get(keys[n]) or "").strip()
-            return ""
-
-        item_type = pick("item_type", "type")
-        if item_type not in ("vocab", "kanji", "grammar"):
-            item_type = "vocab"
-
-        term = pick("term", "front", "expression", "word")
-        reading = pick("reading", "pronunciation", "kana", "furigana")
-        meaning = pick("meaning", "back", "definition", "gloss")
-        example = pick("example", "sentence", "context", "note")
-        tags = pick("tags")
-        deck = pick("deck")
-        if deck and not tags:
-            tags = deck
-
-        if level_tag:
-            tags = self._merge_tags(tags, level_tag)
-
-        if not term or not meaning:
-            raise ValueError("Missing term/meaning")
-
-        return {
-            "item_type": item_type,
-            "term": term,
-            "reading": reading,
-            "meaning": meaning,
-            "example": example,
-            "tags": tags,
-        }
-
-    def _count_rows(self, path: str) -> int:
-        try:
-            with open(path, "r", encoding="utf-8-sig") as f:
-                return max(0, sum(1 for _ in f) - 1)
-        except Exception:
-            return 0
-
-    def _import_csv(
-        self,
-        path: str,
-        level_tag: Optional[str] = None,
-        progress_cb: Optional[Callable[[int, int], None]] = None,
-        db_conn: Optional[sqlite3.Connection] = None,
-        total_rows_hint: Optional[int] = None,
-    ) -> ImportResult:
-        db = db_conn or self.db
-        imported = 0
-        errors = 0
-        skipped = 0
-        error_rows: List[str] = []
-        duplicate_rows: List[str] = []
-        warning_rows: List[str] = []
-        new_ids: List[int] = []
-
-        total_rows = total_rows_hint or self._count_rows(path) or 1
-        processed_file = 0
-
-        with open(path, "r", encoding="utf-8-sig", newline="") as f:
-            sample = f.read(2048)
-            f.seek(0)
-            dialect = self._detect_dialect(sample)
-            reader = csv.DictReader(f, dialect=dialect)
-            if reader.fieldnames is None:
-                raise ValueError("CSV missing header.")
-
-            for row_num, row in enumerate(reader, start=2):
-                try:
-                    data = self._map_row(row, level_tag=level_tag)
-                    if data["example"]:
-                        _, _, used_fallback, reason = build_cloze_preview(data["example"], data["term"])
-                        if used_fallback:
-                            warning_rows.append(f"Row {row_num}: cloze fallback ({reason}) - term không có trong câu?")
-                    new_id, created = create_item_with_card(
-                        db,
-                        item_type=data["item_type"],
-                        term=data["term"],
-                        reading=data["reading"],
-                        meaning=data["meaning"],
-                        example=data["example"],
-                        tags=data["tags"],
-                    )
-                    if created:
-                        new_ids.append(new_id)
-                        imported += 1
-                    else:
-                        skipped += 1
-                        duplicate_rows.append(f"Row {row_num}: trùng term+reading (id={new_id})")
-                except Exception as e:
-                    errors += 1
-                    msg = str(e).strip() or e.__class__.__name__
-                    error_rows.append(f"Row {row_num}: {msg}")
-                finally:
-                    processed_file += 1
-                    if progress_cb:
-                        progress_cb(min(processed_file, total_rows), total_rows)
-
-        return ImportResult(
-            imported=imported,
-            errors=errors,
-            skipped=skipped,
-            new_ids=new_ids,
-            error_rows=error_rows,
-            duplicate_rows=duplicate_rows,
-            warning_rows=warning_rows,
-        )
-
-    def _start_worker(self, tasks: List[Tuple[str, Optional[str]]], mode: str, missing: Optional[List[str]] = None):
-        if not tasks:
-            return
-        self._import_mode = mode
-        self._pending_missing = missing or []
-        dialog = QProgressDialog("Đang import...", "Hủy", 0, 100, self)
+    def _run_worker(self, worker: QObject, label: str, on_done: Callable[[object], None]) -> None:
+        dialog = QProgressDialog(f"{label}...", "Hủy", 0, 100, self)
         dialog.setWindowModality(Qt.WindowModal)
         dialog.setMinimumDuration(0)
 
         thread = QThread(self)
-        worker = ImportWorker(self, tasks)
         worker.moveToThread(thread)
 
         def on_progress(done: int, total: int, fname: str):
             percent = int(done / total * 100) if total else 0
-            dialog.setLabelText(f"Đang import {fname} ({done}/{total})")
+            dialog.setLabelText(f"{label} {fname} ({percent}%)")
             dialog.setValue(percent)
 
         def cleanup():
@@ -512,9 +478,9 @@ class ImportView(QWidget):
             thread.quit()
             thread.wait()
 
-        def on_finished(result: ImportResult):
+        def on_finished(result: object):
             cleanup()
-            self._handle_result(result)
+            on_done(result)
 
         def on_error(msg: str):
             cleanup()
@@ -527,6 +493,13 @@ class ImportView(QWidget):
         thread.started.connect(worker.run)
         thread.start()
 
+    def _start_worker(self, tasks: List[Tuple[str, Optional[str]]], mode: str, missing: Optional[List[str]] = None):
+        if not tasks:
+            return
+        self._import_mode = mode
+        self._pending_missing = missing or []
+        self._run_worker(ImportWorker(tasks), "Đang import", self._handle_result)
+
     def on_auto_import(self):
         level = (self.cb_level.currentText() or "").strip().upper()
         if level == "ALL":
@@ -557,6 +530,40 @@ class ImportView(QWidget):
             return
         self._start_worker([(path, None)], mode="manual")
 
+    def on_validate_csv(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Chọn file CSV để kiểm tra", "", "CSV Files (*.csv);;All Files (*)"
+        )
+        if not path:
+            return
+        level = (self.cb_level.currentText() or "").strip().upper()
+        level_tag = level if level in ("N5", "N4", "N3", "N2", "N1") else None
+        report_path = path + ".report.csv" if self.chk_report.isChecked() else None
+        self._run_worker(ValidateWorker(path, level_tag, report_path), "Đang kiểm tra", self._handle_validation)
+
+    def _handle_validation(self, report: ValidationReport):
+        labels = {
+            "missing_term_meaning": "Thiếu term/meaning",
+            "parse_error": "Lỗi đọc dòng",
+            "duplicate_existing": "Trùng với DB",
+            "duplicate_in_file": "Trùng trong file",
+            "cloze_fallback": "Cloze fallback",
+        }
+        msg = (
+            f"{os.path.basename(report.path)}: {report.records} dòng, "
+            f"{report.valid} mục mới sẽ được tạo (chưa ghi gì vào DB)."
+        )
+        for kind, count in report.counts.items():
+            msg += f"\n\n{labels.get(kind, kind)}: {count}"
+            samples = report.samples.get(kind, [])[:8]
+            if samples:
+                msg += "\n" + "\n".join(samples)
+                if count > len(samples):
+                    msg += "\n..."
+        if report.report_path:
+            msg += f"\n\nReport đầy đủ: {report.report_path}"
+        QMessageBox.information(self, "Kiểm tra CSV", msg)
+
     def _handle_result(self, result: ImportResult):
         self.refresh()
         msg = (
@@ -568,17 +575,17 @@ class ImportView(QWidget):
             msg += " Missing files for: " + ", ".join(self._pending_missing) + "."
         if result.errors and result.error_rows:
             preview = "\n".join(result.error_rows[:8])
-            if result.errors > len(result.error_rows):
+            if result.errors > 8:
                 preview += "\n..."
             msg += "\nError rows (preview):\n" + preview
         if result.skipped and result.duplicate_rows:
             preview_dup = "\n".join(result.duplicate_rows[:8])
-            if result.skipped > len(result.duplicate_rows):
+            if result.skipped > 8:
                 preview_dup += "\n..."
             msg += "\nDuplicates (preview):\n" + preview_dup
         if result.warning_rows:
             preview_warn = "\n".join(result.warning_rows[:8])
-            if len(result.warning_rows) > 8:
+            if result.warnings > 8:
                 preview_warn += "\n..."
             msg += "\nCloze warnings:\n" + preview_warn
 
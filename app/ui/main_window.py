@@ -1,5 +1,6 @@
 from __future__ import annotations
 import sqlite3
+from typing import Callable, Dict
 from PySide6.QtWidgets import (
     QFrame,
     QHBoxLayout,
@@ -10,16 +11,46 @@ from PySide6.QtWidgets import (
     QVBoxLayout,
     QWidget,
 )
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QTimer, Signal
 
+from app.db.review_writer import ReviewWriter
+from app.ui.async_repo import AsyncRepo
 from app.ui.home_view import HomeView
-from app.ui.import_view import ImportView
-from app.ui.srs_view import SrsReviewView
-from app.ui.cloze_view import ClozePracticeView
-from app.ui.test_view import MiniTestView
+
+
+ROUTES = ("home", "import", "srs", "cloze", "test")
+
+
+def _import_view():
+    from app.ui.import_view import ImportView
+
+    return ImportView
+
+
+def _srs_view():
+    from app.ui.srs_view import SrsReviewView
+
+    return SrsReviewView
+
+
+def _cloze_view():
+    from app.ui.cloze_view import ClozePracticeView
+
+    return ClozePracticeView
+
+
+def _test_view():
+    from app.ui.test_view import MiniTestView
+
+    return MiniTestView
+
+
+WARM_DELAY_MS = 300  # after the first paint, build the other views one per idle tick
 
 
 class MainWindow(QMainWindow):
+    review_write_error = Signal(object)  # ReviewWriter.on_error, re-emitted on the UI thread
+
     def __init__(self, db: sqlite3.Connection):
         super().__init__()
         self.db = db
@@ -28,22 +59,30 @@ class MainWindow(QMainWindow):
 
         self._apply_theme()
 
+        # SRS grades are committed in the background; replays a journal left by a crash
+        self.review_write_error.connect(self._on_review_write_error)
+        self.review_writer = ReviewWriter(on_error=self.review_write_error.emit)
+        self.review_writer.start()
+        # view reads run on the thread pool; pending grades are flushed first
+        self.async_repo = AsyncRepo(self, before_read=self.review_writer.flush)
+
         root = QWidget()
         self.setCentralWidget(root)
 
         self.stack = QStackedWidget()
-
-        self.home = HomeView(db=self.db, on_navigate=self.navigate)
-        self.import_view = ImportView(db=self.db, on_navigate=self.navigate)
-        self.srs_view = SrsReviewView(db=self.db, on_navigate=self.navigate)
-        self.cloze_view = ClozePracticeView(db=self.db, on_navigate=self.navigate)
-        self.test_view = MiniTestView(db=self.db, on_navigate=self.navigate)
-
-        self.stack.addWidget(self.home)
-        self.stack.addWidget(self.import_view)
-        self.stack.addWidget(self.srs_view)
-        self.stack.addWidget(self.cloze_view)
-        self.stack.addWidget(self.test_view)
+        # Views are built on first navigation (or warmed after the first paint),
+        # so startup cost is Home's alone; constructors do no DB work.
+        # View modules other than Home are imported by their factory.
+        views = dict(db=self.db, on_navigate=self.navigate, async_repo=self.async_repo)
+        self._factories: Dict[str, Callable[[], QWidget]] = {
+            "home": lambda: HomeView(**views),
+            "import": lambda: _import_view()(**views),
+            "srs": lambda: _srs_view()(**views, review_writer=self.review_writer),
+            "cloze": lambda: _cloze_view()(**views),
+            "test": lambda: _test_view()(**views),
+        }
+        self.views: Dict[str, QWidget] = {}
+        self._warmed = False
 
         layout = QVBoxLayout(root)
         layout.setContentsMargins(12, 12, 12, 12)
@@ -191,27 +230,52 @@ QTableWidget::item {
 """
         )
 
+    def _on_review_write_error(self, error) -> None:
+        if error is None:
+            self.statusBar().clearMessage()
+        else:
+            self.statusBar().showMessage(f"Không lưu được kết quả ôn tập, đang thử lại: {error}")
+
+    def shutdown(self) -> None:
+        """Drop pending reads and commit pending reviews before the connections close."""
+        self.async_repo.cancel_all()
+        self.async_repo.pool.waitForDone()
+        self.review_writer.close()
+
+    def view(self, route: str) -> QWidget:
+        """The view for a route, constructed on first use."""
+        widget = self.views.get(route)
+        if widget is None:
+            widget = self._factories[route]()
+            self.views[route] = widget
+            self.stack.addWidget(widget)
+        return widget
+
+    def showEvent(self, event) -> None:
+        super().showEvent(event)
+        if not self._warmed:
+            self._warmed = True
+            QTimer.singleShot(WARM_DELAY_MS, self._warm_next_view)
+
+    def _warm_next_view(self) -> None:
+        pending = [r for r in ROUTES if r not in self.views]
+        if pending:
+            self.view(pending[0])
+            QTimer.singleShot(0, self._warm_next_view)
+
     def navigate(self, route: str) -> None:
         route = (route or "").lower().strip()
+        if route not in self._factories:
+            route = "home"
+        # results of the view we are leaving are stale now
+        self.async_repo.cancel_all()
         self._set_active_nav(route)
-        if route == "home":
-            self.home.refresh()
-            self.stack.setCurrentWidget(self.home)
-        elif route == "import":
-            self.import_view.refresh()
-            self.stack.setCurrentWidget(self.import_view)
-        elif route == "srs":
-            self.srs_view.refresh()
-            self.stack.setCurrentWidget(self.srs_view)
-        elif route == "cloze":
-            self.cloze_view.refresh()
-            self.stack.setCurrentWidget(self.cloze_view)
-        elif route == "test":
-            self.test_view.start_new_test()
-            self.stack.setCurrentWidget(self.test_view)
+        widget = self.view(route)
+        if route == "test":
+            widget.start_new_test()
         else:
-            self.home.refresh()
-            self.stack.setCurrentWidget(self.home)
+            widget.refresh()
+        self.stack.setCurrentWidget(widget)
 
     def _set_active_nav(self, route: str) -> None:
         for key, btn in self.nav_buttons.items():
@@ -1,6 +1,6 @@
 from __future__ import annotations
 import sqlite3
-from typing import Callable
+from typing import Callable, Optional, Sequence
 
 from PySide6.QtWidgets import (
     QWidget,
@@ -16,17 +16,43 @@ from PySide6.QtWidgets import (
 )
 from PySide6.QtCore import Qt
 
-from app.db.repo import fetch_due_cards, update_card, log_review
+from app.core.time_utils import today_day
+from app.db.repo import fetch_due_cards, get_setting, set_setting, settings_version
+from app.db.review_writer import PREV_KEYS, ReviewEvent, ReviewWriter, apply_review_event
 from app.srs.engine import SrsState, apply_grade
+from app.srs.fsrs import (
+    SCHEDULER_SETTING,
+    WEIGHTS_SETTING,
+    FsrsState,
+    apply_grade_fsrs,
+    parse_weights,
+    stability_from_sm2,
+)
+from app.srs.review_queue import ReviewQueue
+from app.ui.async_repo import AsyncRepo
+
+SCHEDULERS = [("SM-2", "sm2"), ("FSRS", "fsrs")]
 
 
 class SrsReviewView(QWidget):
-    def __init__(self, db: sqlite3.Connection, on_navigate: Callable[[str], None]):
+    def __init__(
+        self,
+        db: sqlite3.Connection,
+        on_navigate: Callable[[str], None],
+        review_writer: Optional[ReviewWriter] = None,
+        async_repo: Optional[AsyncRepo] = None,
+    ):
         super().__init__()
         self.db = db
         self.on_navigate = on_navigate
+        self.async_repo = async_repo or AsyncRepo(self)
+        # grades go through the write-behind writer when given, else inline
+        self.review_writer = review_writer
 
-        self.queue = []
+        self.queue: Optional[ReviewQueue] = None
+        # scheduler settings, loaded with the first page; stale once settings_version() moves
+        self._settings_version = -1
+        self._weights: Optional[Sequence[float]] = None
         self.current = None
         self.revealed = False
 
@@ -50,7 +76,14 @@ class SrsReviewView(QWidget):
         self.ed_tag.setPlaceholderText("Filter by tag...")
         self.ed_tag.returnPressed.connect(self.refresh)
 
+        self.cb_scheduler = QComboBox()
+        for label, key in SCHEDULERS:
+            self.cb_scheduler.addItem(label, key)
+        self.cb_scheduler.currentIndexChanged.connect(self._on_scheduler_changed)
+
         top_row.addWidget(self.status, 1)
+        top_row.addWidget(QLabel("Scheduler:"))
+        top_row.addWidget(self.cb_scheduler)
         top_row.addWidget(QLabel("JLPT:"))
         top_row.addWidget(self.cb_level)
         top_row.addWidget(self.ed_tag)
@@ -109,7 +142,62 @@ class SrsReviewView(QWidget):
 
         layout.addLayout(btn_row)
 
-        self.refresh()
+    def _on_scheduler_changed(self) -> None:
+        set_setting(self.db, SCHEDULER_SETTING, self.cb_scheduler.currentData())
+        # our own write: the combo box already shows it, the weights are unchanged
+        self._settings_version = settings_version()
+
+    def _schedule(self, grade: str) -> dict:
+        """New card fields for `grade` with the selected scheduler."""
+        card = self.current
+        if self.cb_scheduler.currentData() == "fsrs":
+            stability, difficulty = card["stability"], card["difficulty"]
+            if stability is None and int(card["interval_days"]) > 0:
+                # first FSRS review of a card scheduled by SM-2 so far
+                stability, difficulty = stability_from_sm2(int(card["interval_days"]), float(card["ease"]))
+            last_day = card["last_review_day"]
+            state = apply_grade_fsrs(
+                FsrsState(
+                    due_date=str(card["due_date"]),
+                    interval_days=int(card["interval_days"]),
+                    stability=stability,
+                    difficulty=difficulty,
+                    lapses=int(card["lapses"]),
+                    is_leech=int(card["is_leech"]),
+                ),
+                grade,  # type: ignore
+                None if last_day is None else today_day() - int(last_day),
+                self._weights,
+            )
+            return {
+                "due_date": state.due_date,
+                "interval_days": state.interval_days,
+                "ease": float(card["ease"]),
+                "lapses": state.lapses,
+                "is_leech": state.is_leech,
+                "stability": state.stability,
+                "difficulty": state.difficulty,
+            }
+
+        state = apply_grade(
+            SrsState(
+                due_date=str(card["due_date"]),
+                interval_days=int(card["interval_days"]),
+                ease=float(card["ease"]),
+                lapses=int(card["lapses"]),
+                is_leech=int(card["is_leech"]),
+            ),
+            grade,  # type: ignore
+        )
+        return {
+            "due_date": state.due_date,
+            "interval_days": state.interval_days,
+            "ease": state.ease,
+            "lapses": state.lapses,
+            "is_leech": state.is_leech,
+            "stability": None,
+            "difficulty": None,
+        }
 
     def _filters(self):
         level = self.cb_level.currentText()
@@ -119,32 +207,109 @@ class SrsReviewView(QWidget):
 
     def refresh(self) -> None:
         level_filter, tag_filter = self._filters()
-        self.queue = fetch_due_cards(
-            self.db,
-            limit=300,
-            leech_only=self.chk_leech.isChecked(),
-            tag_filter=tag_filter,
-            level_filter=level_filter,
-        )
-        self.status.setText(
-            f"Queue: {len(self.queue)} | JLPT: {level_filter or 'all'} | tag: {tag_filter or 'all'} "
-            f"| leech only: {self.chk_leech.isChecked()}"
-        )
-        self._next_card()
+        leech_only = self.chk_leech.isChecked()
+
+        def fetch_page_with(db, after, limit):
+            return fetch_due_cards(
+                db,
+                limit=limit,
+                leech_only=leech_only,
+                tag_filter=tag_filter,
+                level_filter=level_filter,
+                after=after,
+            )
+
+        if self.queue is not None:
+            self.queue.close()
+        self.queue = None
+        self.current = None
+        self.front.setText("Loading...")
+        self.back.setText("")
+        self.btn_reveal.setEnabled(False)
+        for b in [self.btn_again, self.btn_hard, self.btn_good, self.btn_easy]:
+            b.setEnabled(False)
+
+        def request_page(after, limit):
+            # later pages: a pooled read, handed back to the queue on the UI thread
+            self.async_repo.run(
+                "srs-page",
+                lambda db: fetch_page_with(db, after, limit),
+                lambda rows: self._on_page(queue, rows),
+                lambda e: self._on_page_error(queue, e),
+            )
+
+        queue = ReviewQueue(request_page)
+        version = settings_version()
+        load_settings = version != self._settings_version
+
+        def load(db):
+            settings = None
+            if load_settings:
+                settings = (get_setting(db, SCHEDULER_SETTING, "sm2"), parse_weights(get_setting(db, WEIGHTS_SETTING)))
+            return fetch_page_with(db, None, queue.page_size), settings
+
+        def on_loaded(result) -> None:
+            rows, settings = result
+            if settings is not None:
+                self._apply_settings(version, *settings)
+            self.queue = queue
+            queue.start(rows)
+            self.status.setText(
+                f"Queue: {self._remaining_text()} | JLPT: {level_filter or 'all'} | tag: {tag_filter or 'all'} "
+                f"| leech only: {leech_only}"
+            )
+            self._next_card()
+
+        def on_error(e: BaseException) -> None:
+            self.front.setText("Could not load due cards.")
+            self.status.setText(str(e))
+
+        # first page on the pool; the queue requests later pages below its low-water mark
+        self.async_repo.run("srs", load, on_loaded, on_error)
+
+    def _on_page(self, queue: ReviewQueue, rows) -> None:
+        queue.add_page(rows)
+        if queue is self.queue and self.current is None:
+            self._next_card()  # the queue ran dry while the page was loading
+
+    def _on_page_error(self, queue: ReviewQueue, e: BaseException) -> None:
+        queue.fail(e)
+        if queue is self.queue and self.current is None:
+            self._next_card()
+
+    def _apply_settings(self, version: int, scheduler: Optional[str], weights: Sequence[float]) -> None:
+        self._settings_version = version
+        self._weights = weights
+        self.cb_scheduler.blockSignals(True)
+        self.cb_scheduler.setCurrentIndex(max(0, self.cb_scheduler.findData(scheduler)))
+        self.cb_scheduler.blockSignals(False)
+
+    def _remaining_text(self, extra: int = 0) -> str:
+        if self.queue is None:
+            return str(extra)
+        return f"{len(self.queue) + extra}{'' if self.queue.exhausted else '+'}"
 
     def _next_card(self) -> None:
         self.revealed = False
         self.back.setText("")
-        if not self.queue:
+        card = self.queue.pop() if self.queue is not None else None
+        if card is None:
             self.current = None
-            self.front.setText("All due cards are done for today!")
-            self.status.setText("You can go back home or import more data.")
+            if self.queue is not None and self.queue.loading:
+                self.front.setText("Loading...")
+                self.status.setText("Fetching more due cards...")
+            elif self.queue is not None and self.queue.error is not None:
+                self.front.setText("Could not load more due cards.")
+                self.status.setText(str(self.queue.error))
+            else:
+                self.front.setText("All due cards are done for today!")
+                self.status.setText("You can go back home or import more data.")
             self.btn_reveal.setEnabled(False)
             for b in [self.btn_again, self.btn_hard, self.btn_good, self.btn_easy]:
                 b.setEnabled(False)
             return
 
-        self.current = self.queue.pop(0)
+        self.current = card
         self.btn_reveal.setEnabled(True)
         for b in [self.btn_again, self.btn_hard, self.btn_good, self.btn_easy]:
             b.setEnabled(False)
@@ -153,7 +318,7 @@ class SrsReviewView(QWidget):
         reading = self.current["reading"] or ""
         item_type = self.current["item_type"]
         self.front.setText(f"[{item_type}] {term}  {('(' + reading + ')') if reading else ''}".strip())
-        self.status.setText(f"Remaining: {len(self.queue)+1} cards")
+        self.status.setText(f"Remaining: {self._remaining_text(1)} cards")
 
     def on_reveal(self) -> None:
         if not self.current:
@@ -183,46 +348,28 @@ class SrsReviewView(QWidget):
             QMessageBox.information(self, "Heads up", "Please tap 'Show Answer' before grading.")
             return
 
-        state = SrsState(
-            due_date=str(self.current["due_date"]),
-            interval_days=int(self.current["interval_days"]),
-            ease=float(self.current["ease"]),
-            lapses=int(self.current["lapses"]),
-            is_leech=int(self.current["is_leech"]),
-        )
-        new_state = apply_grade(state, grade)  # type: ignore
-
-        update_card(
-            self.db,
-            card_id=int(self.current["id"]),
-            due_date=new_state.due_date,
-            interval_days=new_state.interval_days,
-            ease=new_state.ease,
-            lapses=new_state.lapses,
-            last_grade=grade,
-            is_leech=new_state.is_leech,
-        )
-        log_review(
-            self.db,
+        new_state = self._schedule(grade)
+        event = ReviewEvent(
             card_id=int(self.current["id"]),
             grade=grade,
             is_correct=(grade != "again"),
+            card=new_state,
             item_id=int(self.current["item_id"]),
             prompt=self.front.text(),
             expected=self.current["meaning"] or "",
             response=grade,
+            prev={k: self.current[k] for k in PREV_KEYS},
+            scheduler=self.cb_scheduler.currentData(),
         )
+        if self.review_writer is not None:
+            self.review_writer.submit(event)
+        else:
+            apply_review_event(self.db, event)
+            self.db.commit()
         if grade == "again":
             retry = dict(self.current)
-            retry.update(
-                {
-                    "due_date": new_state.due_date,
-                    "interval_days": new_state.interval_days,
-                    "ease": new_state.ease,
-                    "lapses": new_state.lapses,
-                    "is_leech": new_state.is_leech,
-                }
-            )
-            insert_at = 2 if len(self.queue) >= 2 else len(self.queue)
-            self.queue.insert(insert_at, retry)
+            retry.update({k: v for k, v in new_state.items() if v is not None})
+            retry["last_review_day"] = today_day()
+            if self.queue is not None:
+                self.queue.push_relearn(retry)
         self._next_card()
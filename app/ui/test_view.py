@@ -16,6 +16,7 @@ from PySide6.QtWidgets import (
 )
 from PySide6.QtCore import Qt
 
+from app.ui.async_repo import AsyncRepo
 from app.db.repo import (
     get_test_batch,
     record_attempt,
@@ -30,10 +31,16 @@ from app.db.repo import (
 
 
 class MiniTestView(QWidget):
-    def __init__(self, db: sqlite3.Connection, on_navigate: Callable[[str], None]):
+    def __init__(
+        self,
+        db: sqlite3.Connection,
+        on_navigate: Callable[[str], None],
+        async_repo: Optional[AsyncRepo] = None,
+    ):
         super().__init__()
         self.db = db
         self.on_navigate = on_navigate
+        self.async_repo = async_repo or AsyncRepo(self)
 
         self.questions = []
         self.index = 0
@@ -130,25 +137,47 @@ class MiniTestView(QWidget):
         btn_row.addWidget(self.btn_back)
         layout.addLayout(btn_row)
 
-        self.start_new_test()
-
     def start_new_test(self) -> None:
         level = self.cb_level.currentText()
         level_filter = None if level == "All" else level
         tag_filter = self.ed_tag.text().strip() or None
-        self.questions = get_test_batch(
-            self.db,
-            total=self.sp_total.value(),
-            only_mistake=self.cb_only_mistake.isChecked(),
-            only_due=self.cb_only_due.isChecked(),
-            tag_filter=tag_filter,
-            level_filter=level_filter,
+        total = self.sp_total.value()
+        only_mistake = self.cb_only_mistake.isChecked()
+        only_due = self.cb_only_due.isChecked()
+        self.questions = []
+        self.lbl_cloze.setText("Loading...")
+        self.lbl_hint.setText("")
+        for b in [self.btn_check, self.btn_show, self.btn_next]:
+            b.setEnabled(False)
+
+        def on_loaded(questions) -> None:
+            self.questions = questions
+            self.index = 0
+            self.correct = 0
+            # the test_attempts row is created on the first answer, so opening
+            # the tab (or rebuilding a test) writes nothing
+            self.test_attempt_id = None
+            self._next_question()
+
+        self.async_repo.run(
+            "test",
+            lambda db: get_test_batch(
+                db,
+                total=total,
+                only_mistake=only_mistake,
+                only_due=only_due,
+                tag_filter=tag_filter,
+                level_filter=level_filter,
+            ),
+            on_loaded,
         )
-        self.index = 0
-        self.correct = 0
-        self.test_id = get_or_create_test(self.db, title="Mini Test")
-        self.test_attempt_id = create_test_attempt(self.db, test_id=self.test_id)
-        self._next_question()
+
+    def _ensure_attempt(self) -> int:
+        if self.test_attempt_id is None:
+            if self.test_id is None:
+                self.test_id = get_or_create_test(self.db, title="Mini Test")
+            self.test_attempt_id = create_test_attempt(self.db, test_id=self.test_id)
+        return self.test_attempt_id
 
     def _update_status(self) -> None:
         total = len(self.questions)
@@ -208,6 +237,7 @@ class MiniTestView(QWidget):
         expected = (q.get("answer") or q.get("term") or "").strip()
         is_correct = response.lower() == expected.lower() if expected else False
         item_id = q.get("item_id")
+        test_attempt_id = self._ensure_attempt()
 
         attempt_id = record_attempt(
             self.db,
@@ -216,7 +246,7 @@ class MiniTestView(QWidget):
             card_id=q.get("card_id"),
             sentence_id=q.get("sentence_id"),
             test_id=self.test_id,
-            test_attempt_id=self.test_attempt_id,
+            test_attempt_id=test_attempt_id,
             prompt=q.get("cloze") or "",
             response=response,
             expected=expected,
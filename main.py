@@ -1,7 +1,7 @@
 import sys
 from PySide6.QtWidgets import QApplication
 from app.ui.main_window import MainWindow
-from app.db.database import get_db, init_db
+from app.db.database import get_db, get_manager, init_db
 
 def main():
     app = QApplication(sys.argv)
@@ -10,6 +10,9 @@ def main():
     init_db(db)
 
     win = MainWindow(db=db)
+    app.aboutToQuit.connect(win.shutdown)
+    app.aboutToQuit.connect(get_manager().close)
+
     win.show()
     sys.exit(app.exec())
 
@@ -0,0 +1,41 @@
+"""
+Shared setup of the bench_* scripts. Importing it puts the repo root on
+sys.path, so `import _bench` goes before the app imports.
+
+App modules are imported inside the functions: bench_startup's child process
+imports this module too, and must not load app code before it measures it.
+"""
+from __future__ import annotations
+import os
+import sqlite3
+import sys
+import tempfile
+from typing import Optional
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+_DB_FILES = ("", "-wal", "-shm", "-reviews.jsonl")  # DB, WAL, shared memory, review journal
+
+
+def bench_db_path(path: Optional[str], name: str) -> str:
+    """`path` (default: `name` in a new temp dir) with any previous DB files removed."""
+    path = path or os.path.join(tempfile.mkdtemp(), name)
+    for suffix in _DB_FILES:
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    return path
+
+
+def open_bench_db(path: str) -> sqlite3.Connection:
+    """A migrated WAL database with the app's pragmas; never the app DB."""
+    from app.db.database import _apply_pragmas
+    from app.db.schema import ensure_schema
+
+    db = sqlite3.connect(path)
+    db.row_factory = sqlite3.Row
+    db.execute("PRAGMA journal_mode = WAL;")
+    _apply_pragmas(db)
+    ensure_schema(db)
+    return db
@@ -0,0 +1,73 @@
+"""
+Benchmark the FSRS weight optimizer on a synthetic review history.
+
+    python scripts/bench_fsrs_fit.py [--reviews 1000000] [--per-card 20]
+
+Reviews are simulated from perturbed "true" weights, then fit_weights starts
+from DEFAULT_WEIGHTS; the fit should approach the loss of the true weights.
+"""
+from __future__ import annotations
+import argparse
+import time
+
+import numpy as np
+
+import _bench  # noqa: F401  (repo root on sys.path)
+from app.srs.fsrs import (
+    DEFAULT_WEIGHTS,
+    init_difficulty,
+    init_stability,
+    next_difficulty,
+    next_stability,
+    retrievability,
+    sanitize_weights,
+)
+from app.srs.fsrs_fit import build_history, fit_weights, log_loss
+
+
+def simulate(n_cards: int, per_card: int, w: np.ndarray, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    g = rng.choice([1, 2, 3, 4], size=n_cards, p=[0.2, 0.15, 0.5, 0.15])
+    s, d = init_stability(w, g), init_difficulty(w, g)
+    day = np.zeros(n_cards, dtype=np.int64)
+    days, grades = [day.copy()], [g.copy()]
+    for _ in range(per_card - 1):
+        t = np.maximum(1, np.rint(s * rng.uniform(0.5, 1.6, n_cards))).astype(np.int64)
+        day = day + t
+        r = retrievability(t, s)
+        g = np.where(rng.random(n_cards) < r, rng.choice([2, 3, 4], size=n_cards, p=[0.15, 0.7, 0.15]), 1)
+        days.append(day.copy())
+        grades.append(g)
+        s, d = next_stability(w, d, s, r, g), next_difficulty(w, d, g)
+    # (cards, steps) -> flat rows ordered by card, then time
+    card_ids = np.repeat(np.arange(n_cards), per_card)
+    return card_ids, np.stack(days, axis=1).ravel(), np.stack(grades, axis=1).ravel()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reviews", type=int, default=1_000_000)
+    parser.add_argument("--per-card", type=int, default=20)
+    parser.add_argument("--epochs", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    true_w = sanitize_weights(np.asarray(DEFAULT_WEIGHTS) * rng.uniform(0.7, 1.3, len(DEFAULT_WEIGHTS)))
+    n_cards = max(1, args.reviews // args.per_card)
+
+    t = time.perf_counter()
+    hist = build_history(*simulate(n_cards, args.per_card, true_w))
+    print(f"history    {hist.n_reviews:>9} reviews / {hist.n_cards} cards  {time.perf_counter() - t:6.2f} s")
+
+    result = fit_weights(
+        hist,
+        epochs=args.epochs,
+        on_epoch=lambda e, loss: print(f"epoch {e + 1}    loss {loss:.5f}"),
+    )
+    print(f"fit        {result.seconds:6.2f} s")
+    print(f"loss default {result.loss_before:.5f} -> fitted {result.loss_after:.5f} (true weights {log_loss(true_w, hist):.5f})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,91 @@
+"""
+Benchmark the vectorized SRS batch API against the per-card apply_grade.
+
+    python scripts/bench_srs_batch.py [--cards 1000000] [--db /tmp/bench.db]
+
+Builds a throwaway DB (never the app DB), then times: loading all cards,
+apply_grades on random grades, the executemany write-back, and the scalar
+apply_grade on a sample (extrapolated to the full size).
+"""
+from __future__ import annotations
+import argparse
+import sqlite3
+import time
+
+import numpy as np
+
+from _bench import bench_db_path, open_bench_db
+from app.core.time_utils import today_day
+from app.srs.batch import GRADES, apply_grades, dates_from_days, load_card_batch, write_card_batch
+from app.srs.engine import SrsState, apply_grade
+
+SCALAR_SAMPLE = 50_000
+
+
+def _seed(db: sqlite3.Connection, n: int) -> None:
+    # Cards only: the item side (FTS triggers) is irrelevant to scheduling.
+    db.execute("PRAGMA foreign_keys = OFF;")
+    rng = np.random.default_rng(0)
+    today = today_day()
+    due = dates_from_days(today + rng.integers(-30, 60, n))
+    interval = rng.integers(0, 120, n).tolist()
+    ease = np.round(rng.uniform(1.3, 2.8, n), 2).tolist()
+    lapses = rng.integers(0, 10, n).tolist()
+    db.executemany(
+        """INSERT INTO cards(item_id, due_date, interval_days, ease, lapses, is_leech, created_at, updated_at)
+             VALUES(?,?,?,?,?,0,'','')""",
+        zip(range(1, n + 1), due, interval, ease, lapses),
+    )
+    db.commit()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cards", type=int, default=1_000_000)
+    parser.add_argument("--db", default=None, help="DB file to create (default: temp dir)")
+    args = parser.parse_args()
+
+    db = open_bench_db(bench_db_path(args.db, "bench_srs.db"))
+
+    t = time.perf_counter()
+    _seed(db, args.cards)
+    print(f"seed       {args.cards:>9} cards  {time.perf_counter() - t:7.2f} s")
+
+    t = time.perf_counter()
+    ids, batch = load_card_batch(db)
+    print(f"load       {len(ids):>9} cards  {time.perf_counter() - t:7.2f} s")
+
+    grades = np.random.default_rng(1).integers(0, 4, len(ids)).astype(np.int8)
+    t = time.perf_counter()
+    new = apply_grades(batch, grades)
+    vec = time.perf_counter() - t
+    print(f"apply      {len(ids):>9} cards  {vec:7.2f} s")
+
+    sample = min(SCALAR_SAMPLE, len(ids))
+    states = [
+        SrsState("", int(batch.interval_days[i]), float(batch.ease[i]), int(batch.lapses[i]), int(batch.is_leech[i]))
+        for i in range(sample)
+    ]
+    t = time.perf_counter()
+    scalar = [apply_grade(s, GRADES[g]) for s, g in zip(states, grades[:sample].tolist())]
+    per_card = (time.perf_counter() - t) / max(1, sample)
+    print(f"scalar est {len(ids):>9} cards  {per_card * len(ids):7.2f} s  (measured on {sample})")
+    due = dates_from_days(new.due_day[:sample])
+    mismatch = sum(
+        1
+        for i, s in enumerate(scalar)
+        if (s.due_date, s.interval_days, s.ease, s.lapses, s.is_leech) != (
+            due[i], int(new.interval_days[i]), float(new.ease[i]), int(new.lapses[i]), int(new.is_leech[i])
+        )
+    )
+    print(f"mismatches vs apply_grade: {mismatch}")
+
+    t = time.perf_counter()
+    write_card_batch(db, ids, new, grades)
+    print(f"write      {len(ids):>9} cards  {time.perf_counter() - t:7.2f} s")
+    db.close()
+    return 1 if mismatch else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,189 @@
+"""
+Startup-time budget check: launches the app offscreen against a seeded DB and
+records `-X importtime`, time to win.show() and time to the first painted
+frame. Exits 1 when a budget is exceeded or a lazily-loaded module was
+imported before the first frame.
+
+    python scripts/bench_startup.py [--items 50000] [--runs 3] [--db /tmp/startup.db]
+        [--budget-import-ms 400] [--budget-show-ms 600] [--budget-paint-ms 800]
+
+Times are measured from interpreter start of a fresh child process per run;
+the median run is checked against the budgets.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+from _bench import ROOT, bench_db_path, open_bench_db
+
+# Must not be imported before the first frame (view modules are built on
+# first navigation, QtCharts with the first chart).
+LAZY_MODULES = (
+    "app.ui.import_view",
+    "app.ui.srs_view",
+    "app.ui.cloze_view",
+    "app.ui.test_view",
+    "app.db.importer",
+)
+PAINT_TIMEOUT_S = 20.0
+
+
+def _seed(path: str, n: int) -> None:
+    db = open_bench_db(path)
+    db.executemany(
+        """INSERT INTO items(item_type, term, reading, meaning, example, tags, jlpt_level, created_at)
+             VALUES('vocab',?,?,?,'','N5','N5','')""",
+        ((f"語{i}", f"ご{i}", f"meaning {i}") for i in range(n)),
+    )
+    db.executemany(
+        """INSERT INTO cards(item_id, due_date, interval_days, ease, lapses, is_leech, created_at, updated_at)
+             VALUES(?, date('now', ?), 3, 2.5, ?, 0, '', '')""",
+        ((i + 1, f"{(i % 60) - 30} days", i % 4) for i in range(n)),
+    )
+    db.executemany(
+        """INSERT INTO sentences(item_id, sentence, cloze, answer, created_at)
+             VALUES(?,?,?,?,'')""",
+        ((i + 1, f"これは語{i}です。", "これは____です。", f"語{i}") for i in range(n)),
+    )
+    db.commit()
+    db.close()
+
+
+def _child() -> int:
+    # Runs in a fresh interpreter: the same steps as main.main(), timed.
+    t_start = time.perf_counter()
+    import main as app_main  # noqa: F401  (the import cost being measured)
+    from PySide6.QtCore import QEvent, QObject
+    from PySide6.QtWidgets import QApplication
+
+    from app.db.database import get_db, init_db
+    from app.ui.main_window import MainWindow
+
+    t_import = time.perf_counter()
+    app = QApplication([])
+    db = get_db()
+    init_db(db)
+
+    marks = {}
+
+    class FirstPaint(QObject):
+        def eventFilter(self, obj, event):  # noqa: N802 (Qt override)
+            if event.type() == QEvent.Paint and "paint" not in marks:
+                marks["paint"] = time.perf_counter()
+                marks["loaded"] = [m for m in LAZY_MODULES if m in sys.modules]
+                marks["charts"] = "PySide6.QtCharts" in sys.modules
+            return False
+
+    paint_filter = FirstPaint()
+    app.installEventFilter(paint_filter)
+    win = MainWindow(db=db)
+    win.show()
+    t_show = time.perf_counter()
+    deadline = time.monotonic() + PAINT_TIMEOUT_S
+    while "paint" not in marks and time.monotonic() < deadline:
+        app.processEvents()
+    win.async_repo.wait()
+    t_ready = time.perf_counter()
+    win.shutdown()
+
+    ms = lambda t: None if t is None else round((t - t_start) * 1000, 1)  # noqa: E731
+    print(
+        json.dumps(
+            {
+                "import_ms": ms(t_import),
+                "show_ms": ms(t_show),
+                "paint_ms": ms(marks.get("paint")),
+                "home_ready_ms": ms(t_ready),
+                "loaded_before_paint": marks.get("loaded", []),
+                "charts_before_paint": marks.get("charts", False),
+            }
+        )
+    )
+    return 0
+
+
+_IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def _top_imports(stderr: str, limit: int = 12):
+    rows = []
+    for line in stderr.splitlines():
+        m = _IMPORTTIME.match(line)
+        if m:
+            rows.append((int(m.group(1)), int(m.group(2)), m.group(4)))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main() -> int:
+    if "--child" in sys.argv:
+        return _child()
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=50_000)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--db", default=None, help="DB file to create (default: temp dir)")
+    parser.add_argument("--budget-import-ms", type=float, default=400)
+    parser.add_argument("--budget-show-ms", type=float, default=600)
+    parser.add_argument("--budget-paint-ms", type=float, default=800)
+    args = parser.parse_args()
+
+    path = bench_db_path(args.db, "bench_startup.db")
+    t = time.perf_counter()
+    _seed(path, args.items)
+    print(f"seed       {args.items:>9} items/cards/sentences  {time.perf_counter() - t:6.2f} s")
+
+    env = dict(os.environ, JPSTUDY_DB_PATH=path, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"))
+    results = []
+    stderr = ""
+    for _ in range(max(1, args.runs)):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", os.path.abspath(__file__), "--child"],
+            cwd=ROOT,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            print(proc.stderr[-4000:])
+            return 1
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+        stderr = proc.stderr
+
+    print("\nslowest imports (self us, cumulative us):")
+    for self_us, cum_us, name in _top_imports(stderr):
+        print(f"  {self_us:>8} {cum_us:>9}  {name}")
+
+    failures = []
+    print()
+    for key, budget in (
+        ("import_ms", args.budget_import_ms),
+        ("show_ms", args.budget_show_ms),
+        ("paint_ms", args.budget_paint_ms),
+        ("home_ready_ms", None),
+    ):
+        values = [r[key] for r in results if r[key] is not None]
+        if len(values) < len(results):
+            failures.append(f"{key}: missing in some runs (no frame painted?)")
+        value = statistics.median(values) if values else float("inf")
+        limit = f"budget {budget:.0f}" if budget is not None else "info"
+        print(f"{key:<14}{value:>9.1f} ms  ({limit}; runs: {', '.join(f'{v:.0f}' for v in values)})")
+        if budget is not None and value > budget:
+            failures.append(f"{key} {value:.0f} ms > {budget:.0f} ms")
+    eager = sorted({m for r in results for m in r["loaded_before_paint"]})
+    if eager:
+        failures.append("imported before first paint: " + ", ".join(eager))
+    print(f"QtCharts before first paint: {any(r['charts_before_paint'] for r in results)}")
+
+    for failure in failures:
+        print("FAIL " + failure)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
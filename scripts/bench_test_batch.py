@@ -0,0 +1,159 @@
+"""
+Benchmark mini-test sampling (get_test_batch) on a large corpus.
+
+    python scripts/bench_test_batch.py [--sentences 500000] [--repeat 20] [--db /tmp/bench_test.db]
+
+Builds a throwaway DB (never the app DB) with 3 sentences per item, a card per
+item (1 in 7 due), a few thousand mistakes, JLPT levels in contiguous id blocks
+(a deck imported level by level) and tag filters of different selectivity,
+then times get_test_batch per mode next to the ORDER BY RANDOM() query it
+replaces. Also checks that a seed reproduces a batch, that sentences rotate
+once an item has been practised and that no item of a level block is drawn
+much more often than the others.
+"""
+from __future__ import annotations
+import argparse
+import collections
+import sqlite3
+import statistics
+import time
+
+from _bench import bench_db_path, open_bench_db
+from app.db.repo import get_test_batch, record_attempt
+
+SENTENCES_PER_ITEM = 3
+LEVELS = ("N5", "N4", "N3", "N2", "N1")
+RARE_EVERY = 1000  # items tagged "rare"
+MISTAKE_EVERY = 101
+DUE_EVERY = 7
+FAIRNESS_SEEDS = 50
+FAIRNESS_MAX = 5  # ~0.02 draws per item expected at 500k sentences
+
+
+def _seed(db: sqlite3.Connection, n_sentences: int) -> int:
+    n = max(1, n_sentences // SENTENCES_PER_ITEM)
+    # levels in contiguous id blocks, as a deck imported level by level
+    level = [LEVELS[i * len(LEVELS) // n] for i in range(n)]
+    db.executemany(
+        """INSERT INTO items(item_type, term, reading, meaning, example, tags, jlpt_level, created_at)
+             VALUES('vocab',?,?,?,'',?,?,'')""",
+        (
+            (f"語{i}", f"ご{i}", f"meaning {i}", level[i] + (", rare" if i % RARE_EVERY == 0 else ""), level[i])
+            for i in range(n)
+        ),
+    )
+    db.executemany(
+        "INSERT INTO item_tags(item_id, tag) VALUES(?,?)",
+        ((i + 1, level[i].lower()) for i in range(n)),
+    )
+    db.executemany(
+        "INSERT INTO item_tags(item_id, tag) VALUES(?, 'rare')",
+        ((i + 1,) for i in range(0, n, RARE_EVERY)),
+    )
+    db.executemany(
+        """INSERT INTO cards(item_id, due_date, interval_days, ease, lapses, is_leech, created_at, updated_at)
+             VALUES(?, date('now', ?), 3, 2.5, 0, 0, '', '')""",
+        ((i + 1, "-1 days" if i % DUE_EVERY == 0 else "+5 days") for i in range(n)),
+    )
+    db.executemany(
+        """INSERT INTO sentences(item_id, sentence, cloze, answer, created_at)
+             VALUES(?,?,?,?,'')""",
+        (
+            (i % n + 1, f"これは語{i % n}の例{i // n}です。", f"これは____の例{i // n}です。", f"語{i % n}")
+            for i in range(n * SENTENCES_PER_ITEM)
+        ),
+    )
+    db.executemany(
+        """INSERT INTO mistakes(item_id, source, mistake_count, last_mistake_at)
+             VALUES(?, 'test', 1, '2024-01-01T00:00:00')""",
+        ((i + 1,) for i in range(0, n, MISTAKE_EVERY)),
+    )
+    db.commit()
+    return n
+
+
+def _legacy_random(db: sqlite3.Connection, total: int) -> list:
+    # What sampling with ORDER BY RANDOM() costs: every candidate row is sorted.
+    return db.execute(
+        """SELECT s.id FROM sentences s JOIN items i ON i.id = s.item_id
+             ORDER BY RANDOM() LIMIT ?""",
+        (total,),
+    ).fetchall()
+
+
+def _time(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    return statistics.median(times) * 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sentences", type=int, default=500_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--db", default=None, help="DB file to create (default: temp dir)")
+    args = parser.parse_args()
+
+    db = open_bench_db(bench_db_path(args.db, "bench_test.db"))
+
+    t = time.perf_counter()
+    n_items = _seed(db, args.sentences)
+    print(f"seed       {n_items * SENTENCES_PER_ITEM:>9} sentences / {n_items} items  {time.perf_counter() - t:6.2f} s")
+
+    cases = (
+        ("mix", {}),
+        ("only_mistake", {"only_mistake": True}),
+        ("only_due", {"only_due": True}),
+        ("level N3", {"level_filter": "N3"}),
+        ("tag rare", {"tag_filter": "rare"}),
+        ("level+rare", {"level_filter": "N5", "tag_filter": "rare"}),
+        ("empty pools", {"level_filter": "N1", "tag_filter": "no-such-tag"}),
+    )
+    print()
+    for name, kwargs in cases:
+        size = len(get_test_batch(db, total=30, **kwargs))
+        ms = _time(lambda: get_test_batch(db, total=30, **kwargs), args.repeat)
+        print(f"{name:<14}{ms:>9.2f} ms  ({size} questions)")
+    ms = _time(lambda: _legacy_random(db, 30), max(1, args.repeat // 4))
+    print(f"{'ORDER BY RANDOM()':<14}{ms:>9.2f} ms  (fresh pool only, for reference)")
+
+    failures = []
+    first = [q["sentence_id"] for q in get_test_batch(db, total=30, seed=7)]
+    if first != [q["sentence_id"] for q in get_test_batch(db, total=30, seed=7)]:
+        failures.append("same seed gave a different batch")
+    if first == [q["sentence_id"] for q in get_test_batch(db, total=30, seed=8)]:
+        failures.append("different seeds gave the same batch")
+
+    # the reviewer's clustering check: fresh items of a level block drawn over many seeds
+    drawn = collections.Counter(
+        q["item_id"]
+        for seed in range(FAIRNESS_SEEDS)
+        for q in get_test_batch(db, total=30, level_filter="N3", seed=seed)
+        if q["question_source"] == "new"
+    )
+    most = drawn.most_common(1)[0][1] if drawn else 0
+    print(f"\nfairness: {sum(drawn.values())} fresh draws over {len(drawn)} N3 items, at most {most} per item")
+    if most > FAIRNESS_MAX:
+        failures.append(f"an item was drawn in {most} of {FAIRNESS_SEEDS} batches")
+
+    batch = get_test_batch(db, total=30, seed=7)
+    for q in batch:
+        record_attempt(db, source="test", item_id=q["item_id"], sentence_id=q["sentence_id"], is_correct=True)
+    seen = {q["item_id"]: q["sentence_id"] for q in batch}
+    again = {q["item_id"]: q["sentence_id"] for q in get_test_batch(db, total=30, seed=7)}
+    repeated = [i for i in again if i in seen and again[i] == seen[i]]
+    print(f"rotation: {len(set(seen) & set(again))} items drawn again, {len(repeated)} with the same sentence")
+    if repeated:
+        failures.append("practised sentences were not rotated")
+    db.close()
+
+    for failure in failures:
+        print("FAIL " + failure)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
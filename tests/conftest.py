@@ -0,0 +1,27 @@
+from __future__ import annotations
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.db.database import _apply_pragmas  # noqa: E402
+from app.db.schema import ensure_schema  # noqa: E402
+
+
+@pytest.fixture
+def db_path(tmp_path) -> str:
+    return str(tmp_path / "test.db")
+
+
+@pytest.fixture
+def db(db_path):
+    """A migrated WAL database in a temp dir, with the app's pragmas."""
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode = WAL;")
+    _apply_pragmas(conn)
+    ensure_schema(conn)
+    yield conn
+    conn.close()
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from app.db.corpus import CORPUS_KIND, link_corpus
+from app.db.repo import create_item_with_card
+
+
+def _write(path, lines) -> str:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return str(path)
+
+
+def _linked(db, item_id):
+    return [
+        r[0]
+        for r in db.execute(
+            "SELECT sentence FROM sentences WHERE item_id=? AND kind=? ORDER BY id", (item_id, CORPUS_KIND)
+        )
+    ]
+
+
+def test_link_corpus_blanks_the_match(db, tmp_path):
+    cat, _ = create_item_with_card(db, "vocab", "猫", "ねこ", "cat")
+    path = _write(tmp_path / "c.tsv", ["1\tjpn\t猫が好きです。", "2\teng\tI like cats.", "3\tjpn\t犬がいる。"])
+    result = link_corpus(db, path)
+    assert (result.lines, result.matched, result.links) == (3, 1, 1)
+    row = db.execute("SELECT cloze, answer FROM sentences WHERE item_id=? AND kind=?", (cat, CORPUS_KIND)).fetchone()
+    assert tuple(row) == ("____が好きです。", "猫")
+
+
+def test_rerun_and_duplicate_lines_do_not_use_up_the_cap(db, tmp_path):
+    cat, _ = create_item_with_card(db, "vocab", "猫", "ねこ", "cat")
+    first = _write(tmp_path / "a.txt", ["猫が好き。", "猫が好き。", "猫が寝る。"])
+    result = link_corpus(db, first, max_per_item=3)
+    assert (result.links, result.capped) == (2, 0)
+
+    # linked pairs of the first run are skipped without counting towards the cap
+    second = _write(tmp_path / "b.txt", ["猫が好き。", "猫が寝る。", "黒い猫。", "白い猫。"])
+    result = link_corpus(db, second, max_per_item=3)
+    assert (result.links, result.capped) == (1, 1)
+    assert _linked(db, cat) == ["猫が好き。", "猫が寝る。", "黒い猫。"]
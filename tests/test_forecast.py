@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from app.db.repo import create_item_with_card, log_review
+from app.srs.batch import CardBatch
+from app.srs.forecast import DEFAULT_GRADE_PROBS, estimate_grade_probs, simulate_forecast
+
+TODAY = 20_000
+
+
+def _batch(n: int, interval: int = 0, due_in: int = 0) -> CardBatch:
+    return CardBatch(
+        np.full(n, interval, dtype=np.int64),
+        np.full(n, 2.5),
+        np.zeros(n, dtype=np.int64),
+        np.zeros(n, dtype=np.int64),
+        np.full(n, TODAY + due_in, dtype=np.int64),
+    )
+
+
+def test_forecast_shapes_band_and_seed():
+    batch = _batch(300, interval=3, due_in=0)
+    fc = simulate_forecast(batch, days=14, runs=50, today=TODAY, seed=1)
+    assert fc.mean.shape == fc.lo.shape == fc.hi.shape == (14,)
+    assert (fc.runs, fc.start_day, len(fc.dates)) == (50, TODAY, 14)
+    assert np.all(fc.lo <= fc.mean + 1e-9) and np.all(fc.mean <= fc.hi + 1e-9)
+    assert fc.mean[0] >= 300  # every card is due today, "again" adds a retry
+
+    again = simulate_forecast(batch, days=14, runs=50, today=TODAY, seed=1)
+    assert np.array_equal(again.mean, fc.mean) and np.array_equal(again.hi, fc.hi)
+    other = simulate_forecast(batch, days=14, runs=50, today=TODAY, seed=2)
+    assert not np.array_equal(other.mean, fc.mean)
+
+
+def test_daily_limit_carries_the_backlog_over():
+    batch = _batch(100, interval=10, due_in=-5)
+    good = [[0.0, 0.0, 1.0, 0.0]] * 2  # no retries: load is exactly the cards reviewed
+    free = simulate_forecast(batch, days=10, runs=5, probs=good, today=TODAY)
+    assert free.mean[0] == 100 and free.mean[1:].sum() == 0
+
+    capped = simulate_forecast(batch, days=10, runs=5, probs=good, today=TODAY, daily_limit=30)
+    assert capped.mean[:4].tolist() == [30, 30, 30, 10]
+    assert capped.mean.sum() == 100 and np.all(capped.hi <= 30)
+
+
+def test_grade_probs_fall_back_to_the_defaults_and_learn_from_history(db):
+    assert estimate_grade_probs(db) == pytest.approx(np.asarray(DEFAULT_GRADE_PROBS))
+
+    create_item_with_card(db, "vocab", "猫", "ねこ", "cat")
+    for _ in range(200):
+        log_review(db, card_id=1, grade="again", is_correct=False, prev={"interval_days": 5}, commit=False)
+    db.commit()
+    probs = estimate_grade_probs(db)
+    assert probs.sum(axis=1) == pytest.approx([1.0, 1.0])
+    assert probs[1, 0] > 0.8  # reviews: mostly "again" now
+    assert probs[0, 0] > DEFAULT_GRADE_PROBS[0][0]  # new cards only move through the shared prior
@@ -0,0 +1,119 @@
+from __future__ import annotations
+import json
+
+import numpy as np
+import pytest
+
+from app.core.time_utils import add_days, today_date_str
+from app.db.repo import create_item_with_card, log_review
+from app.srs.fsrs import (
+    DEFAULT_WEIGHTS,
+    MAX_INTERVAL,
+    FsrsState,
+    apply_grade_fsrs,
+    init_difficulty,
+    init_stability,
+    next_difficulty,
+    next_interval,
+    next_stability,
+    parse_weights,
+    retrievability,
+    sanitize_weights,
+    stability_from_sm2,
+)
+from app.srs.fsrs_fit import build_history, fit_weights, load_review_history, log_loss
+
+
+def _state(stability=None, difficulty=None, lapses=0) -> FsrsState:
+    return FsrsState(today_date_str(), 0, stability, difficulty, lapses, 0)
+
+
+def test_interval_equals_stability_at_ninety_percent():
+    assert next_interval(10.0) == 10
+    assert next_interval(0.2) == 1
+    assert next_interval(1e9) == MAX_INTERVAL
+    assert next_interval(10.0, retention=0.8) > 10
+
+
+def test_first_review_uses_initial_stability():
+    for grade, g in (("hard", 2), ("good", 3), ("easy", 4)):
+        state = apply_grade_fsrs(_state(), grade, None)
+        assert state.stability == pytest.approx(DEFAULT_WEIGHTS[g - 1])
+        assert state.interval_days == next_interval(state.stability)
+        assert state.due_date == add_days(today_date_str(), state.interval_days)
+
+
+def test_again_is_due_today_and_counts_a_lapse():
+    state = apply_grade_fsrs(_state(20.0, 5.0, lapses=7), "again", 20)
+    assert (state.due_date, state.interval_days, state.lapses, state.is_leech) == (today_date_str(), 1, 8, 1)
+    assert state.stability < 20.0
+
+
+def test_intervals_grow_with_the_grade():
+    intervals = [apply_grade_fsrs(_state(10.0, 5.0), g, 10).interval_days for g in ("hard", "good", "easy")]
+    assert intervals == sorted(intervals) and intervals[0] < intervals[-1]
+    with pytest.raises(ValueError):
+        apply_grade_fsrs(_state(), "meh", None)
+
+
+def test_stored_weights_are_sanitized():
+    default = list(DEFAULT_WEIGHTS)
+    assert parse_weights(None).tolist() == default
+    assert parse_weights("not json").tolist() == default
+    assert parse_weights(json.dumps([1.0, 2.0])).tolist() == default  # wrong length
+    clipped = parse_weights(json.dumps([1000.0] + default[1:]))
+    assert clipped[0] == 100.0 and clipped[1:].tolist() == default[1:]
+
+
+def test_sm2_cards_map_onto_stability_and_difficulty():
+    assert stability_from_sm2(0, 2.8) == (1.0, 1.0)
+    assert stability_from_sm2(30, 1.3) == (30.0, 10.0)
+
+
+def _simulate(w: np.ndarray, n_cards: int, per_card: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    g = rng.choice([1, 2, 3, 4], size=n_cards, p=[0.2, 0.15, 0.5, 0.15])
+    s, d = init_stability(w, g), init_difficulty(w, g)
+    day = np.zeros(n_cards, dtype=np.int64)
+    days, grades = [day.copy()], [g]
+    for _ in range(per_card - 1):
+        t = np.maximum(1, np.rint(s * rng.uniform(0.5, 1.6, n_cards))).astype(np.int64)
+        day = day + t
+        r = retrievability(t, s)
+        g = np.where(rng.random(n_cards) < r, 3, 1)
+        days.append(day.copy())
+        grades.append(g)
+        s, d = next_stability(w, d, s, r, g), next_difficulty(w, d, g)
+    card_ids = np.repeat(np.arange(n_cards), per_card)
+    return card_ids, np.stack(days, axis=1).ravel(), np.stack(grades, axis=1).ravel()
+
+
+def test_fit_moves_towards_the_generating_weights():
+    rng = np.random.default_rng(42)
+    true_w = sanitize_weights(np.asarray(DEFAULT_WEIGHTS) * rng.uniform(0.7, 1.3, len(DEFAULT_WEIGHTS)))
+    hist = build_history(*_simulate(true_w, 2000, 12))
+    result = fit_weights(hist, epochs=2)
+    assert result.n_reviews == hist.n_reviews == 2000 * 11
+    true_loss = float(log_loss(true_w, hist))
+    assert true_loss < result.loss_after < result.loss_before
+    assert len(result.weights) == len(DEFAULT_WEIGHTS)
+    assert result.loss_after == pytest.approx(float(log_loss(np.asarray(result.weights), hist)), rel=1e-4)
+
+
+def test_review_history_drops_same_day_repeats_and_single_reviews(db):
+    create_item_with_card(db, "vocab", "猫", "ねこ", "cat")
+    create_item_with_card(db, "vocab", "犬", "いぬ", "dog")
+    logs = [
+        (1, "good", "2024-01-01"),
+        (1, "again", "2024-01-03"),
+        (1, "good", "2024-01-03"),  # same-day relearn step
+        (1, "easy", "2024-01-10"),
+        (2, "good", "2024-01-01"),  # a single review: no signal
+    ]
+    for card_id, grade, day in logs:
+        log_review(db, card_id=card_id, grade=grade, is_correct=grade != "again", created_at=day + "T09:00:00")
+
+    hist = load_review_history(db)
+    assert (hist.n_cards, hist.n_reviews) == (1, 2)
+    assert hist.grades[:, 0].tolist() == [3, 1, 4]
+    assert hist.elapsed[:, 0].tolist() == [0.0, 2.0, 7.0]
@@ -0,0 +1,228 @@
+from __future__ import annotations
+import csv
+import os
+import sqlite3
+
+import pytest
+
+from app.db.database import _apply_pragmas
+from app.db.importer import (
+    CLOZE_FALLBACK,
+    DUPLICATE_EXISTING,
+    DUPLICATE_IN_FILE,
+    MISSING_FIELDS,
+    file_fingerprint,
+    import_files,
+    import_files_parallel,
+    iter_parsed_chunks,
+    run_import_job,
+    start_import_batch,
+    validate_csv_file,
+)
+from app.db.repo import IMPORT_NEW_IDS_LIMIT, bulk_import_items, create_item_with_card, get_items_by_ids
+from app.db.schema import ensure_schema
+
+
+def _write_csv(path: str, start: int, n: int, bad_every: int = 0) -> str:
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write("term,reading,meaning,example,tags\n")
+        for i in range(start, start + n):
+            meaning = "" if bad_every and i % bad_every == 0 else f"meaning {i}"
+            f.write(f"語{i},ご{i},{meaning},これは語{i}です。,food\n")
+    return path
+
+
+def _open(path: str) -> sqlite3.Connection:
+    db = sqlite3.connect(path)
+    db.execute("PRAGMA journal_mode = WAL;")
+    _apply_pragmas(db)
+    ensure_schema(db)
+    return db
+
+
+def _snapshot(db: sqlite3.Connection):
+    items = db.execute("SELECT term, meaning, tags FROM items ORDER BY id").fetchall()
+    sentences = db.execute("SELECT sentence, cloze FROM sentences ORDER BY id").fetchall()
+    return [tuple(r) for r in items], [tuple(r) for r in sentences]
+
+
+@pytest.fixture
+def csv_tasks(tmp_path):
+    # overlapping ranges: later files merge into items of earlier ones
+    return [
+        (_write_csv(str(tmp_path / "n5.csv"), 0, 1200, bad_every=97), "N5"),
+        (_write_csv(str(tmp_path / "n4.csv"), 1000, 1200), "N4"),
+        (_write_csv(str(tmp_path / "n3.csv"), 2100, 700, bad_every=50), "N3"),
+    ]
+
+
+def test_parallel_import_matches_sequential(tmp_path, csv_tasks):
+    seq_db = _open(str(tmp_path / "seq.db"))
+    par_db = _open(str(tmp_path / "par.db"))
+    seq = import_files(seq_db, csv_tasks)
+    par = import_files_parallel(par_db, csv_tasks, max_workers=2)
+
+    assert (par.imported, par.skipped, par.errors) == (seq.imported, seq.skipped, seq.errors)
+    assert seq.imported + seq.skipped + seq.errors == 3100
+    assert _snapshot(par_db) == _snapshot(seq_db)
+
+
+def test_parallel_import_cancel_stops_parsers_and_resumes(tmp_path, csv_tasks):
+    db = _open(str(tmp_path / "par.db"))
+    calls = []
+
+    def cancel_on_third_chunk(done: int, path: str) -> None:
+        calls.append(path)
+        if len(calls) == 3:
+            raise RuntimeError("cancelled")
+
+    with pytest.raises(RuntimeError, match="cancelled"):
+        import_files_parallel(db, csv_tasks, progress_cb=cancel_on_third_chunk, max_workers=3)
+    partial = db.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+    assert 0 < partial < 2800  # 2800 distinct terms
+
+    import_files_parallel(db, csv_tasks, max_workers=3)
+    ref = _open(str(tmp_path / "ref.db"))
+    import_files(ref, csv_tasks)
+    assert _snapshot(db) == _snapshot(ref)
+    assert [os.path.basename(p) for p in dict.fromkeys(calls)] == ["n5.csv"]
+
+
+class _FlakyCommit:
+    """Connection proxy whose n-th commit fails like a busy database."""
+
+    def __init__(self, db: sqlite3.Connection, fail_on: int):
+        self._db = db
+        self._fail_on = fail_on
+        self.commits = 0
+
+    def commit(self) -> None:
+        self.commits += 1
+        if self.commits == self._fail_on:
+            raise sqlite3.OperationalError("database is locked")
+        self._db.commit()
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+
+def test_failed_chunk_commit_does_not_advance_the_checkpoint(tmp_path):
+    path = _write_csv(str(tmp_path / "a.csv"), 0, 250)
+    db = _open(str(tmp_path / "a.db"))
+    job = start_import_batch(db, [(path, None)])[0]
+    chunks = list(iter_parsed_chunks(path, chunk_size=100))
+
+    with pytest.raises(sqlite3.OperationalError):
+        run_import_job(_FlakyCommit(db, fail_on=2), job, chunks)
+
+    row = db.execute("SELECT byte_offset, row_num, imported, status FROM import_jobs WHERE id=?", (job.id,)).fetchone()
+    assert tuple(row) == (chunks[0].end_offset, chunks[0].end_row, 100, "interrupted")
+    assert (job.byte_offset, job.imported) == (chunks[0].end_offset, 100)
+    assert db.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 100
+
+    result = import_files(db, [(path, None)])  # resumes at the second chunk
+    assert result.imported == 250
+    assert db.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 250
+
+
+def test_resume_after_cancel_skips_finished_chunks(tmp_path):
+    path = _write_csv(str(tmp_path / "a.csv"), 0, 1200)
+    db = _open(str(tmp_path / "a.db"))
+
+    def cancel(done: int, _path: str) -> None:
+        raise RuntimeError("cancelled")
+
+    with pytest.raises(RuntimeError):
+        import_files(db, [(path, "N5")], progress_cb=cancel)
+    assert db.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 500
+
+    seen = []
+    result = import_files(db, [(path, "N5")], progress_cb=lambda done, _p: seen.append(done))
+    assert result.imported == 1200  # includes the 500 of the first run
+    assert len(seen) == 2  # only the remaining chunks were parsed and written
+    assert db.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 1200
+
+
+def test_new_ids_are_capped(tmp_path):
+    path = _write_csv(str(tmp_path / "a.csv"), 0, IMPORT_NEW_IDS_LIMIT + 200)
+    db = _open(str(tmp_path / "a.db"))
+    result = import_files(db, [(path, None)])
+    assert result.imported == IMPORT_NEW_IDS_LIMIT + 200
+    assert len(result.new_ids) == IMPORT_NEW_IDS_LIMIT
+    assert len(get_items_by_ids(db, range(1, 2001))) == IMPORT_NEW_IDS_LIMIT + 200
+
+
+def test_bulk_import_dedupes_across_chunks_and_rolls_back_on_error(db):
+    rows = [
+        {"row_num": 2, "term": "猫", "reading": "ねこ", "meaning": "cat", "example": "猫がいる。", "tags": "N5"},
+        {"row_num": 3, "term": "犬", "reading": "いぬ", "meaning": "", "tags": "N5"},
+        {"row_num": 4, "term": "犬", "reading": "いぬ", "meaning": "dog", "tags": "N5"},
+        {"row_num": 5, "term": "猫", "reading": "ねこ", "meaning": "cat", "tags": "animal"},  # next chunk
+    ]
+    result = bulk_import_items(db, rows, chunk_size=3)
+    assert (result.imported, result.skipped, result.errors) == (2, 1, 1)
+    assert len(result.new_ids) == 2
+    items = db.execute("SELECT term, tags FROM items ORDER BY id").fetchall()
+    assert [tuple(r) for r in items] == [("猫", "N5, animal"), ("犬", "N5")]
+    assert db.execute("SELECT COUNT(*) FROM cards").fetchone()[0] == 2
+
+    def cancelled():
+        yield {"row_num": 2, "term": "鳥", "reading": "とり", "meaning": "bird", "tags": ""}
+        raise RuntimeError("cancelled")
+
+    with pytest.raises(RuntimeError):
+        bulk_import_items(db, cancelled(), chunk_size=1)
+    assert db.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 2
+
+
+def test_fingerprint_sees_same_size_edits_in_the_middle(tmp_path):
+    path = _write_csv(str(tmp_path / "a.csv"), 0, 8000)
+    assert os.path.getsize(path) > 4 * 64 * 1024
+    before = file_fingerprint(path)
+    with open(path, "r+b") as f:
+        f.seek(os.path.getsize(path) // 2)
+        f.write(b"X")
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert file_fingerprint(path) != before
+
+
+def test_old_finished_jobs_are_pruned(tmp_path):
+    db = _open(str(tmp_path / "a.db"))
+    old = _write_csv(str(tmp_path / "old.csv"), 0, 10)
+    import_files(db, [(old, None)])
+    db.execute("UPDATE import_jobs SET updated_at='2000-01-01T00:00:00'")
+    db.commit()
+    recent = _write_csv(str(tmp_path / "recent.csv"), 10, 10)
+    import_files(db, [(recent, None)])
+    rows = db.execute("SELECT path, status FROM import_jobs").fetchall()
+    assert [tuple(r) for r in rows] == [(recent, "done")]
+
+
+def test_validate_counts_problems_without_writing(db, tmp_path):
+    create_item_with_card(db, "vocab", "猫", "ねこ", "cat")
+    path = str(tmp_path / "v.csv")
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write("term,reading,meaning,example\n")
+        f.write("猫,ねこ,cat,\n")  # row 2: already in the DB
+        f.write("犬,いぬ,dog,犬がいる。\n")
+        f.write("鳥,とり,,\n")  # row 4: no meaning
+        f.write("犬,いぬ,dog again,\n")  # row 5: repeats row 3 (next chunk)
+        f.write("魚,さかな,fish,海で泳ぐ。\n")  # row 6: term not in the example
+    changes = db.total_changes
+    report_path = str(tmp_path / "report.csv")
+
+    report = validate_csv_file(db, path, level_tag="N5", report_path=report_path, chunk_size=2)
+    assert (report.records, report.valid) == (5, 2)
+    assert report.counts == {
+        DUPLICATE_EXISTING: 1,
+        MISSING_FIELDS: 1,
+        DUPLICATE_IN_FILE: 1,
+        CLOZE_FALLBACK: 1,
+    }
+    assert report.samples[DUPLICATE_IN_FILE] == ["Row 5: trùng term+reading với dòng 3"]
+    with open(report_path, encoding="utf-8") as f:
+        assert sorted(int(r["row"]) for r in csv.DictReader(f)) == [2, 4, 5, 6]
+    assert db.total_changes == changes
+    assert db.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 1
+    assert db.execute("SELECT COUNT(*) FROM import_jobs").fetchone()[0] == 0
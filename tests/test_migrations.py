@@ -0,0 +1,91 @@
+from __future__ import annotations
+import sqlite3
+
+from app.db.database import _apply_pragmas
+from app.db.repo import get_key_collisions
+from app.db.schema import MIGRATIONS, SCHEMA_VERSION, ensure_schema, get_schema_version
+
+
+def _db_at_version(path: str, version: int) -> sqlite3.Connection:
+    """A DB migrated only up to `version`, as an older app release left it."""
+    db = sqlite3.connect(path)
+    _apply_pragmas(db)
+    for target, migrate in MIGRATIONS:
+        if target > version:
+            break
+        migrate(db)
+        db.execute(f"PRAGMA user_version = {int(target)}")
+    db.commit()
+    return db
+
+
+def test_fresh_db_reaches_current_version(db):
+    assert get_schema_version(db) == SCHEMA_VERSION
+    ensure_schema(db)  # idempotent
+    assert get_schema_version(db) == SCHEMA_VERSION
+
+
+def test_key_backfill_reports_collisions(db_path):
+    db = _db_at_version(db_path, 3)
+    db.executemany(
+        "INSERT INTO items(item_type, term, reading, meaning, created_at) VALUES('vocab',?,?,?,'')",
+        [("ＡＢＣ", "えーびーしー", "first"), ("abc", "えーびーしー", "second"), ("猫", "ねこ", "cat")],
+    )
+    db.commit()
+
+    ensure_schema(db)
+    rows = get_key_collisions(db)
+    assert [(r["item_id"], r["kept_item_id"], r["term"]) for r in rows] == [(2, 1, "abc")]
+    keys = db.execute("SELECT id, term_key FROM items ORDER BY id").fetchall()
+    assert [tuple(r) for r in keys] == [(1, "abc"), (2, None), (3, "猫")]
+    db.close()
+
+
+def test_tag_backfill_from_free_text_tags(db_path):
+    db = _db_at_version(db_path, 1)
+    db.executemany(
+        "INSERT INTO items(item_type, term, reading, meaning, tags, created_at) VALUES('vocab',?,'','',?,'')",
+        [("水", "N4, #Food / n5"), ("木", "nature|N3 nature"), ("空", "")],
+    )
+    db.commit()
+
+    ensure_schema(db)
+    tags = db.execute("SELECT item_id, tag FROM item_tags ORDER BY item_id, tag").fetchall()
+    assert [tuple(r) for r in tags] == [(1, "food"), (1, "n4"), (1, "n5"), (2, "n3"), (2, "nature")]
+    levels = db.execute("SELECT jlpt_level FROM items ORDER BY id").fetchall()
+    assert [r[0] for r in levels] == ["N5", "N3", None]
+    db.close()
+
+
+def test_daily_stats_and_cloze_backfill(db_path):
+    db = _db_at_version(db_path, 5)
+    db.execute("INSERT INTO items(item_type, term, reading, meaning, created_at) VALUES('vocab','猫','ねこ','cat','')")
+    db.executemany(
+        "INSERT INTO sentences(item_id, sentence, cloze, answer, created_at) VALUES(1,?,NULL,NULL,'')",
+        [("猫が好き。",), ("犬がいる。",), ("",)],
+    )
+    db.executemany(
+        "INSERT INTO attempts(source, is_correct, duration_ms, created_at, day) VALUES(?,?,?,'',?)",
+        [("test", 1, 500, 100), ("test", 0, 700, 100), ("sentence", None, None, 101)],
+    )
+    db.execute(
+        """INSERT INTO cards(item_id, due_date, interval_days, ease, lapses, is_leech, created_at, updated_at)
+             VALUES(1, '2024-01-01', 0, 2.5, 0, 0, '', '')"""
+    )
+    db.execute("INSERT INTO review_logs(card_id, grade, is_correct, created_at, day) VALUES(1,'good',1,'',100)")
+    db.commit()
+
+    ensure_schema(db)
+    stats = db.execute("SELECT day, source, total, correct, duration_ms_sum FROM daily_stats ORDER BY day, source")
+    assert [tuple(r) for r in stats] == [
+        (100, "review_log", 1, 1, 0),
+        (100, "test", 2, 1, 1200),
+        (101, "sentence", 0, 0, 0),
+    ]
+    clozes = db.execute("SELECT cloze, answer, cloze_fallback, cloze_reason, cloze_version FROM sentences ORDER BY id")
+    assert [tuple(r) for r in clozes] == [
+        ("____が好き。", "猫", 0, "exact-term", 1),
+        ("____。", "猫", 1, "jp-token", 1),
+        ("____", "猫", 1, "empty", 1),
+    ]
+    db.close()
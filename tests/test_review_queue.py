@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from app.srs.review_queue import ReviewQueue
+
+
+def _rows(start, n):
+    return [{"id": i, "is_leech": 0, "lapses": 0, "due_date": "2024-01-01"} for i in range(start, start + n)]
+
+
+class _Pages:
+    """request_page stand-in: records requests, answered by the test."""
+
+    def __init__(self):
+        self.requests = []
+
+    def __call__(self, after, limit):
+        self.requests.append((after, limit))
+
+
+def test_requests_next_page_below_low_water_without_blocking():
+    pages = _Pages()
+    queue = ReviewQueue(pages, page_size=10, low_water=3)
+    queue.start(_rows(1, 10))
+    assert pages.requests == []
+    served = [queue.pop()["id"] for _ in range(7)]
+    assert served == list(range(1, 8))
+    assert len(pages.requests) == 1 and pages.requests[0][0][-1] == 10
+    for _ in range(3):
+        queue.pop()
+    # dry while the page is in flight: no blocking, no second request
+    assert queue.pop() is None and queue.loading
+    assert len(pages.requests) == 1
+    queue.add_page(_rows(11, 4))
+    assert [queue.pop()["id"] for _ in range(4)] == [11, 12, 13, 14]
+    assert queue.pop() is None and queue.exhausted and not queue.loading
+
+
+def test_failed_page_leaves_an_error_state():
+    pages = _Pages()
+    queue = ReviewQueue(pages, page_size=5, low_water=2)
+    queue.start(_rows(1, 5))
+    while queue.pop() is not None:
+        pass
+    queue.fail(RuntimeError("disk I/O error"))
+    assert queue.pop() is None
+    assert not queue.loading and str(queue.error) == "disk I/O error"
+    assert len(pages.requests) == 1  # no retry loop
+
+
+def test_relearn_cards_come_back_after_the_gap():
+    queue = ReviewQueue(_Pages(), page_size=10, low_water=0, relearn_gap=2)
+    queue.start(_rows(1, 4))
+    first = queue.pop()
+    queue.push_relearn(first)
+    assert [queue.pop()["id"] for _ in range(4)] == [2, 3, 1, 4]
+
+
+def test_pages_after_close_are_dropped():
+    queue = ReviewQueue(_Pages(), page_size=5, low_water=5)
+    queue.start(_rows(1, 5))
+    queue.close()
+    queue.add_page(_rows(6, 5))
+    assert len(queue) == 5
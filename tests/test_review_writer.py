@@ -0,0 +1,88 @@
+from __future__ import annotations
+import os
+import sqlite3
+
+from app.db.database import _apply_pragmas
+from app.db.repo import create_item_with_card
+from app.db.review_writer import ReviewEvent, ReviewWriter
+
+
+class _FlakyCommit:
+    """Connection proxy whose first `failures` commits fail like a busy database."""
+
+    def __init__(self, db: sqlite3.Connection, failures: int):
+        self._db = db
+        self._failures = failures
+
+    def commit(self) -> None:
+        if self._failures > 0:
+            self._failures -= 1
+            raise sqlite3.OperationalError("database is locked")
+        self._db.commit()
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    _apply_pragmas(conn)
+    return conn
+
+
+def _event(card_id: int) -> ReviewEvent:
+    card = {"due_date": "2024-01-05", "interval_days": 4, "ease": 2.5, "lapses": 0, "is_leech": 0}
+    return ReviewEvent(card_id=card_id, grade="good", is_correct=True, card=card)
+
+
+def _card_id(db) -> int:
+    create_item_with_card(db, "vocab", "猫", "ねこ", "cat")
+    return int(db.execute("SELECT id FROM cards").fetchone()[0])
+
+
+def test_failed_batch_is_retried_and_the_journal_truncated(db, db_path, tmp_path):
+    card_id = _card_id(db)
+    journal = str(tmp_path / "reviews.jsonl")
+    errors = []
+    writer = ReviewWriter(
+        path=journal,
+        connect=lambda: _FlakyCommit(_connect(db_path), failures=1),
+        flush_interval=60,
+        retry_interval=60,
+        on_error=errors.append,
+    )
+    writer.start()
+    try:
+        writer.submit(_event(card_id))
+        assert writer.flush(timeout=5) is False
+        assert isinstance(writer.last_error, sqlite3.OperationalError)
+        assert os.path.getsize(journal) > 0
+        assert db.execute("SELECT COUNT(*) FROM review_logs").fetchone()[0] == 0
+
+        writer.submit(_event(card_id))
+        assert writer.flush(timeout=5) is True  # retries the kept batch with the new event
+        assert [type(e) for e in errors] == [sqlite3.OperationalError, type(None)]
+        assert os.path.getsize(journal) == 0
+        assert db.execute("SELECT COUNT(*) FROM review_logs").fetchone()[0] == 2
+    finally:
+        writer.close()
+
+
+def test_journal_replay_skips_logged_events(db, db_path, tmp_path):
+    card_id = _card_id(db)
+    journal = str(tmp_path / "reviews.jsonl")
+    logged, pending = _event(card_id), _event(card_id)
+    writer = ReviewWriter(path=journal, connect=lambda: _connect(db_path))
+    writer.start()
+    writer.submit(logged)
+    assert writer.flush(timeout=5)
+    writer.close()
+
+    # a crash after the commit but before the truncate leaves both in the journal
+    with open(journal, "w", encoding="utf-8") as f:
+        f.write(logged.to_json() + "\n" + pending.to_json() + "\n")
+    writer = ReviewWriter(path=journal, connect=lambda: _connect(db_path))
+    assert writer.start() == 1
+    writer.close()
+    ids = db.execute("SELECT event_id FROM review_logs ORDER BY id").fetchall()
+    assert [r[0] for r in ids] == [logged.event_id, pending.event_id]
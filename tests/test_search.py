@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+from app.db import repo
+from app.db.repo import create_item_with_card, search_items, search_items_page
+
+
+def _terms(rows):
+    return [r["term"] for r in rows]
+
+
+def test_short_query_searches_the_fts_columns_and_sentences(db):
+    create_item_with_card(db, "vocab", "猫", "ねこ", "cat", example="猫が好き", tags="N5")
+    create_item_with_card(db, "vocab", "犬", "いぬ", "dog", tags="N5, pet")
+    item_id, _ = create_item_with_card(db, "vocab", "鳥", "とり", "bird")
+    db.execute(
+        "INSERT INTO sentences(item_id, sentence, created_at) VALUES(?, '空を飛ぶ', '')",
+        (item_id,),
+    )
+    db.commit()
+
+    assert _terms(search_items(db, "好")) == ["猫"]  # example
+    assert _terms(search_items(db, "pe")) == ["犬"]  # tags
+    assert _terms(search_items(db, "空")) == ["鳥"]  # sentence
+    assert _terms(search_items(db, "zz")) == []
+
+
+def test_short_query_ranks_term_prefix_first_and_pages(db):
+    create_item_with_card(db, "vocab", "大きい", "おおきい", "big")
+    create_item_with_card(db, "vocab", "大", "だい", "large")
+    create_item_with_card(db, "vocab", "巨大", "きょだい", "huge")
+
+    rows = search_items(db, "大")
+    assert _terms(rows) == ["大", "大きい", "巨大"]
+    assert [r["is_prefix"] for r in rows] == [1, 1, 0]
+    assert _terms(search_items(db, "大", limit=1, offset=1)) == ["大きい"]
+    assert _terms(search_items(db, "大", limit=5, offset=2)) == ["巨大"]
+
+
+def test_long_query_uses_fts(db):
+    create_item_with_card(db, "vocab", "勉強する", "べんきょうする", "to study")
+    assert _terms(search_items(db, "勉強す")) == ["勉強する"]
+    assert _terms(search_items(db, "study")) == ["勉強する"]
+
+
+def test_short_query_flags_a_partial_scan(db, monkeypatch):
+    monkeypatch.setattr(repo, "SHORT_QUERY_SCAN", 2)
+    create_item_with_card(db, "vocab", "本", "ほん", "old book")  # outside the scanned window
+    create_item_with_card(db, "vocab", "猫", "ねこ", "cat")
+    create_item_with_card(db, "vocab", "犬", "いぬ", "dog")
+
+    page = search_items_page(db, "oo")
+    assert page.rows == [] and page.partial
+    assert not search_items_page(db, "ca", limit=1).partial  # a full page is not cut short
+    assert _terms(search_items_page(db, "本").rows) == ["本"]  # term prefix hits use the index, not the scan
+    assert not search_items_page(db, "book").partial
+    monkeypatch.setattr(repo, "SHORT_QUERY_SCAN", 3)
+    assert not search_items_page(db, "oo").partial  # every item was scanned
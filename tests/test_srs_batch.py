@@ -0,0 +1,70 @@
+from __future__ import annotations
+import itertools
+
+import numpy as np
+import pytest
+
+from app.core.time_utils import today_date_str, today_day
+from app.db.repo import create_item_with_card
+from app.srs.batch import (
+    GRADES,
+    CardBatch,
+    apply_grades,
+    dates_from_days,
+    grade_codes,
+    load_card_batch,
+    write_card_batch,
+)
+from app.srs.engine import SrsState, apply_grade
+
+
+def _states():
+    intervals = (0, 1, 2, 3, 7, 10, 45)
+    eases = (1.3, 1.35, 2.25, 2.5, 2.8)
+    lapses = (0, 7)
+    return [SrsState(today_date_str(), i, e, n, 0) for i, e, n in itertools.product(intervals, eases, lapses)]
+
+
+def test_apply_grades_matches_apply_grade_card_for_card():
+    states = _states()
+    for grade in GRADES:
+        batch = CardBatch(
+            np.array([s.interval_days for s in states], dtype=np.int64),
+            np.array([s.ease for s in states]),
+            np.array([s.lapses for s in states], dtype=np.int64),
+            np.array([s.is_leech for s in states], dtype=np.int64),
+            np.full(len(states), today_day(), dtype=np.int64),
+        )
+        new = apply_grades(batch, grade_codes([grade] * len(states)))
+        due = dates_from_days(new.due_day)
+        for i, state in enumerate(states):
+            want = apply_grade(state, grade)
+            got = (due[i], int(new.interval_days[i]), int(new.lapses[i]), int(new.is_leech[i]))
+            assert got == (want.due_date, want.interval_days, want.lapses, want.is_leech), (grade, state)
+            assert float(new.ease[i]) == pytest.approx(want.ease), (grade, state)
+
+
+def test_bad_grades_are_rejected():
+    batch = CardBatch(*(np.zeros(2, dtype=np.int64) for _ in range(5)))
+    with pytest.raises(ValueError):
+        grade_codes(["good", "meh"])
+    with pytest.raises(ValueError):
+        apply_grades(batch, np.array([0, 4]))
+    with pytest.raises(ValueError):
+        apply_grades(batch, np.array([0]))
+
+
+def test_write_and_load_round_trip(db):
+    for term in ("猫", "犬", "鳥"):
+        create_item_with_card(db, "vocab", term, "", "x")
+    ids, batch = load_card_batch(db)
+    assert len(ids) == 3
+    codes = grade_codes(["again", "good", "easy"])
+    new = apply_grades(batch, codes)
+    assert write_card_batch(db, ids, new, codes) == 3
+
+    _, loaded = load_card_batch(db)
+    assert loaded.interval_days.tolist() == new.interval_days.tolist()
+    assert loaded.due_day.tolist() == new.due_day.tolist()
+    rows = db.execute("SELECT last_grade, lapses FROM cards ORDER BY id").fetchall()
+    assert [tuple(r) for r in rows] == [("again", 1), ("good", 0), ("easy", 0)]
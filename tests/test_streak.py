@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from app.core.time_utils import today_day
+from app.db.repo import get_streak
+
+
+def _active(db, days, source: str = "review_log") -> None:
+    db.executemany(
+        "INSERT INTO daily_stats(day, source, total, correct) VALUES(?, ?, 1, 1)",
+        ((d, source) for d in days),
+    )
+    db.commit()
+
+
+def test_empty_history(db):
+    assert get_streak(db) == {"current": 0, "longest": 0}
+
+
+def test_idle_today_keeps_the_longest_run(db):
+    today = today_day()
+    _active(db, range(today - 5, today))  # five days, ending yesterday
+    assert get_streak(db) == {"current": 0, "longest": 5}
+
+
+def test_a_gap_ends_the_run(db):
+    today = today_day()
+    _active(db, [today - 10, today - 9, today - 8, today - 7])
+    _active(db, [today - 1, today])
+    _active(db, [today], source="test")  # several sources on one day count once
+    assert get_streak(db) == {"current": 2, "longest": 4}
+
+
+def test_runs_longer_than_sixty_days(db):
+    today = today_day()
+    _active(db, range(today - 199, today + 1))
+    _active(db, range(today - 500, today - 250))
+    assert get_streak(db) == {"current": 200, "longest": 250}
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from app.db.repo import (
+    create_item_with_card,
+    fetch_due_cards,
+    get_level_breakdown,
+    get_level_counts,
+)
+
+
+def _seed_levels(db) -> None:
+    create_item_with_card(db, "vocab", "食べる", "たべる", "to eat", tags="N5")
+    create_item_with_card(db, "vocab", "必要", "ひつよう", "necessary", tags="N4")
+    # imported from both the N5 and the N4 list: tags are merged
+    create_item_with_card(db, "vocab", "水", "みず", "water", tags="N5, food")
+    create_item_with_card(db, "vocab", "水", "みず", "water", tags="N4")
+
+
+def test_level_filter_matches_every_level_tag(db):
+    _seed_levels(db)
+    terms = {r["term"] for r in fetch_due_cards(db, level_filter="N4")}
+    assert terms == {"必要", "水"}
+    terms = {r["term"] for r in fetch_due_cards(db, level_filter="n5")}
+    assert terms == {"食べる", "水"}
+
+
+def test_tag_and_level_filters_combine(db):
+    _seed_levels(db)
+    terms = {r["term"] for r in fetch_due_cards(db, tag_filter="food", level_filter="N4")}
+    assert terms == {"水"}
+    assert fetch_due_cards(db, tag_filter="food", level_filter="N3") == []
+
+
+def test_level_counts_count_multi_level_items_under_each_level(db):
+    _seed_levels(db)
+    counts = get_level_counts(db)
+    assert counts["N5"] == {"due": 2, "total": 2}
+    assert counts["N4"] == {"due": 2, "total": 2}
+    assert counts["N3"] == {"due": 0, "total": 0}
+    assert get_level_breakdown(db, due_only=False)["N4"] == 2
@@ -0,0 +1,64 @@
+from __future__ import annotations
+import collections
+
+from app.db.repo import get_test_batch, record_attempt
+
+LEVELS = ("n5", "n4", "n3", "n2")
+
+
+def _seed(db, per_level: int) -> None:
+    # levels in contiguous id blocks, as a deck imported level by level
+    n = per_level * len(LEVELS)
+    db.executemany(
+        "INSERT INTO items(item_type, term, reading, meaning, example, tags, created_at) VALUES('vocab',?,'','','',?,'')",
+        ((f"語{i}", LEVELS[i // per_level].upper()) for i in range(n)),
+    )
+    db.executemany(
+        "INSERT INTO item_tags(item_id, tag) VALUES(?,?)",
+        ((i + 1, LEVELS[i // per_level]) for i in range(n)),
+    )
+    db.executemany(
+        "INSERT INTO sentences(item_id, sentence, cloze, answer, created_at) VALUES(?,?,?,?,'')",
+        ((i % n + 1, f"語{i % n}の例{i // n}。", f"____の例{i // n}。", f"語{i % n}") for i in range(n * 3)),
+    )
+    db.commit()
+
+
+def _sentence_ids(batch) -> list:
+    return [q["sentence_id"] for q in batch]
+
+
+def test_same_seed_same_batch_and_other_seed_differs(db):
+    _seed(db, 50)
+    first = get_test_batch(db, total=15, seed=7)
+    assert len(first) == 15
+    assert len({q["item_id"] for q in first}) == 15  # one question per item
+    assert _sentence_ids(get_test_batch(db, total=15, seed=7)) == _sentence_ids(first)
+    assert _sentence_ids(get_test_batch(db, total=15, seed=8)) != _sentence_ids(first)
+
+
+def test_practised_sentences_rotate(db):
+    _seed(db, 5)  # 20 items: a 15-item batch draws most of them again
+    batch = get_test_batch(db, total=15, seed=3)
+    for q in batch:
+        record_attempt(db, source="test", item_id=q["item_id"], sentence_id=q["sentence_id"], is_correct=True)
+    seen = {q["item_id"]: q["sentence_id"] for q in batch}
+    again = {q["item_id"]: q["sentence_id"] for q in get_test_batch(db, total=15, seed=3)}
+    common = set(seen) & set(again)
+    assert common
+    assert all(again[i] != seen[i] for i in common)
+
+
+def test_level_filter_draws_evenly_over_a_contiguous_block(db):
+    per_level = 500
+    _seed(db, per_level)
+    block = range(2 * per_level + 1, 3 * per_level + 1)  # ids of the n3 block
+    drawn = collections.Counter(
+        q["item_id"] for seed in range(50) for q in get_test_batch(db, total=10, level_filter="N3", seed=seed)
+    )
+    assert set(drawn) <= set(block)
+    assert sum(drawn.values()) == 500  # ~1 draw per item expected
+    # the block's first items are not favoured, and most of the block is reached
+    assert max(drawn.values()) <= 6
+    assert sum(drawn[i] for i in block[:5]) <= 10
+    assert len(drawn) > per_level // 2